@@ -0,0 +1,80 @@
+# __init__.py
+"""
+RAG helper modules, importable as a package.
+
+`import Assets` only puts this directory on sys.path (the modules import their
+siblings by plain name, as the notebooks do) and imports nothing else. The names
+below are loaded from their module on first access, so `from Assets import
+DocumentRetriever` costs only what document_retriever.py needs:
+
+    from Assets import DocumentRetriever, get_shared_client, get_tracer
+    from Assets import lexical_index  # Same module object as a plain `import lexical_index`
+
+Run the Gradio app with `python -m Assets` (see app_launcher.py).
+"""
+import importlib
+import os
+import sys
+from typing import Any, List
+
+_ASSETS_DIR = os.path.dirname(os.path.abspath(__file__))
+if _ASSETS_DIR not in sys.path:
+    sys.path.append(_ASSETS_DIR)
+
+# Public name -> module defining it
+_LAZY_ATTRS = {
+    "BatchedEmbeddingEngine": "embedding_engine",
+    "ConversationHistory": "func_inputoutput",
+    "DbCatalog": "db_catalog",
+    "DocumentRetriever": "document_retriever",
+    "DocumentTableWriter": "sqlite_bulk_writer",
+    "EmbeddingCache": "embedding_cache",
+    "IngestManifest": "ingest_manifest",
+    "LexicalIndex": "lexical_index",
+    "NearDuplicateFilter": "near_duplicates",
+    "NumpyVectorStore": "numpy_vectorstore",
+    "RecordBrowser": "record_browser",
+    "RetrievalCache": "retrieval_cache",
+    "RetrievalService": "retrieval_service",
+    "RetrievalServiceClient": "retrieval_service",
+    "SharedLLMClient": "llm_client",
+    "StubOpenAIServer": "stub_openai_server",
+    "TokenCounter": "token_budget",
+    "concurrent_retrieve": "concurrent_retrieval",
+    "get_shared_client": "llm_client",
+    "get_tracer": "tracing",
+    "lazy_import": "lazy_imports",
+    "merge_adjacent_chunks": "chunk_merge",
+    "pack_context": "token_budget",
+    "process_documents_to_sqlite": "pdftosqlite_processor",
+    "run_batch_queries": "batch_query_runner",
+    "run_benchmark": "rag_benchmark",
+    "sync_vectordb": "chroma_sync",
+}
+
+__all__ = sorted(_LAZY_ATTRS)
+
+
+def _import_sibling(module_name: str) -> Any:
+    # One module object whether it is reached as `Assets.x` or as plain `x` (module-level
+    # singletons such as the tracer or the shared LLM clients must not exist twice)
+    module = importlib.import_module(module_name)
+    sys.modules.setdefault(f"{__name__}.{module_name}", module)
+    return module
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is not None:
+        value = getattr(_import_sibling(module_name), name)
+        globals()[name] = value  # Later lookups skip __getattr__
+        return value
+    if not name.startswith("_") and os.path.exists(os.path.join(_ASSETS_DIR, f"{name}.py")):
+        module = _import_sibling(name)
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
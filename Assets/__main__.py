@@ -0,0 +1,6 @@
+# __main__.py
+# `python -m Assets`: launch the Gradio app (see app_launcher.py; --ready-check measures startup).
+# The package __init__ has already put the Assets folder on sys.path.
+from app_launcher import main
+
+main()
@@ -0,0 +1,79 @@
+# app_launcher.py
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+APP_NOTEBOOK = "StandAlone_Load_Vecdb_RAG_CHAT_v4.ipynb"
+APP_CELL_INDEX = 0  # The cell holding the whole Gradio app
+READY_MARKER = "APP_READY"  # Prefix of the machine-readable line printed by --ready-check
+
+
+def find_app_notebook(notebook_path: Optional[str] = None) -> Path:
+    """The app notebook: the given path, else the one in the working directory or next to Assets/."""
+    if notebook_path:
+        path = Path(notebook_path)
+        if not path.exists():
+            raise FileNotFoundError(f"App notebook not found: {path}")
+        return path.resolve()
+    for folder in (Path.cwd(), Path(__file__).resolve().parent.parent):
+        if (folder / APP_NOTEBOOK).exists():
+            return (folder / APP_NOTEBOOK).resolve()
+    raise FileNotFoundError(f"{APP_NOTEBOOK} not found in {Path.cwd()} or next to {Path(__file__).resolve().parent}.")
+
+
+def load_app_source(notebook_path: Path, cell_index: int = APP_CELL_INDEX) -> str:
+    """Source of the app cell; IPython magics and shell escapes are commented out."""
+    with open(notebook_path, "r", encoding="utf-8") as fh:
+        notebook = json.load(fh)
+    source = notebook["cells"][cell_index]["source"]
+    lines = (source if isinstance(source, list) else source.splitlines(keepends=True))
+    return "".join(f"# {line}" if line.lstrip().startswith(("%", "!")) else line for line in lines)
+
+
+def build_app(notebook_path: Optional[str] = None, launch: bool = False) -> Dict[str, Any]:
+    """
+    Runs the app cell of the notebook as a script, from the notebook's folder (its
+    project root: docs/, processed_databases/, settings files).
+
+    Args:
+        notebook_path (str): App notebook (found automatically by default).
+        launch (bool): Run it as `__main__`, which launches Gradio and blocks; otherwise
+                       the UI, clients and caches are built and the namespace returned.
+
+    Returns:
+        dict: The app's global namespace (`demo`, `oai_client`, ...).
+    """
+    path = find_app_notebook(notebook_path)
+    os.chdir(path.parent)
+    namespace: Dict[str, Any] = {"__name__": "__main__" if launch else "rag_chat_app", "__file__": str(path)}
+    exec(compile(load_app_source(path), str(path), "exec"), namespace)
+    return namespace
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m Assets",
+                                     description="Launch the RAG chat Gradio app (the app cell of the standalone notebook).")
+    parser.add_argument("--notebook", default=None, help=f"App notebook (default: {APP_NOTEBOOK}).")
+    parser.add_argument("--ready-check", action="store_true",
+                        help="Build the app up to 'ready for first query', report the time and exit without launching.")
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    if not args.ready_check:
+        build_app(args.notebook, launch=True)
+        return
+    build_app(args.notebook, launch=False)
+    ready_s = time.perf_counter() - start_time
+    from lazy_imports import lazy_import_report
+    print(lazy_import_report())
+    heavy = sorted(name for name in ("langchain", "langchain_community", "chromadb", "nltk", "pandas", "panel",
+                                     "google.generativeai", "gradio", "openai") if name in sys.modules)
+    print(f"{READY_MARKER} " + json.dumps({"ready_s": round(ready_s, 3), "heavy_modules_loaded": heavy}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# batch_query_runner.py
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set
+
+
+def read_query_file(queries_path: str) -> List[Dict[str, Any]]:
+    """
+    Reads a JSONL query set: one object per line with "query" (or "question") and an
+    optional "id" (defaults to the line number), "method" and "k". Blank lines and
+    lines starting with '#' are skipped.
+
+    Returns:
+        list: Query records with "id" (str) and "query" set.
+    """
+    records = []
+    seen: Set[str] = set()
+    with open(queries_path, "r", encoding="utf-8") as fh:
+        for line_number, line in enumerate(fh, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{queries_path}:{line_number}: invalid JSON ({e})") from None
+            if isinstance(record, str):
+                record = {"query": record}
+            query = record.get("query") or record.get("question")
+            if not query:
+                raise ValueError(f"{queries_path}:{line_number}: no 'query' field.")
+            record["query"] = query
+            record["id"] = str(record.get("id", line_number))
+            if record["id"] in seen:
+                raise ValueError(f"{queries_path}:{line_number}: duplicate id '{record['id']}'.")
+            seen.add(record["id"])
+            records.append(record)
+    return records
+
+
+def read_batch_results(output_path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    The current result of each query id in an output file. A retried query has one line
+    per attempt; the last line of an id wins.
+
+    Returns:
+        dict: id -> result, in the order the ids first appear.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    path = Path(output_path)
+    if not path.exists():
+        return results
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue  # Last line cut off by an interruption
+            if isinstance(result, dict) and "id" in result:
+                results[str(result["id"])] = result
+    return results
+
+
+def completed_query_ids(output_path: str) -> Set[str]:
+    """Ids whose current result in an output file is "ok" (failed queries are run again)."""
+    return {query_id for query_id, result in read_batch_results(output_path).items() if result.get("status") == "ok"}
+
+
+def _ends_with_newline(path: Path) -> bool:
+    """True for a missing or empty file or one whose last byte is a newline."""
+    if not path.exists() or path.stat().st_size == 0:
+        return True
+    with open(path, "rb") as fh:
+        fh.seek(-1, 2)
+        return fh.read(1) == b"\n"
+
+
+def run_batch_queries(queries: List[Dict[str, Any]], output_path: str, answer_fn: callable,
+                      concurrency: int = 4, resume: bool = True,
+                      progress_callback: Optional[callable] = None) -> Dict[str, Any]:
+    """
+    Answers a query set with bounded concurrency and appends one JSON line per query.
+
+    Each line is written (and flushed) as soon as its query finishes, so an interrupted
+    run loses only the queries in flight; with `resume`, queries already answered in
+    `output_path` are skipped. A failing query is recorded with status "error" and
+    the run continues. Failed queries are run again on resume and appended with their
+    "attempt" number; the last line of an id is its result (see read_batch_results).
+
+    Args:
+        queries (list): Query records (see read_query_file).
+        output_path (str): JSONL results file (appended to).
+        answer_fn (callable): `answer_fn(query_record) -> dict` of result fields
+                              (answer, retrieved, timings, ...). Called from worker threads.
+        concurrency (int): Queries in flight at once.
+        resume (bool): Skip queries that already have an "ok" result in `output_path`.
+        progress_callback (callable): Optional `callback(fraction, description)`.
+
+    Returns:
+        dict: total, skipped, ok, errors, seconds and queries_per_s of this run, plus
+              file_ok / file_errors: the queries whose current result in the file is ok / an error.
+    """
+    previous = read_batch_results(output_path)
+    attempts: Dict[str, int] = {}
+    for query_id, result in previous.items():
+        attempts[query_id] = int(result.get("attempt") or 1)
+    done_ids = {query_id for query_id, result in previous.items() if result.get("status") == "ok"} if resume else set()
+    pending = [q for q in queries if q["id"] not in done_ids]
+    summary = {"total": len(queries), "skipped": len(queries) - len(pending), "ok": 0, "errors": 0,
+               "seconds": 0.0, "queries_per_s": 0.0, "output": str(output_path)}
+    final_status = {query_id: result.get("status") for query_id, result in previous.items()}
+
+    def count_file_results():
+        ids = [q["id"] for q in queries]
+        summary["file_ok"] = sum(1 for query_id in ids if final_status.get(query_id) == "ok")
+        summary["file_errors"] = sum(1 for query_id in ids if final_status.get(query_id) == "error")
+
+    if not pending:
+        count_file_results()
+        return summary
+
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    # A line cut off by an interruption must not swallow this run's first result
+    needs_newline = not _ends_with_newline(Path(output_path))
+    write_lock = threading.Lock()
+    start_time = time.perf_counter()
+
+    def run_one(record: Dict[str, Any]) -> Dict[str, Any]:
+        query_start = time.perf_counter()
+        result: Dict[str, Any] = {"id": record["id"], "query": record["query"],
+                                  "attempt": attempts.get(record["id"], 0) + 1}
+        try:
+            result.update(answer_fn(record))
+            result["status"] = "ok"
+        except Exception as e:
+            result["status"] = "error"
+            result["error"] = f"{type(e).__name__}: {e}"
+        result.setdefault("timings", {})["total_s"] = round(time.perf_counter() - query_start, 4)
+        return result
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        if needs_newline:
+            out.write("\n")
+        record_iter = iter(pending)
+        in_flight = set()
+        finished = 0
+        try:
+            while True:
+                # Submit lazily: at most `concurrency` queries are queued, so an interruption stops quickly
+                while len(in_flight) < max(1, concurrency):
+                    record = next(record_iter, None)
+                    if record is None:
+                        break
+                    in_flight.add(pool.submit(run_one, record))
+                if not in_flight:
+                    break
+                completed, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    result = future.result()
+                    with write_lock:
+                        out.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+                        out.flush()
+                    summary["ok" if result["status"] == "ok" else "errors"] += 1
+                    final_status[result["id"]] = result["status"]
+                    finished += 1
+                    if progress_callback:
+                        elapsed = time.perf_counter() - start_time
+                        progress_callback(finished / len(pending),
+                                          f"Answered {finished}/{len(pending)} queries ({finished / elapsed:.2f}/s, "
+                                          f"{summary['errors']} errors)")
+        except KeyboardInterrupt:
+            print(f"Interrupted: waiting for {len(in_flight)} queries in flight; rerun to resume.")
+            for future in in_flight:
+                future.cancel()
+            raise
+        finally:
+            summary["seconds"] = time.perf_counter() - start_time
+            summary["queries_per_s"] = finished / summary["seconds"] if summary["seconds"] else 0.0
+            count_file_results()
+    return summary
+
+
+def format_batch_summary(summary: Dict[str, Any]) -> str:
+    file_state = ""
+    if "file_ok" in summary:
+        file_state = (f" Results file: {summary['file_ok']} ok, {summary['file_errors']} failed, "
+                      f"{summary['total'] - summary['file_ok'] - summary['file_errors']} not run (last line per id).")
+    return (f"Batch run: {summary['ok']} answered, {summary['errors']} errors, {summary['skipped']} already done "
+            f"(of {summary['total']}) in {summary['seconds']:.1f}s ({summary['queries_per_s']:.2f} queries/s).{file_state} "
+            f"Results: {summary['output']}")
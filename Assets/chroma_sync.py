@@ -0,0 +1,291 @@
+# chroma_sync.py
+import hashlib
+import time
+from typing import List, Dict, Any, Optional, Tuple, Set, Iterable, Union
+
+
+def document_content_hash(text: str) -> str:
+    """
+    Hash of the text that gets chunked for a document_table row (Abstract + " " + Body).
+    Stored as 'content_hash' in the metadata of every chunk of that document.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _parse_doc_id(text: str) -> Any:
+    # source_doc_ids is a comma-separated string; document_table IDs are ints in 'doc_id'
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+
+class SyncPlan:
+    """Difference between the documents in SQLite and the documents already indexed in ChromaDB."""
+
+    def __init__(self, new_ids: List[Any], changed_ids: List[Any], removed_ids: List[Any], unchanged_count: int,
+                 reembed_ids: Optional[List[Any]] = None):
+        self.new_ids = new_ids
+        self.changed_ids = changed_ids
+        self.removed_ids = removed_ids
+        self.unchanged_count = unchanged_count
+        # Unchanged documents whose text was collapsed into a chunk of a changed/removed document
+        self.reembed_ids = reembed_ids or []
+
+    @property
+    def ids_to_embed(self) -> Set[Any]:
+        return set(self.new_ids) | set(self.changed_ids) | set(self.reembed_ids)
+
+    @property
+    def ids_to_delete(self) -> List[Any]:
+        return list(self.changed_ids) + list(self.removed_ids) + list(self.reembed_ids)
+
+    def is_empty(self) -> bool:
+        return not (self.new_ids or self.changed_ids or self.removed_ids)
+
+    def summary(self) -> str:
+        reembedded = f", {len(self.reembed_ids)} re-embedded (shared near-duplicate chunks removed)" if self.reembed_ids else ""
+        return (f"{len(self.new_ids)} new, {len(self.changed_ids)} changed, "
+                f"{len(self.removed_ids)} removed, {self.unchanged_count - len(self.reembed_ids)} unchanged documents"
+                f"{reembedded}")
+
+
+def shared_sources(metadata: Dict[str, Any]) -> List[Tuple[Any, Optional[str]]]:
+    """
+    (doc_id, content_hash) of the other documents whose near-duplicate text a kept chunk
+    stands for (its 'source_doc_ids' / 'source_content_hashes', see near_duplicates.py).
+    """
+    if not metadata.get("source_doc_ids"):
+        return []
+    doc_ids = [_parse_doc_id(d) for d in str(metadata["source_doc_ids"]).split(",")]
+    hashes = str(metadata.get("source_content_hashes") or "").split(",")
+    hashes += [""] * (len(doc_ids) - len(hashes))
+    return [(doc_id, content_hash or None) for doc_id, content_hash in zip(doc_ids, hashes)
+            if doc_id != metadata.get("doc_id")]
+
+
+def read_indexed_state(collection: Any, page_size: int = 5000,
+                       shared_chunks: Optional[Dict[str, Tuple[Any, List[Any]]]] = None
+                       ) -> Tuple[Dict[Any, Optional[str]], int]:
+    """
+    Reads the doc_id -> content_hash mapping of an existing Chroma collection.
+
+    Only metadata is fetched (no documents, no embeddings), page by page. Documents
+    whose chunks were collapsed into another document's chunk (near-duplicate
+    filter) count as indexed through that chunk's 'source_doc_ids'.
+
+    Args:
+        collection: The Chroma collection (e.g. `vectordb._collection`).
+        page_size (int): Number of chunk records fetched per call.
+        shared_chunks (dict): Optional; filled with chunk record id -> (owner doc_id,
+                              doc_ids of the collapsed documents) for those chunks.
+
+    Returns:
+        tuple: (dict doc_id -> content_hash or None for chunks indexed before hashes
+                were stored, highest chunk_id found or -1 if the collection is empty)
+    """
+    indexed: Dict[Any, Optional[str]] = {}
+
+    def register(doc_id: Any, chunk_hash: Optional[str]) -> None:
+        if doc_id not in indexed or indexed[doc_id] != chunk_hash:
+            # A document whose chunks disagree on the hash is treated as changed
+            indexed[doc_id] = chunk_hash if doc_id not in indexed else None
+
+    max_chunk_id = -1
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        metadatas = page.get("metadatas") or []
+        if not metadatas:
+            break
+        for record_id, metadata in zip(page.get("ids") or [None] * len(metadatas), metadatas):
+            if not metadata:
+                continue
+            doc_id = metadata.get("doc_id")
+            register(doc_id, metadata.get("content_hash"))
+            sources = shared_sources(metadata)
+            for source_doc_id, source_hash in sources:
+                register(source_doc_id, source_hash)
+            if sources and shared_chunks is not None:
+                shared_chunks[record_id] = (doc_id, [source_doc_id for source_doc_id, _ in sources])
+            chunk_id = metadata.get("chunk_id")
+            if isinstance(chunk_id, int) and chunk_id > max_chunk_id:
+                max_chunk_id = chunk_id
+        if len(metadatas) < page_size:
+            break
+        offset += page_size
+    return indexed, max_chunk_id
+
+
+def plan_sync(source_hashes: Dict[Any, str], indexed_hashes: Dict[Any, Optional[str]]) -> SyncPlan:
+    """
+    Compares the content hashes of the SQLite documents with the indexed ones.
+
+    Args:
+        source_hashes (dict): doc_id -> content_hash for the current document_table rows.
+        indexed_hashes (dict): doc_id -> content_hash as returned by read_indexed_state.
+
+    Returns:
+        SyncPlan: New, changed and removed doc_ids.
+    """
+    new_ids, changed_ids = [], []
+    unchanged = 0
+    for doc_id, source_hash in source_hashes.items():
+        if doc_id not in indexed_hashes:
+            new_ids.append(doc_id)
+        elif indexed_hashes[doc_id] != source_hash:
+            changed_ids.append(doc_id)
+        else:
+            unchanged += 1
+    removed_ids = [doc_id for doc_id in indexed_hashes if doc_id not in source_hashes]
+    return SyncPlan(new_ids, changed_ids, removed_ids, unchanged)
+
+
+def documents_losing_text(shared_chunks: Dict[str, Tuple[Any, List[Any]]], doc_ids_to_delete: Iterable[Any],
+                          existing_doc_ids: Iterable[Any]) -> List[Any]:
+    """
+    Documents that are not being deleted but whose near-duplicate text is only indexed in
+    a chunk that is (deleting its owner deletes it). They must be re-embedded; that in
+    turn deletes their own chunks, so the check repeats until nothing is added.
+    """
+    deleting = set(doc_ids_to_delete)
+    existing = set(existing_doc_ids)
+    losing: List[Any] = []
+    while True:
+        added = [doc_id for owner, sources in shared_chunks.values() if owner in deleting
+                 for doc_id in sources if doc_id in existing and doc_id not in deleting]
+        added = list(dict.fromkeys(added))
+        if not added:
+            return losing
+        losing.extend(added)
+        deleting.update(added)
+
+
+def delete_documents(collection: Any, doc_ids: List[Any], batch_size: int = 500,
+                     shared_chunks: Optional[Dict[str, Tuple[Any, List[Any]]]] = None) -> None:
+    """
+    Deletes every chunk whose metadata 'doc_id' is in doc_ids. With `shared_chunks` (from
+    read_indexed_state) the deleted documents are also removed from the 'source_doc_ids'
+    of the kept near-duplicate chunks that remain.
+    """
+    for start in range(0, len(doc_ids), batch_size):
+        part = doc_ids[start:start + batch_size]
+        if len(part) == 1:
+            collection.delete(where={"doc_id": part[0]})
+        else:
+            collection.delete(where={"doc_id": {"$in": part}})
+    if not shared_chunks:
+        return
+    deleted = set(doc_ids)
+    affected = [record_id for record_id, (owner, sources) in shared_chunks.items()
+                if owner not in deleted and deleted.intersection(sources)]
+    for start in range(0, len(affected), batch_size):
+        current = collection.get(ids=affected[start:start + batch_size], include=["metadatas"])
+        ids, metadatas = [], []
+        for record_id, metadata in zip(current["ids"], current["metadatas"]):
+            metadata = dict(metadata or {})
+            kept = [(d, h) for d, h in [(metadata.get("doc_id"), metadata.get("content_hash"))] + shared_sources(metadata)
+                    if d not in deleted]
+            if len(kept) < 2:
+                kept = []  # Only the owner left: no longer a shared chunk
+            metadata["source_doc_ids"] = ",".join(str(d) for d, _ in kept)
+            metadata["source_content_hashes"] = ",".join(h or "" for _, h in kept)
+            metadata["duplicate_count"] = max(0, len(kept) - 1)
+            ids.append(record_id)
+            metadatas.append(metadata)
+        if ids:
+            collection.update(ids=ids, metadatas=metadatas)
+
+
+def make_chunk_ids(chunks: List[Any]) -> List[str]:
+    """Stable Chroma record ids for chunks, derived from their doc_id and chunk_id metadata."""
+    return [f"{chunk.metadata.get('doc_id')}_{chunk.metadata.get('chunk_id')}" for chunk in chunks]
+
+
+def add_in_windows(vectordb: Any, chunks: Iterable[Any], window_size: int = 1000,
+                   on_window: Optional[callable] = None) -> int:
+    """
+    Adds chunks to the vector DB one fixed-size window at a time, with stable ids.
+
+    `chunks` may be a lazy iterator (e.g. chunks generated while documents are read
+    from SQLite); only the current window is held in memory.
+
+    Args:
+        vectordb: langchain Chroma instance (or anything with `add_documents(docs, ids=...)`).
+        chunks (iterable): Chunks with 'doc_id' and 'chunk_id' metadata.
+        window_size (int): Chunks embedded and written per add_documents call.
+        on_window (callable): Optional `on_window(chunks_added_so_far)` called after each window.
+
+    Returns:
+        int: Number of chunks added.
+    """
+    window_size = max(1, int(window_size))
+    added = 0
+    window: List[Any] = []
+    for chunk in chunks:
+        window.append(chunk)
+        if len(window) >= window_size:
+            vectordb.add_documents(window, ids=make_chunk_ids(window))
+            added += len(window)
+            window = []
+            if on_window:
+                on_window(added)
+    if window:
+        vectordb.add_documents(window, ids=make_chunk_ids(window))
+        added += len(window)
+        if on_window:
+            on_window(added)
+    return added
+
+
+def sync_vectordb(vectordb: Any, documents: Union[List[Any], callable], chunk_fn: callable,
+                  doc_id_key: str = "ID", add_batch_size: int = 2000,
+                  on_window: Optional[callable] = None) -> Tuple[SyncPlan, int, str]:
+    """
+    Brings an existing Chroma vector DB in line with the given source documents.
+
+    Only new or changed documents are chunked and embedded; chunks of changed and
+    removed documents are deleted. Unchanged documents are not touched, except those
+    whose near-duplicate text was only indexed in a deleted chunk: they are re-embedded.
+
+    Args:
+        vectordb: Loaded langchain Chroma instance.
+        documents (list or callable): Un-chunked Documents for all current document_table rows,
+                          each with metadata[doc_id_key] and metadata['content_hash'].
+                          A zero-argument callable returning a fresh iterator is read twice
+                          (hashes first, then the documents to embed) without holding the
+                          corpus in memory.
+        chunk_fn (callable): `chunk_fn(docs, start_chunk_id)` returning chunks with
+                             'doc_id' and 'chunk_id' metadata (chunk_texts_with_metadata
+                             or the lazy iter_chunks_with_metadata).
+        doc_id_key (str): Metadata key of the document ID.
+        add_batch_size (int): Number of chunks per add_documents call.
+        on_window (callable): Passed on to add_in_windows.
+
+    Returns:
+        tuple: (SyncPlan, number of chunks added, status message)
+    """
+    start_time = time.time()
+    open_documents = documents if callable(documents) else (lambda: documents)
+    collection = vectordb._collection
+    shared_chunks: Dict[str, Tuple[Any, List[Any]]] = {}
+    indexed_hashes, max_chunk_id = read_indexed_state(collection, shared_chunks=shared_chunks)
+    source_hashes = {doc.metadata.get(doc_id_key): doc.metadata.get("content_hash") for doc in open_documents()}
+    plan = plan_sync(source_hashes, indexed_hashes)
+    if plan.is_empty():
+        return plan, 0, f"ChromaDB already up to date ({plan.summary()})."
+
+    plan.reembed_ids = documents_losing_text(shared_chunks, plan.ids_to_delete, source_hashes)
+    if plan.ids_to_delete:
+        delete_documents(collection, plan.ids_to_delete, shared_chunks=shared_chunks)
+
+    ids_to_embed = plan.ids_to_embed
+    docs_to_embed = (doc for doc in open_documents() if doc.metadata.get(doc_id_key) in ids_to_embed)
+    num_added = 0
+    if ids_to_embed:
+        num_added = add_in_windows(vectordb, chunk_fn(docs_to_embed, max_chunk_id + 1), add_batch_size, on_window)
+
+    elapsed = time.time() - start_time
+    status = (f"ChromaDB updated in {elapsed:.2f}s: {plan.summary()}. "
+              f"Added {num_added} chunks, removed chunks of {len(plan.ids_to_delete)} documents.")
+    return plan, num_added, status
@@ -0,0 +1,112 @@
+# chunk_merge.py
+from typing import List, Dict, Any, Tuple
+
+
+class MergedPassage:
+    """
+    One or more retrieved chunks of the same document joined into a single passage.
+    Has `page_content` and `metadata` like a langchain Document; `metadata['chunk_ids']`
+    lists the merged chunks and `metadata['chunk_id']` is the first of them.
+    """
+
+    def __init__(self, page_content: str, metadata: Dict[str, Any], best_rank: int):
+        self.page_content = page_content
+        self.metadata = metadata
+        self.best_rank = best_rank
+
+
+def suffix_prefix_overlap(left: str, right: str, max_overlap: int = 1000, min_overlap: int = 20) -> int:
+    """
+    Length of the longest end of `left` that `right` starts with (0 if shorter than `min_overlap`).
+
+    This is the text RecursiveCharacterTextSplitter repeats between consecutive chunks
+    (chunk_overlap=200 characters at most, cut at a separator).
+    """
+    longest = min(max_overlap, len(left), len(right))
+    for length in range(longest, min_overlap - 1, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+
+def format_chunk_ids(chunk_ids: List[Any]) -> str:
+    """'7', '7-9' for a consecutive run, '7, 9' otherwise."""
+    if len(chunk_ids) == 1:
+        return str(chunk_ids[0])
+    if all(isinstance(c, int) for c in chunk_ids) and chunk_ids == list(range(chunk_ids[0], chunk_ids[-1] + 1)):
+        return f"{chunk_ids[0]}-{chunk_ids[-1]}"
+    return ", ".join(str(c) for c in chunk_ids)
+
+
+def merge_adjacent_chunks(docs: List[Any], max_overlap: int = 1000,
+                          min_overlap: int = 20) -> Tuple[List[MergedPassage], Dict[str, int]]:
+    """
+    Consolidates retrieved chunks before they go into the prompt.
+
+    Hits are grouped by doc_id and ordered by chunk_id. Runs of consecutive chunk_ids
+    (chunks are numbered sequentially within a document at ingestion) are joined into
+    one passage, with the text repeated by the splitter's overlap kept only once.
+    Exact duplicate hits are dropped. Passages are returned in the order of their
+    best-ranked chunk, so the most relevant material still comes first.
+
+    Args:
+        docs (list): Retrieved documents, best first.
+        max_overlap (int): Longest overlap searched for, in characters.
+        min_overlap (int): Shorter common spans are not treated as overlap.
+
+    Returns:
+        tuple: (passages, stats dict with chunks, passages and chars_saved)
+    """
+    groups: Dict[Any, List[Tuple[int, Any]]] = {}
+    for rank, doc in enumerate(docs):
+        groups.setdefault(str(doc.metadata.get("doc_id")), []).append((rank, doc))
+
+    passages: List[MergedPassage] = []
+    chars_saved = 0
+    for hits in groups.values():
+        hits.sort(key=lambda hit: (hit[1].metadata.get("chunk_id") is None, _chunk_order(hit[1])))
+        run: List[Tuple[int, Any]] = []
+        for rank, doc in hits:
+            if run and _chunk_order(run[-1][1]) == _chunk_order(doc) and doc.metadata.get("chunk_id") is not None:
+                chars_saved += len(doc.page_content)  # Same chunk retrieved twice
+                run[-1] = (min(run[-1][0], rank), run[-1][1])
+                continue
+            if run and not _is_next_chunk(run[-1][1], doc):
+                passages.append(_join_run(run, max_overlap, min_overlap))
+                run = []
+            run.append((rank, doc))
+        if run:
+            passages.append(_join_run(run, max_overlap, min_overlap))
+
+    passages.sort(key=lambda passage: passage.best_rank)
+    chars_saved += sum(p.metadata["merged_chars_saved"] for p in passages)
+    return passages, {"chunks": len(docs), "passages": len(passages), "chars_saved": chars_saved}
+
+
+def _chunk_order(doc: Any) -> Any:
+    chunk_id = doc.metadata.get("chunk_id")
+    try:
+        return int(chunk_id)
+    except (TypeError, ValueError):
+        return -1
+
+
+def _is_next_chunk(previous: Any, doc: Any) -> bool:
+    if previous.metadata.get("chunk_id") is None or doc.metadata.get("chunk_id") is None:
+        return False
+    return _chunk_order(doc) == _chunk_order(previous) + 1
+
+
+def _join_run(run: List[Tuple[int, Any]], max_overlap: int, min_overlap: int) -> MergedPassage:
+    first_doc = run[0][1]
+    text = first_doc.page_content
+    saved = 0
+    for _, doc in run[1:]:
+        overlap = suffix_prefix_overlap(text, doc.page_content, max_overlap, min_overlap)
+        # No detectable overlap (e.g. the splitter cut at a paragraph break): keep the break visible
+        text += doc.page_content[overlap:] if overlap else "\n" + doc.page_content
+        saved += overlap
+    metadata = dict(first_doc.metadata)
+    metadata["chunk_ids"] = [doc.metadata.get("chunk_id") for _, doc in run]
+    metadata["merged_chars_saved"] = saved
+    return MergedPassage(text, metadata, min(rank for rank, _ in run))
@@ -0,0 +1,210 @@
+# concurrent_retrieval.py
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+
+try:
+    from lexical_index import reciprocal_rank_fusion
+except ImportError:
+    reciprocal_rank_fusion = None
+
+_LIST_MARKER = re.compile(r'^\s*(?:[-*•]|\d+[\.\)]|q\d*[:\.])\s*', re.IGNORECASE)
+
+
+def clean_sub_query(line: str) -> str:
+    """Strips list markers ("1.", "-", "Q2:") and surrounding quotes from one generated query line."""
+    text = _LIST_MARKER.sub("", line.strip())
+    return text.strip().strip('"\'').strip()
+
+
+def iter_sub_queries(stream: Iterable[Any], max_queries: int = 3) -> Iterator[str]:
+    """
+    Yields search queries from a streamed chat completion (one query per line)
+    as soon as each line is complete, instead of after the whole answer.
+
+    Args:
+        stream: Iterable of OpenAI chat completion chunks (`stream=True`).
+        max_queries (int): Stop after this many queries.
+    """
+    buffer = ""
+    produced = 0
+    for chunk in stream:
+        choices = getattr(chunk, "choices", None) or []
+        delta = getattr(choices[0].delta, "content", None) if choices else None
+        if not delta:
+            continue
+        buffer += delta
+        while "\n" in buffer:
+            line, buffer = buffer.split("\n", 1)
+            query = clean_sub_query(line)
+            if query:
+                yield query
+                produced += 1
+                if produced >= max_queries:
+                    return
+    query = clean_sub_query(buffer)
+    if query and produced < max_queries:
+        yield query
+
+
+class StreamHandle:
+    """
+    The completion stream a sub-query source reads from, so the pipeline can close it
+    from another thread at the deadline: the request ends (and frees its concurrency
+    slot) right away instead of when the model stops generating.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stream: Any = None
+        self.closed = False
+
+    def attach(self, stream: Any) -> bool:
+        """Registers the stream; if the handle is already closed the stream is closed and False returned."""
+        with self._lock:
+            if not self.closed:
+                self._stream = stream
+                return True
+        _close_quietly(stream)
+        return False
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+            stream, self._stream = self._stream, None
+        if stream is not None:
+            _close_quietly(stream)
+
+
+def _close_quietly(stream: Any) -> None:
+    try:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+    except Exception as e:
+        print(f"Warning: Could not close the refinement stream: {e}")
+
+
+def _merge_unique(result_lists: List[List[Any]], k: int) -> List[Any]:
+    """Round-robin merge keeping the first occurrence of each (doc_id, chunk_id)."""
+    merged, seen = [], set()
+    for rank in range(max((len(r) for r in result_lists), default=0)):
+        for results in result_lists:
+            if rank < len(results):
+                doc = results[rank]
+                key = (str(doc.metadata.get("doc_id")), str(doc.metadata.get("chunk_id")))
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(doc)
+    return merged[:k]
+
+
+def concurrent_retrieve(raw_query: str, search_fn: callable, k: int = 10,
+                        sub_query_source: Optional[callable] = None,
+                        extra_queries: Optional[List[str]] = None,
+                        deadline_seconds: float = 6.0, max_workers: int = 4) -> Tuple[List[Any], Dict[str, Any]]:
+    """
+    Searches the raw query immediately and LLM-generated sub-queries as they arrive.
+
+    The raw-query search (and any `extra_queries`, e.g. extracted keywords) starts at
+    once. `sub_query_source(raw_query, stream_handle)` returns an iterator of
+    sub-queries, typically parsed from a streamed completion it attaches to the
+    StreamHandle; it is consumed on its own thread and every sub-query is searched on
+    the pool as soon as it is produced. At the deadline the stream is closed; sub-queries
+    or searches not finished `deadline_seconds` after the start are dropped; the raw
+    query's results are always awaited, so the answer is never worse than plain
+    vector search. Results are fused with reciprocal-rank fusion (raw query first)
+    and deduplicated by (doc_id, chunk_id).
+
+    Args:
+        raw_query (str): The user's query as typed (cleaned of app directives).
+        search_fn (callable): `search_fn(query, k) -> list of documents`.
+        k (int): Number of merged results.
+        sub_query_source (callable): Optional `fn(raw_query, stream_handle) -> iterator of sub-queries`.
+        extra_queries (list): Further queries to search right away.
+        deadline_seconds (float): Budget for the refinement and the sub-query searches.
+        max_workers (int): Concurrent searches.
+
+    Returns:
+        tuple: (merged documents, info dict with sub_queries, late / failed counts and elapsed seconds)
+    """
+    start_time = time.time()
+    deadline = start_time + deadline_seconds
+    info: Dict[str, Any] = {"sub_queries": [], "late": 0, "failed": 0, "refine_timed_out": False}
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    lock = threading.Lock()
+    searches = [(raw_query, pool.submit(search_fn, raw_query, k))]
+    seen_queries = {raw_query.strip().lower()}
+    for query in extra_queries or []:
+        if query and query.strip().lower() not in seen_queries:
+            seen_queries.add(query.strip().lower())
+            searches.append((query, pool.submit(search_fn, query, k)))
+
+    stop = threading.Event()  # Set (under `lock`) once the pipeline stops taking sub-queries
+    stream_handle = StreamHandle()
+
+    def consume_sub_queries() -> None:
+        queries = None
+        try:
+            queries = sub_query_source(raw_query, stream_handle)
+            for query in queries:
+                if time.time() > deadline:
+                    break
+                with lock:
+                    if stop.is_set():
+                        break
+                    if query.strip().lower() in seen_queries:
+                        continue
+                    seen_queries.add(query.strip().lower())
+                    info["sub_queries"].append(query)
+                    searches.append((query, pool.submit(search_fn, query, k)))
+        except Exception as e:
+            if not stop.is_set():  # Otherwise the stream was closed at the deadline on purpose
+                print(f"Sub-query generation failed, continuing with the raw query: {e}")
+        finally:
+            stream_handle.close()
+            close = getattr(queries, "close", None)
+            if close:
+                close()
+
+    producer = None
+    if sub_query_source is not None:
+        producer = threading.Thread(target=consume_sub_queries, daemon=True)
+        producer.start()
+
+    try:
+        raw_results = searches[0][1].result()  # Always awaited: the baseline
+        if producer is not None:
+            producer.join(max(0.0, deadline - time.time()))
+            info["refine_timed_out"] = producer.is_alive()
+        with lock:
+            stop.set()
+            pending = list(searches[1:])
+        stream_handle.close()  # A refinement still streaming would hold an LLM slot the answer needs
+        wait([future for _, future in pending], timeout=max(0.0, deadline - time.time()))
+        result_lists = [raw_results]
+        for query, future in pending:
+            if not future.done():
+                info["late"] += 1
+                continue
+            try:
+                result_lists.append(future.result())
+            except Exception as e:
+                info["failed"] += 1
+                print(f"Search for sub-query '{query[:60]}' failed: {e}")
+    finally:
+        with lock:
+            stop.set()
+        stream_handle.close()
+        # Late searches finish in the background; nothing waits for them
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if reciprocal_rank_fusion is not None:
+        merged = reciprocal_rank_fusion(result_lists, k=k)
+    else:
+        merged = _merge_unique(result_lists, k)
+    info["elapsed"] = time.time() - start_time
+    info["searches"] = len(result_lists)
+    return merged, info
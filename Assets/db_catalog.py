@@ -0,0 +1,363 @@
+# db_catalog.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterable
+
+DB_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+CATALOG_TABLE = "db_catalog"
+DEFAULT_SCAN_WORKERS = 8  # Opening a DB on a network share is mostly waiting, so threads overlap well
+SKIP_DIR_NAMES = {".git", ".ipynb_checkpoints", "__pycache__"}
+PREFERRED_TABLE = "document_table"
+
+Signature = Tuple[int, int, int, int]  # size, mtime_ns, -wal size, -wal mtime_ns
+
+
+def file_signature(path: str, stat_result: Optional[os.stat_result] = None) -> Signature:
+    """
+    (size, mtime_ns) of a database file plus those of its -wal file: in WAL mode committed
+    rows can sit in the -wal file while the main file stays untouched.
+    """
+    st = stat_result or os.stat(path)
+    try:
+        wal = os.stat(path + "-wal")
+        wal_size, wal_mtime_ns = wal.st_size, wal.st_mtime_ns
+    except OSError:
+        wal_size, wal_mtime_ns = 0, 0
+    return (st.st_size, st.st_mtime_ns, wal_size, wal_mtime_ns)
+
+
+def find_db_files(base_path: str, suffixes: Tuple[str, ...] = DB_SUFFIXES) -> Dict[str, os.stat_result]:
+    """
+    All database files in and under `base_path` with their stat results, in one
+    os.scandir walk (on Windows the stat comes with the directory listing for free).
+    """
+    found: Dict[str, os.stat_result] = {}
+    pending = [os.path.abspath(base_path)]
+    while pending:
+        folder = pending.pop()
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in SKIP_DIR_NAMES:
+                                pending.append(entry.path)
+                        elif entry.name.lower().endswith(suffixes) and entry.is_file():
+                            found[entry.path] = entry.stat()
+                    except OSError:
+                        continue  # Vanished or unreadable while walking
+        except OSError as e:
+            print(f"Warning: Could not list {folder}: {e}")
+    return found
+
+
+def user_tables(conn: sqlite3.Connection) -> List[str]:
+    """Ordinary tables by name: no sqlite_ internals, FTS virtual tables or their shadow tables."""
+    rows = conn.execute("SELECT name, type, sql FROM sqlite_master WHERE type='table' ORDER BY name").fetchall()
+    virtual = [name for name, _, sql in rows if (sql or "").upper().startswith("CREATE VIRTUAL")]
+    return [name for name, _, _ in rows
+            if not name.startswith("sqlite_") and name not in virtual
+            and not any(name.startswith(v + "_") for v in virtual)]
+
+
+def _quoted(table: str) -> str:
+    return '"' + table.replace('"', '""') + '"'
+
+
+def exact_row_count(conn: sqlite3.Connection, table: str) -> int:
+    return conn.execute(f"SELECT COUNT(*) FROM {_quoted(table)}").fetchone()[0]
+
+
+def estimate_row_count(conn: sqlite3.Connection, table: str) -> Tuple[int, bool]:
+    """
+    Row count without scanning the table.
+
+    MAX(rowid) is a single b-tree seek and equals the row count for append-only tables
+    (the ingestion tables here); with deleted rows it is an upper bound. WITHOUT ROWID
+    tables fall back to sqlite_stat1 (when ANALYZE has run), then to COUNT(*).
+
+    Returns:
+        tuple: (count, exact)
+    """
+    try:
+        max_rowid = conn.execute(f"SELECT MAX(rowid) FROM {_quoted(table)}").fetchone()[0]
+        if max_rowid is None:
+            return 0, True
+        return int(max_rowid), False
+    except sqlite3.OperationalError:
+        pass  # WITHOUT ROWID table
+    try:
+        row = conn.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (table,)).fetchone()
+        if row and row[0]:
+            return int(str(row[0]).split()[0]), False
+    except (sqlite3.OperationalError, ValueError):
+        pass  # No ANALYZE statistics
+    return exact_row_count(conn, table), True
+
+
+def format_count(count: Optional[int], exact: bool = True) -> str:
+    if count is None:
+        return "Count Error"
+    return f"{'' if exact else '~'}{count:,} records"
+
+
+class DbInfo:
+    """Cached facts about one database file: its tables and their row counts."""
+
+    def __init__(self, path: str, signature: Signature, tables: Dict[str, Optional[int]],
+                 exact_tables: Iterable[str] = (), error: Optional[str] = None, scanned: Optional[float] = None):
+        self.path = path
+        self.signature = tuple(signature)
+        self.tables = tables  # Table name -> row count (None: could not be counted)
+        self.exact_tables = set(exact_tables)  # Tables counted with COUNT(*); the others are estimates
+        self.error = error
+        self.scanned = scanned if scanned is not None else time.time()
+
+    def main_table(self, preferred: Optional[str] = PREFERRED_TABLE) -> Optional[str]:
+        """`preferred` when the database has it, else the first table by name."""
+        if preferred and preferred in self.tables:
+            return preferred
+        return next(iter(sorted(self.tables)), None)
+
+    def row_count(self, table: Optional[str] = None) -> Optional[int]:
+        table = table or self.main_table()
+        return self.tables.get(table) if table else None
+
+    @property
+    def exact(self) -> bool:
+        return self.exact_tables.issuperset(self.tables)
+
+    def count_label(self, table: Optional[str] = None) -> str:
+        if self.error:
+            return "Count Error"
+        table = table or self.main_table()
+        if table is None:
+            return "no tables"
+        return format_count(self.row_count(table), table in self.exact_tables)
+
+
+def inspect_db_file(path: str, exact: bool = False, signature: Optional[Signature] = None,
+                    timeout: float = 5.0) -> DbInfo:
+    """
+    Table names and row counts of one database, read through a read-only connection.
+
+    Args:
+        path (str): Database file.
+        exact (bool): COUNT(*) every table instead of estimating (slow on large tables).
+        signature (tuple): The file's signature when already known from the directory walk.
+        timeout (float): Seconds to wait on a locked database.
+    """
+    if signature is None:
+        signature = file_signature(path)
+    tables: Dict[str, Optional[int]] = {}
+    exact_tables = set()
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=timeout)
+    except sqlite3.Error as e:
+        return DbInfo(path, signature, {}, error=str(e))
+    try:
+        for table in user_tables(conn):
+            try:
+                if exact:
+                    tables[table], table_exact = exact_row_count(conn, table), True
+                else:
+                    tables[table], table_exact = estimate_row_count(conn, table)
+                if table_exact:
+                    exact_tables.add(table)
+            except sqlite3.Error as e:
+                print(f"Warning: Could not count {table} in {os.path.basename(path)}: {e}")
+                tables[table] = None
+    except sqlite3.Error as e:
+        return DbInfo(path, signature, tables, exact_tables, error=str(e))
+    finally:
+        conn.close()
+    return DbInfo(path, signature, tables, exact_tables)
+
+
+class DbCatalog:
+    """
+    Persistent catalog of the database files under a folder, so startup does not open
+    and COUNT(*) every database again.
+
+    Each file's tables and row counts are stored with its (size, mtime) signature. A
+    `scan` walks the folder once, reuses every entry whose file is unchanged and
+    inspects only new or changed files, in parallel. Counts are cheap estimates unless
+    exact counts are asked for; `exact_count` counts one table on demand.
+    """
+
+    def __init__(self, catalog_path: Optional[str] = None, max_workers: int = DEFAULT_SCAN_WORKERS):
+        """
+        Args:
+            catalog_path (str): SQLite file keeping the catalog between runs (None = in memory only).
+            max_workers (int): Databases inspected in parallel.
+        """
+        self.catalog_path = str(catalog_path) if catalog_path else None
+        self.max_workers = max(1, int(max_workers))
+        self._entries: Dict[str, DbInfo] = {}
+        self._last_scans: Dict[str, Tuple[float, List[str]]] = {}  # base path -> (time, files found)
+        self._lock = threading.RLock()
+        self.last_scan: Dict[str, Any] = {}
+        if self.catalog_path:
+            try:
+                self._load()
+            except sqlite3.Error as e:
+                print(f"Warning: Could not read database catalog {self.catalog_path} ({e}); starting empty.")
+                self.catalog_path = None
+
+    # --- Persistence ---
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.catalog_path)), exist_ok=True)
+        conn = sqlite3.connect(self.catalog_path, timeout=30)
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS {CATALOG_TABLE}
+                        (Path TEXT PRIMARY KEY,
+                        Size INTEGER,
+                        Mtime_NS INTEGER,
+                        Wal_Size INTEGER,
+                        Wal_Mtime_NS INTEGER,
+                        Tables TEXT,
+                        Exact_Tables TEXT,
+                        Error TEXT,
+                        Scanned REAL)''')
+        return conn
+
+    def _load(self) -> None:
+        conn = self._connect()
+        try:
+            for path, size, mtime_ns, wal_size, wal_mtime_ns, tables, exact_tables, error, scanned in conn.execute(
+                    f"SELECT * FROM {CATALOG_TABLE}"):
+                self._entries[path] = DbInfo(path, (size, mtime_ns, wal_size, wal_mtime_ns), json.loads(tables),
+                                             json.loads(exact_tables), error, scanned)
+        finally:
+            conn.close()
+
+    def _save(self, changed: Iterable[DbInfo], removed: Iterable[str] = ()) -> None:
+        if not self.catalog_path:
+            return
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(f"INSERT OR REPLACE INTO {CATALOG_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                     [(e.path, *e.signature, json.dumps(e.tables), json.dumps(sorted(e.exact_tables)),
+                                       e.error, e.scanned)
+                                      for e in changed])
+                    conn.executemany(f"DELETE FROM {CATALOG_TABLE} WHERE Path = ?", [(p,) for p in removed])
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError) as e:
+            print(f"Warning: Could not update database catalog {self.catalog_path}: {e}")
+
+    # --- Scanning ---
+    def scan(self, base_path: str, exact: bool = False, extra_paths: Optional[List[str]] = None,
+             max_age_seconds: float = 0.0,
+             progress_callback: Optional[Callable[[float, str], None]] = None) -> List[DbInfo]:
+        """
+        Entries for every database file in and under `base_path`, sorted by path.
+
+        Args:
+            base_path (str): Folder to search recursively.
+            exact (bool): Exact COUNT(*) row counts; cached estimates are recounted.
+            extra_paths (list): Database files outside `base_path` to include (e.g. the default DB).
+            max_age_seconds (float): Reuse the previous walk of `base_path` if it is at most this old
+                                     (several dropdowns filled at startup share one walk).
+            progress_callback (callable): Called as (fraction, description) while inspecting.
+        """
+        base_key = os.path.abspath(base_path)
+        extra = [os.path.abspath(p) for p in (extra_paths or []) if p and os.path.isfile(p)]
+        with self._lock:
+            previous = self._last_scans.get(base_key)
+            if previous and max_age_seconds > 0 and time.time() - previous[0] <= max_age_seconds and not exact:
+                paths = sorted(set(previous[1]) | set(extra))
+                missing = [p for p in paths if p not in self._entries]
+                if not missing:
+                    self.last_scan = {"files": len(paths), "inspected": 0, "reused": len(paths), "seconds": 0.0}
+                    return [self._entries[p] for p in paths]
+
+            start_time = time.time()
+            found = find_db_files(base_key) if os.path.isdir(base_key) else {}
+            signatures: Dict[str, Signature] = {}
+            for path, st in found.items():
+                try:
+                    signatures[path] = file_signature(path, st)
+                except OSError:
+                    continue
+            for path in extra:
+                if path not in signatures:
+                    try:
+                        signatures[path] = file_signature(path)
+                    except OSError:
+                        continue
+
+            stale = [path for path, signature in signatures.items()
+                     if path not in self._entries or self._entries[path].signature != signature
+                     or (exact and not self._entries[path].exact)]
+            refreshed: List[DbInfo] = []
+            if stale:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(stale))) as pool:
+                    futures = [pool.submit(inspect_db_file, path, exact, signatures[path]) for path in stale]
+                    for done, future in enumerate(futures, start=1):
+                        refreshed.append(future.result())
+                        if progress_callback:
+                            progress_callback(done / len(futures), f"Inspected {done}/{len(futures)} databases")
+            for entry in refreshed:
+                self._entries[entry.path] = entry
+
+            prefix = base_key.rstrip(os.sep) + os.sep
+            removed = [path for path in self._entries
+                       if path.startswith(prefix) and path not in signatures]
+            for path in removed:
+                del self._entries[path]
+            self._save(refreshed, removed)
+
+            paths = sorted(signatures)
+            self._last_scans[base_key] = (time.time(), sorted(found))
+            self.last_scan = {"files": len(paths), "inspected": len(stale), "reused": len(paths) - len(stale),
+                              "seconds": time.time() - start_time}
+            return [self._entries[p] for p in paths]
+
+    def get(self, path: str) -> Optional[DbInfo]:
+        """The cached entry of a file, if it is still current (inspected now if it is not)."""
+        path = os.path.abspath(path)
+        try:
+            signature = file_signature(path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.signature == signature:
+                return entry
+        entry = inspect_db_file(path, signature=signature)
+        with self._lock:
+            self._entries[path] = entry
+            self._save([entry])
+        return entry
+
+    def exact_count(self, path: str, table: Optional[str] = None) -> Optional[int]:
+        """COUNT(*) of one table (the main table by default), on demand; the catalog keeps the result."""
+        entry = self.get(path)
+        if entry is None:
+            return None
+        table = table or entry.main_table()
+        if table is None:
+            return None
+        conn = sqlite3.connect(f"file:{entry.path}?mode=ro", uri=True, timeout=5.0)
+        try:
+            count = exact_row_count(conn, table)
+        finally:
+            conn.close()
+        with self._lock:
+            entry.tables[table] = count
+            entry.exact_tables.add(table)
+            self._save([entry])
+        return count
+
+    def format_last_scan(self) -> str:
+        scan = self.last_scan
+        if not scan:
+            return "Database catalog: no scan yet."
+        return (f"Database catalog: {scan['files']} databases, {scan['inspected']} inspected, "
+                f"{scan['reused']} reused from cache ({scan['seconds']:.2f}s).")
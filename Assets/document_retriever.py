@@ -0,0 +1,384 @@
+# document_retriever.py
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+from chroma_sync import shared_sources
+from chunk_merge import merge_adjacent_chunks, format_chunk_ids
+from concurrent_retrieval import StreamHandle, concurrent_retrieve, iter_sub_queries
+from lexical_index import reciprocal_rank_fusion
+from retrieval_cache import collection_version
+from token_budget import pack_context
+from tracing import get_tracer
+
+DEFAULT_REFINE_MODEL = "lmstudio/Meta-Llama-3.1"
+
+tracer = get_tracer()
+
+
+class DocumentRetriever:
+    """
+    Retrieval for one chat turn: query refinement ('keywords', 'llm', 'combined',
+    'original_query', 'hybrid'), vector / lexical search, doc_id lookups, and the
+    context block (neighbouring chunks merged, packed into a token budget).
+    Holds no index itself, so one instance per turn is cheap; the collection,
+    lexical index and caches are passed in and shared.
+    """
+
+    def __init__(self, vectordb: Any, openai_client: Any = None,
+                 lexical_index: Any = None, retrieval_cache: Any = None, context_token_budget: int = 0,
+                 token_counter: Any = None, merge_adjacent: bool = True, refine_model: str = DEFAULT_REFINE_MODEL,
+                 refine_deadline_seconds: float = 6.0, max_sub_queries: int = 3):
+        """
+        Args:
+            vectordb: Chroma or NumpyVectorStore collection to search.
+            openai_client: OpenAI-compatible client for the LLM query refinement ('llm', 'combined').
+            lexical_index: Optional LexicalIndex (FTS5) used by method 'hybrid'.
+            retrieval_cache: Optional RetrievalCache shared across turns and sessions.
+            context_token_budget (int): Token budget of the retrieved context (0: pass all retrieved chunks).
+            token_counter: TokenCounter used for the budget (required for a budget to apply).
+            merge_adjacent (bool): Join neighbouring chunks of a document into one passage.
+            refine_model (str): Model used for the query refinement.
+            refine_deadline_seconds (float): 'combined': LLM sub-queries arriving later are not searched.
+            max_sub_queries (int): 'combined': LLM sub-queries searched at most.
+        """
+        self.vectordb = vectordb
+        self.openai_client = openai_client
+        self.lexical_index = lexical_index # Optional LexicalIndex (FTS5) used by method 'hybrid'
+        self.retrieval_cache = retrieval_cache # Optional RetrievalCache shared across turns and sessions
+        self.refine_model = refine_model
+        self.refine_deadline_seconds = refine_deadline_seconds
+        self.max_sub_queries = max_sub_queries
+        self.context_token_budget = context_token_budget # 0: pass all retrieved chunks
+        self.token_counter = token_counter
+        self.last_pack_info: Optional[Dict[str, int]] = None
+        self.merge_adjacent = merge_adjacent
+        self.last_merge_info: Optional[Dict[str, int]] = None
+        self.last_retrieved: List[List[Any]] = [] # [doc_id, chunk_id] of every chunk put into the context
+        self._trace_parent = None # 'retrieve' span; parent of the searches run on pool threads
+
+    @tracer.traced("retrieve")
+    def retrieve_documents(self, query: str, is_first_run: bool, k: int = 10, method: str = 'combined') -> Tuple[str, str, str]:
+        retrieved_text = ""
+        refined_query_for_display = query 
+        similar_docs = [] # Initialize similar_docs
+        self.last_retrieved = []
+        self._trace_parent = tracer.current_span()
+
+        if '{do not use retrieval}' in query:
+            return " ", "Retrieval skipped as per '{do not use retrieval}' instruction.", method
+
+        if query.lower().startswith("doc_id:"):
+            try:
+                doc_id_str = query.split(":", 1)[1].strip().split(",")[0]
+                doc_id_val = int(doc_id_str)
+                method = "direct_doc_id_search"
+                similar_docs_content = self.search_vectordb_by_id_chat('ID', doc_id_val, k)
+                
+                if similar_docs_content and similar_docs_content != "No documents found.":
+                    refined_query_for_display = f"Found documents for ID: {doc_id_val}"
+                else:
+                    refined_query_for_display = f"No documents found for ID: {doc_id_val}"
+                return similar_docs_content, refined_query_for_display, method
+            except ValueError:
+                return "Error: Invalid Doc ID format. Must be an integer after 'doc_id:'.", "Invalid Doc ID", method
+            except Exception as e:
+                return f"Error during doc_id search: {e}", "Doc ID Search Error", method
+
+        if is_first_run:
+            refined_query_for_retrieval = "" 
+            refined_query_for_display = "Initial greeting, no retrieval performed."
+        else:
+            actual_query_for_llm_refinement = query.replace('{no history}', '').strip()
+            cached_results, cache_version = None, None
+            if self.retrieval_cache is not None:
+                cache_version = collection_version(self.vectordb)
+                cached_results = self.retrieval_cache.get_results(actual_query_for_llm_refinement, method, k, cache_version)
+            if cached_results is not None:
+                similar_docs = cached_results["docs"]
+                refined_query_for_display = cached_results["refined_query"]
+            else:
+                if method == 'keywords':
+                    refined_query_for_retrieval = self.extract_keywords(actual_query_for_llm_refinement)
+                elif method == 'llm':
+                    refined_query_for_retrieval = self.generate_useful_query(actual_query_for_llm_refinement)
+                elif method == 'combined':
+                    # Raw query is searched right away; LLM sub-queries are searched as they stream in
+                    keywords = self.extract_keywords(actual_query_for_llm_refinement)
+                    refined_query_for_retrieval = " ".join(actual_query_for_llm_refinement.replace('{', ' ').replace('}', ' ').split())
+                elif method == 'hybrid':
+                    # No LLM rewrite: exact terms (gene names, accessions, authors) must reach the lexical index
+                    refined_query_for_retrieval = actual_query_for_llm_refinement.replace('{', ' ').replace('}', ' ').strip()
+                else: 
+                    refined_query_for_retrieval = actual_query_for_llm_refinement
+            
+                refined_query_for_display = refined_query_for_retrieval 
+
+                if self.is_query_meaningful(refined_query_for_retrieval):
+                    cacheable = True
+                    try:
+                        if method == 'hybrid':
+                            similar_docs = self.hybrid_search(refined_query_for_retrieval, k=k)
+                        elif method == 'combined':
+                            similar_docs, pipeline_info = concurrent_retrieve(
+                                refined_query_for_retrieval, self.vector_search, k=k,
+                                sub_query_source=self.stream_sub_queries,
+                                extra_queries=[keywords] if keywords else None,
+                                deadline_seconds=self.refine_deadline_seconds)
+                            refined_query_for_display = " | ".join(
+                                [refined_query_for_retrieval] + ([keywords] if keywords else []) + pipeline_info["sub_queries"])
+                            if pipeline_info["refine_timed_out"] or pipeline_info["late"]:
+                                cacheable = False  # Deadline-degraded top-k: the next ask gets a full retrieval
+                                refined_query_for_display += (f"  \n(Deadline {self.refine_deadline_seconds:.0f}s reached: "
+                                                              f"{'LLM refinement cut off, ' if pipeline_info['refine_timed_out'] else ''}"
+                                                              f"{pipeline_info['late']} late search(es) dropped)")
+                        else:
+                            similar_docs = self.vector_search(refined_query_for_retrieval, k=k)
+                        if self.retrieval_cache is not None and cacheable:
+                            self.retrieval_cache.put_results(actual_query_for_llm_refinement, method, k, cache_version,
+                                                             similar_docs, refined_query_for_display)
+                    except Exception as e:
+                        print(f"Error during similarity search: {e}")
+                        return f"Error during similarity search: {e}", refined_query_for_display, method
+                else:
+                    refined_query_for_display = "No meaningful query generated. No retrieval performed."
+                    return " ", refined_query_for_display, method
+        
+        if similar_docs:
+            with tracer.span("build_context", chunks=len(similar_docs)):
+                if self.merge_adjacent:
+                    similar_docs, self.last_merge_info = merge_adjacent_chunks(similar_docs)
+                if self.token_counter is not None and self.context_token_budget > 0:
+                    retrieved_text, packed_docs, packed_tokens, dropped = pack_context(
+                        similar_docs, self.context_token_budget, self.token_counter, self.format_retrieved_chunk)
+                    self.last_pack_info = {"included": len(packed_docs), "retrieved": len(similar_docs),
+                                           "tokens": packed_tokens, "dropped": dropped}
+                else:
+                    packed_docs = similar_docs
+                    for i, doc in enumerate(similar_docs):
+                        retrieved_text += self.format_retrieved_chunk(doc)
+                self.last_retrieved = [[doc.metadata.get('doc_id'), chunk_id] for doc in packed_docs
+                                       for chunk_id in (doc.metadata.get('chunk_ids') or [doc.metadata.get('chunk_id')])]
+        else:
+            if not is_first_run : 
+                 return "No relevant documents found for your query.", refined_query_for_display, method
+
+        return retrieved_text.strip(), refined_query_for_display, method
+
+    @staticmethod
+    def format_retrieved_chunk(doc: Any) -> str:
+        doc_id = doc.metadata.get('doc_id', 'N/A')
+        if doc.metadata.get('source_doc_ids'): # Near-duplicate text indexed once for several documents
+            doc_id = f"{doc_id} (also in {', '.join(doc.metadata['source_doc_ids'].split(',')[1:])})"
+        chunk_ids = doc.metadata.get('chunk_ids')
+        if chunk_ids and len(chunk_ids) > 1:
+            return f"**Document {doc_id}, Chunks {format_chunk_ids(chunk_ids)}**:\n{doc.page_content}\n\n"
+        chunk_id = doc.metadata.get('chunk_id', 'N/A')
+        return f"**Document {doc_id}, Chunk {chunk_id}**:\n{doc.page_content}\n\n"
+
+    def hybrid_search(self, query: str, k: int = 10, candidates_per_method: Optional[int] = None) -> List[Any]:
+        """
+        Runs the FTS5 (BM25) search and the vector search concurrently and merges both
+        rankings with reciprocal-rank fusion. Falls back to vector search alone when no
+        lexical index is available or the lexical search fails.
+        """
+        if self.lexical_index is None:
+            return self.vector_search(query, k=k)
+        candidates = candidates_per_method or max(2 * k, 10)
+
+        def lexical_search():
+            with tracer.span("lexical_search", parent=self._trace_parent):
+                return self.lexical_index.search(query, candidates)
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            vector_future = pool.submit(self.vector_search, query, k=candidates)
+            lexical_future = pool.submit(lexical_search)
+            vector_docs = vector_future.result()
+            try:
+                lexical_hits = lexical_future.result()
+            except Exception as e:
+                print(f"Lexical search failed, using vector results only: {e}")
+                lexical_hits = []
+        return reciprocal_rank_fusion([vector_docs, lexical_hits], k=k)
+
+    def vector_search(self, query: str, k: int = 10) -> List[Any]:
+        """Similarity search that reuses cached query embeddings when the store can search by vector."""
+        # Runs on pool threads for 'combined' / 'hybrid': parent the span explicitly
+        with tracer.span("vector_search", parent=self._trace_parent, k=k):
+            return self._vector_search(query, k)
+
+    def _vector_search(self, query: str, k: int) -> List[Any]:
+        embeddings = getattr(self.vectordb, 'embeddings', None)
+        if (self.retrieval_cache is None or embeddings is None
+                or not hasattr(self.vectordb, 'similarity_search_by_vector')):
+            return self.vectordb.similarity_search(query, k=k)
+        model = getattr(embeddings, 'model', type(embeddings).__name__)
+        query_vector = self.retrieval_cache.get_embedding(model, query)
+        if query_vector is None:
+            query_vector = embeddings.embed_query(query)
+            self.retrieval_cache.put_embedding(model, query, query_vector)
+        return self.vectordb.similarity_search_by_vector(query_vector, k=k)
+
+    def stream_sub_queries(self, query: str, stream_handle: Optional[StreamHandle] = None) -> Iterator[str]:
+        """
+        LLM search queries for `query`, yielded one at a time while the completion streams.
+        The stream is attached to `stream_handle`, so the pipeline can cut it off at its deadline.
+        """
+        if not self.openai_client:
+            return
+        refine_model = self.refine_model
+        cache_model_key = f"{refine_model}#sub_queries"
+        if self.retrieval_cache is not None:
+            cached_sub_queries = self.retrieval_cache.get_refined(query, cache_model_key)
+            if cached_sub_queries is not None:
+                yield from cached_sub_queries.split("\n")
+                return
+        instruction = (f"Write up to {self.max_sub_queries} short search queries for a semantic vector search "
+                       "that together cover the following question. Use the specific named entities, "
+                       "technical terms and key phrases of the question. "
+                       "Write one query per line, with no numbering, explanations or other text.")
+        # Consumed on the pipeline's producer thread and possibly abandoned at the deadline:
+        # the span is ended explicitly rather than held open as a context across yields
+        span = tracer.start_span("refine_sub_queries", parent=self._trace_parent)
+        produced = []
+        stream = None
+        try:
+            stream = self.openai_client.chat.completions.create(
+                model=refine_model,
+                messages=[
+                    {"role": "system", "content": "You are an expert at extracting precise semantic search terms from user queries."},
+                    {"role": "user", "content": f"{instruction}\nQuestion: \"{query}\"\nSearch queries:"}
+                ],
+                temperature=0.2, stream=True,
+            )
+            if stream_handle is not None and not stream_handle.attach(stream):
+                return
+            for sub_query in iter_sub_queries(stream, max_queries=self.max_sub_queries):
+                produced.append(sub_query)
+                yield sub_query
+        finally:
+            if stream is not None:
+                # Also after max_sub_queries lines: the rest of the completion is not needed
+                stream.close()
+            span.set(sub_queries=len(produced)).end()
+        if produced and self.retrieval_cache is not None:
+            self.retrieval_cache.put_refined(query, cache_model_key, "\n".join(produced))
+
+    def is_query_meaningful(self, query: str) -> bool:
+        if not query or len(query.strip()) < 3: return False
+        query_lower = query.lower()
+        meaningless_phrases = [
+            'no content found', 'no keywords', 'not specified', 'empty query',
+            'no llm', 'no retrieval', 'refined query', 'test', 'tests', 'search for'
+        ]
+        if any(phrase in query_lower for phrase in meaningless_phrases): return False
+        if query_lower == query.lower().strip() and len(query.split()) < 2 and len(query) < 5 : 
+            if query_lower not in ["hello", "hi"]: 
+                pass
+        return True
+
+    def extract_keywords(self, query: str) -> str:
+        keywords = re.findall(r'\{(.*?)\}', query)
+        return ', '.join(keywords) if keywords else ''
+
+    @tracer.traced("refine_query")
+    def generate_useful_query(self, query: str) -> str:
+        if not self.openai_client:
+            print("Warning: OpenAI client not available for generate_useful_query. Returning original query.")
+            return query
+        instruction = ("Extract named entities, specific technical terms, and key concepts "
+                       "from the following query that are most relevant for a semantic vector search. "
+                       "Provide ONLY these entities/terms/concepts, separated by spaces or commas. "
+                       "Focus on proper nouns, specific technologies, or multi-word key phrases. "
+                       "Do not include conversational filler or instructions like 'search for'.")
+        prompt_template_str = "{instruction}\nOriginal Query: \"{query}\"\nRefined Search Terms:"
+        prompt = prompt_template_str.format(query=query, instruction=instruction)
+        refine_model = self.refine_model
+        if self.retrieval_cache is not None:
+            cached_refinement = self.retrieval_cache.get_refined(query, refine_model)
+            if cached_refinement is not None:
+                return cached_refinement
+        try:
+            completion = self.openai_client.chat.completions.create(
+                model=refine_model, 
+                messages=[
+                    {"role": "system", "content": "You are an expert at extracting precise semantic search terms from user queries."},
+                    {"role": "user", "content": prompt}
+                ],              
+                temperature=0.2, stream=False,
+            )
+            full_response = completion.choices[0].message.content.strip()
+            if full_response and self.retrieval_cache is not None:
+                self.retrieval_cache.put_refined(query, refine_model, full_response)
+            return full_response if full_response else query 
+        except Exception as e:
+            print(f"Error in LLM query generation: {e}")
+            return query
+
+    def search_vectordb_by_id_chat(self, search_field: str, search_value: Any, k: int = 3) -> str:
+        if not self.vectordb or not hasattr(self.vectordb, '_collection'):
+            return "Error: VectorDB not properly initialized for ID search."
+        collection = self.vectordb._collection
+        try:
+            results = collection.get(where={"doc_id": search_value}) 
+            shared = False
+            if not (results and results['documents']):
+                # All of the document's chunks may have been collapsed into near-duplicates of another document
+                results = self.shared_chunks_for(collection, search_value)
+                shared = True
+            if results and results['documents']:
+                doc_meta_pairs = []
+                for i in range(len(results['ids'])): 
+                    if i < len(results['metadatas']) and results['metadatas'][i] is not None:
+                        doc_meta_pairs.append({
+                            "content": results['documents'][i],
+                            "metadata": results['metadatas'][i],
+                            "id": results['ids'][i] 
+                        })
+                    else: 
+                         doc_meta_pairs.append({
+                            "content": results['documents'][i],
+                            "metadata": {"doc_id": search_value, "chunk_id": "unknown"}, 
+                            "id": results['ids'][i]
+                        })
+                sorted_chunks = sorted(
+                    doc_meta_pairs,
+                    key=lambda x: x["metadata"].get('chunk_id', float('inf')) 
+                )
+                formatted_texts = []
+                for item in sorted_chunks:
+                    chunk_id = item["metadata"].get('chunk_id', 'N/A')
+                    title = item["metadata"].get('Title', 'N/A')
+                    if shared:
+                        header = (f"**Document ID {search_value}, shared chunk (indexed under Document "
+                                  f"{item['metadata'].get('doc_id', 'N/A')}, Title: {title}, Chunk {chunk_id})**")
+                    else:
+                        header = f"**Document ID {search_value} (Title: {title}), Chunk {chunk_id}**"
+                    doc_text = f"{header}:\n{item['content']}\n"
+                    formatted_texts.append(doc_text.strip())
+                return "\n\n".join(formatted_texts) if formatted_texts else "No content found for this Document ID after filtering/sorting."
+            else:
+                return "No documents found for this Document ID."
+        except Exception as e:
+            print(f"Error searching vectordb by ID: {e}")
+            return f"Error occurred during Document ID search: {str(e)}"
+
+    @staticmethod
+    def shared_chunks_for(collection: Any, doc_id: Any, page_size: int = 2000) -> Dict[str, List[Any]]:
+        """
+        Chunks indexed under another document that also stand for `doc_id` (its
+        near-duplicate text, listed in their 'source_doc_ids'), in `collection.get` form.
+        """
+        found: Dict[str, List[Any]] = {"ids": [], "documents": [], "metadatas": []}
+        offset = 0
+        while True:
+            page = collection.get(where={"duplicate_count": {"$gte": 1}}, include=["documents", "metadatas"],
+                                  limit=page_size, offset=offset)
+            ids = page.get("ids") or []
+            for chunk_id, text, metadata in zip(ids, page.get("documents") or [], page.get("metadatas") or []):
+                if any(str(source) == str(doc_id) for source, _ in shared_sources(metadata or {})):
+                    found["ids"].append(chunk_id)
+                    found["documents"].append(text)
+                    found["metadatas"].append(metadata)
+            if len(ids) < page_size:
+                return found
+            offset += page_size
@@ -0,0 +1,166 @@
+# embedding_cache.py
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+
+class EmbeddingCache:
+    """
+    On-disk, content-addressed store of embeddings shared by all vector DB builds.
+
+    Vectors are stored as float32 blobs in a small SQLite file, keyed by a hash of
+    (model name, normalized chunk text). Rebuilding a ChromaDB from mostly unchanged
+    text then costs local lookups instead of LM Studio calls. The cache is bounded by
+    `max_entries`; the least recently used entries are evicted first.
+    """
+
+    def __init__(self, cache_path: str = "embedding_cache.sqlite3", max_entries: int = 500000):
+        """
+        Args:
+            cache_path (str): SQLite file holding the cache (created if missing).
+            max_entries (int): Maximum number of cached vectors before eviction.
+        """
+        self.cache_path = Path(cache_path)
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS embeddings
+                              (Key TEXT PRIMARY KEY,
+                              Model TEXT,
+                              Dim INTEGER,
+                              Vector BLOB,
+                              Last_Used REAL)''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (Last_Used)")
+        self._conn.commit()
+        # Entry count kept in memory so put_many does not COUNT(*) the table; recounted only
+        # when it crosses max_entries (other processes sharing the file make it drift)
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Unicode NFC plus collapsed whitespace, so cosmetic differences share one entry."""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    @classmethod
+    def make_key(cls, model: str, text: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(model.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(cls.normalize_text(text).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text])[0]
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Looks up several texts at once.
+
+        Returns:
+            list: For each text, the cached vector or None on a miss.
+        """
+        keys = [self.make_key(model, t) for t in texts]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                part = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT Key, Vector FROM embeddings WHERE Key IN ({placeholders})", part
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET Last_Used = ? WHERE Key = ?",
+                                       [(now, k) for k in found])
+                self._conn.commit()
+            results = [found.get(k) for k in keys]
+            hit_count = sum(1 for r in results if r is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put(self, model: str, text: str, vector: List[float]) -> None:
+        self.put_many(model, [text], [vector])
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]) -> None:
+        if not texts:
+            return
+        now = time.time()
+        rows = [(self.make_key(model, t), model, len(v), array("f", v).tobytes(), now)
+                for t, v in zip(texts, vectors)]
+        unique_keys = list(dict.fromkeys(row[0] for row in rows))
+        with self._lock:
+            replaced = 0
+            for start in range(0, len(unique_keys), 500):
+                part = unique_keys[start:start + 500]
+                replaced += self._conn.execute(
+                    f"SELECT COUNT(*) FROM embeddings WHERE Key IN ({','.join('?' * len(part))})", part
+                ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (Key, Model, Dim, Vector, Last_Used) VALUES (?, ?, ?, ?, ?)",
+                rows)
+            self._conn.commit()
+            self._entries += len(unique_keys) - replaced
+            self._evict_if_needed()
+
+    def _evict_if_needed(self) -> None:
+        if self._entries <= self.max_entries:
+            return
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._entries = count
+        if count <= self.max_entries:
+            return
+        # Evict down to 90% of the bound so eviction does not run on every insert
+        to_remove = count - int(self.max_entries * 0.9)
+        removed = self._conn.execute(
+            "DELETE FROM embeddings WHERE Key IN "
+            "(SELECT Key FROM embeddings ORDER BY Last_Used ASC LIMIT ?)", (to_remove,)).rowcount
+        self._conn.commit()
+        self._entries -= removed
+        self.evictions += removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+        }
+
+    def reset_counters(self) -> None:
+        self.hits = self.misses = self.evictions = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._entries = 0
+        self.reset_counters()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,186 @@
+# embedding_engine.py
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Optional
+from tracing import get_tracer
+
+
+class BatchedEmbeddingEngine:
+    """
+    Sends texts to an OpenAI-compatible embeddings endpoint (LM Studio) in batches.
+
+    Each request carries a list of texts instead of a single one, and at most
+    `max_in_flight` requests are outstanding at any time. The output keeps the
+    order of the input texts. A batch that fails is split in half and retried,
+    down to single texts, which get a few plain retries before giving up.
+    With a `cache` (see embedding_cache.EmbeddingCache), only texts that are not
+    cached yet are sent to the server, and new vectors are written back.
+    """
+
+    def __init__(self, client: Any, model: str = "nomic-embed-text",
+                 batch_size: int = 64, max_in_flight: int = 4,
+                 max_retries: int = 2, retry_backoff: float = 0.5,
+                 progress_callback: Optional[callable] = None, cache: Any = None):
+        """
+        Args:
+            client: OpenAI client (or compatible) exposing `embeddings.create`.
+            model (str): Embedding model name as known to the server.
+            batch_size (int): Number of texts per request.
+            max_in_flight (int): Maximum number of concurrent requests.
+            max_retries (int): Retries for a single text before the error is raised.
+            retry_backoff (float): Base sleep in seconds between single-text retries.
+            progress_callback (callable): Optional `callback(fraction, description)`,
+                                          same signature as in process_documents_to_sqlite.
+            cache: Optional embedding cache with `get_many`/`put_many`.
+        """
+        self.client = client
+        self.model = model
+        self.batch_size = max(1, int(batch_size))
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_retries = max(0, int(max_retries))
+        self.retry_backoff = retry_backoff
+        self.progress_callback = progress_callback
+        self.cache = cache
+        self.last_stats: Dict[str, Any] = {}
+        self._stats_lock = threading.Lock()
+        self._tracer = get_tracer()
+        self._trace_parent = None  # Span active when embed() was called; parent of the pool threads' request spans
+
+    @staticmethod
+    def prepare_text(text: str) -> str:
+        """Same normalization as the single-text `get_embedding` path."""
+        return text.replace("\n", " ")
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds all texts and returns the vectors in input order.
+
+        Args:
+            texts (list): Texts to embed.
+
+        Returns:
+            list: One embedding (list of floats) per input text.
+        """
+        if not self.client:
+            raise ConnectionError("OpenAI client is not available for embeddings.")
+        total = len(texts)
+        results: List[Optional[List[float]]] = [None] * total
+        self.last_stats = {"chunks": total, "requests": 0, "splits": 0, "cache_hits": 0,
+                           "seconds": 0.0, "chunks_per_s": 0.0}
+        if total == 0:
+            return []
+
+        start_time = time.time()
+        self._trace_parent = self._tracer.current_span()
+        prepared = [self.prepare_text(t) for t in texts]
+        if self.cache is not None:
+            cached = self.cache.get_many(self.model, prepared)
+            for i, vector in enumerate(cached):
+                results[i] = vector
+        missing = [i for i in range(total) if results[i] is None]
+        self.last_stats["cache_hits"] = total - len(missing)
+        self._tracer.count("embedding_texts_total", total)
+        self._tracer.count("embedding_cache_hits_total", total - len(missing))
+        batches = [missing[start:start + self.batch_size]
+                   for start in range(0, len(missing), self.batch_size)]
+
+        done = total - len(missing)
+        if done:
+            self._report(done, total, start_time)
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            pending = {}
+            batch_iter = iter(batches)
+            exhausted = False
+            while pending or not exhausted:
+                # Keep the number of outstanding requests bounded
+                while not exhausted and len(pending) < self.max_in_flight:
+                    try:
+                        indices = next(batch_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    batch = [prepared[i] for i in indices]
+                    pending[pool.submit(self._embed_batch, batch)] = (indices, batch)
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    indices, batch = pending.pop(future)
+                    vectors = future.result()  # Propagates the error after retries were exhausted
+                    for i, vector in zip(indices, vectors):
+                        results[i] = vector
+                    if self.cache is not None:
+                        self.cache.put_many(self.model, batch, vectors)
+                    done += len(indices)
+                    self._report(done, total, start_time)
+
+        elapsed = time.time() - start_time
+        self.last_stats["seconds"] = elapsed
+        self.last_stats["chunks_per_s"] = total / elapsed if elapsed > 0 else float(total)
+        return results  # type: ignore[return-value]
+
+    def _report(self, done: int, total: int, start_time: float) -> None:
+        elapsed = time.time() - start_time
+        rate = done / elapsed if elapsed > 0 else 0.0
+        self.last_stats["chunks_per_s"] = rate
+        if self.progress_callback:
+            try:
+                self.progress_callback(done / total, f"Embedding chunks {done}/{total} ({rate:.1f} chunks/s)")
+            except Exception as e:
+                print(f"Warning: embedding progress callback failed: {e}")
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.last_stats[key] = self.last_stats.get(key, 0) + 1
+
+    def _request(self, texts: List[str]) -> List[List[float]]:
+        self._count("requests")
+        with self._tracer.span("embedding.request", parent=self._trace_parent, texts=len(texts)):
+            response = self.client.embeddings.create(input=texts, model=self.model)
+        data = list(response.data)
+        if len(data) != len(texts):
+            raise ValueError(f"Embedding server returned {len(data)} vectors for {len(texts)} texts.")
+        # The API reports each vector's position; do not rely on response order
+        if all(getattr(item, "index", None) is not None for item in data):
+            data.sort(key=lambda item: item.index)
+        return [item.embedding for item in data]
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        try:
+            return self._request(texts)
+        except Exception as e:
+            if len(texts) > 1:
+                # Split the batch so one bad text (or an oversized request) does not fail the rest
+                self._count("splits")
+                middle = len(texts) // 2
+                return self._embed_batch(texts[:middle]) + self._embed_batch(texts[middle:])
+            return self._retry_single(texts, e)
+
+    def _retry_single(self, texts: List[str], first_error: Exception) -> List[List[float]]:
+        last_error = first_error
+        for attempt in range(1, self.max_retries + 1):
+            time.sleep(self.retry_backoff * attempt)
+            try:
+                return self._request(texts)
+            except Exception as e:
+                last_error = e
+        print(f"ERROR during embedding generation for text '{texts[0][:50]}...': {last_error}")
+        raise last_error
+
+
+def format_embedding_stats(stats: Dict[str, Any]) -> str:
+    """Short one-line summary of `BatchedEmbeddingEngine.last_stats` for status messages."""
+    if not stats or not stats.get("chunks"):
+        return ""
+    return (f"Embedded {stats['chunks']} chunks in {stats.get('seconds', 0.0):.2f}s "
+            f"({stats.get('chunks_per_s', 0.0):.1f} chunks/s, {stats.get('requests', 0)} requests, "
+            f"{stats.get('cache_hits', 0)} from cache).")
+
+
+def merge_embedding_stats(total: Dict[str, Any], stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Adds one `last_stats` into a running total (used when embedding in several windows)."""
+    for key in ("chunks", "requests", "splits", "cache_hits", "seconds"):
+        total[key] = total.get(key, 0) + stats.get(key, 0)
+    total["chunks_per_s"] = total["chunks"] / total["seconds"] if total["seconds"] > 0 else float(total["chunks"])
+    return total
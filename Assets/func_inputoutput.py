@@ -1,5 +1,7 @@
 import json
 import os
+import threading
+from collections import deque
 from pathlib import Path
 def save_settings_old(settings, filename='settings.json'):
     """
@@ -136,11 +138,154 @@ def manage_conversation_history(history, max_tokens=1500):
         message_tokens = count_tokens(message['content'])
         if total_tokens + message_tokens > max_tokens:
             break
-        trimmed_history.insert(0, message)
+        trimmed_history.append(message)
         total_tokens += message_tokens
     
+    trimmed_history.reverse()
     return trimmed_history
 
+
+class ConversationHistory:
+    """
+    Incremental conversation history for one chat session.
+
+    Each message's token count is computed once when it is appended, and a running
+    total is kept, so trimming to `max_tokens` only pops the oldest messages
+    (O(1) each) instead of re-walking and re-counting the whole history every turn.
+    Evicted messages are folded into a rolling summary on a background thread by
+    `summarizer(previous_summary, messages) -> str` (see make_llm_summarizer); the
+    turn never waits for it, it uses the latest summary available.
+    """
+
+    def __init__(self, max_tokens=1500, count_tokens=None, summarizer=None):
+        """
+        Args:
+            max_tokens (int): Token budget for the verbatim (most recent) messages.
+            count_tokens (callable): `count_tokens(text) -> int`; defaults to a whitespace word count,
+                                     the same estimate manage_conversation_history uses.
+            summarizer (callable): Optional `summarizer(previous_summary, messages) -> str`.
+        """
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens or (lambda text: len(text.split()))
+        self.summarizer = summarizer
+        self.messages = deque()  # (role, content, tokens)
+        self.total_tokens = 0
+        self.summary = ""
+        self._synced_pairs = []  # Gradio (user, assistant) pairs already appended
+        self._pending_eviction = []
+        self._lock = threading.Lock()
+        self._summary_thread = None
+        self._generation = 0  # Bumped by reset(); a summary started before it is discarded
+
+    def append(self, role, content):
+        """Adds one message and evicts the oldest ones beyond the token budget."""
+        tokens = self.count_tokens(content)
+        with self._lock:
+            self.messages.append((role, content, tokens))
+            self.total_tokens += tokens
+            while self.total_tokens > self.max_tokens and len(self.messages) > 1:
+                evicted = self.messages.popleft()
+                self.total_tokens -= evicted[2]
+                self._pending_eviction.append({"role": evicted[0], "content": evicted[1]})
+        if self._pending_eviction and self.summarizer is not None:
+            self._start_summary()
+
+    def sync_from_pairs(self, pairs):
+        """
+        Brings the history up to date with Gradio's chat history (list of [user, assistant] pairs).
+
+        Only pairs not seen before are appended. If the displayed history no longer starts
+        with what was appended (chat cleared or edited), the history is rebuilt.
+        """
+        pairs = [tuple(pair) for pair in pairs]
+        known = len(self._synced_pairs)
+        if pairs[:known] != self._synced_pairs:
+            self.reset()
+            known = 0
+        for user_msg, ai_msg in pairs[known:]:
+            if user_msg:
+                self.append("user", user_msg)
+            if ai_msg:
+                self.append("assistant", ai_msg)
+        self._synced_pairs = pairs
+
+    def reset(self):
+        with self._lock:
+            self.messages.clear()
+            self.total_tokens = 0
+            self.summary = ""
+            self._pending_eviction = []
+            self._generation += 1
+        self._synced_pairs = []
+
+    def prompt_messages(self):
+        """The rolling summary (if any) followed by the verbatim recent messages, as role/content dicts."""
+        with self._lock:
+            history = [{"role": role, "content": content} for role, content, _ in self.messages]
+            summary = self.summary
+        if summary:
+            history.insert(0, {"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+        return history
+
+    def wait_for_summary(self, timeout=None):
+        """Blocks until the background summary (if one is running) is finished."""
+        thread = self._summary_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _start_summary(self):
+        with self._lock:
+            if self._summary_thread is not None:
+                return  # The running thread picks up the new evictions before it exits
+            self._summary_thread = threading.Thread(target=self._summarize_pending, daemon=True)
+            self._summary_thread.start()
+
+    def _summarize_pending(self):
+        while True:
+            with self._lock:
+                batch, self._pending_eviction = self._pending_eviction, []
+                previous = self.summary
+                generation = self._generation
+                if not batch:
+                    self._summary_thread = None
+                    return
+            try:
+                updated = self.summarizer(previous, batch)
+            except Exception as e:
+                print(f"Summarization error: {e}")
+                with self._lock:
+                    if generation == self._generation:  # Keep the batch for the next attempt
+                        self._pending_eviction = batch + self._pending_eviction
+                    self._summary_thread = None  # The next eviction retries instead of looping on a failing summarizer
+                return
+            if updated:
+                with self._lock:
+                    if generation == self._generation:  # Not reset while the summarizer ran
+                        self.summary = updated
+
+
+def make_llm_summarizer(client, model, max_words=150):
+    """
+    Rolling-summary function for ConversationHistory using an OpenAI-compatible client
+    (e.g. the LM Studio client and model the app already uses).
+    """
+    def summarize(previous_summary, messages):
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        prompt = (f"Current summary of the conversation:\n{previous_summary or '(none)'}\n\n"
+                  f"Further messages:\n{transcript}\n\n"
+                  f"Update the summary so it covers everything above in at most {max_words} words. "
+                  f"Keep names, document IDs, technical terms and open questions. Reply with the summary only.")
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a context summarization assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.2, stream=False,
+        )
+        return response.choices[0].message.content.strip()
+    return summarize
+
 def summarize_history(history):
     """
     Optionally summarize conversation history if it becomes too long
@@ -193,19 +338,42 @@ def debounce(wait):
 
 
 
-import nltk
+nltk = None # Imported on the first word_count (nltk takes seconds to import)
+_punkt_checked = False
+_punkt_lock = threading.Lock() # word_count runs on Gradio workers and the summary thread
 def check_and_download_punkt():
-    """Checks if Punkt Sentence Tokenizer is downloaded; downloads if not."""
-    try:
-        punkt_path = nltk.data.find('tokenizers/punkt')
-        if not punkt_path:
+    """
+    Imports nltk and checks if Punkt Sentence Tokenizer is downloaded; downloads if not.
+    Runs once per process; concurrent callers wait until it is done. Without nltk,
+    word_count falls back to whitespace splitting.
+    """
+    global _punkt_checked, nltk
+    if _punkt_checked:
+        return
+    with _punkt_lock:
+        if _punkt_checked:
+            return
+        try:
+            import nltk as nltk_module
+        except ImportError as e:
+            print(f"Warning: nltk is not available ({e}). Word counts use whitespace splitting.")
+            _punkt_checked = True
+            return
+        try:
+            punkt_path = nltk_module.data.find('tokenizers/punkt')
+            if not punkt_path:
+                print("Downloading Punkt Sentence Tokenizer...")
+                nltk_module.download('punkt')
+        except LookupError:
             print("Downloading Punkt Sentence Tokenizer...")
-            nltk.download('punkt')
-    except LookupError:
-        print("Downloading Punkt Sentence Tokenizer...")
-        nltk.download('punkt')
-    except Exception as e:
-        print(f"An error occurred while checking or downloading Punkt: {e}")
+            nltk_module.download('punkt')
+        except Exception as e:
+            print(f"An error occurred while checking or downloading Punkt: {e}")
+        nltk = nltk_module
+        _punkt_checked = True # Only now: other threads skip the lock and use nltk right away
+
+def _word_tokenize(text):
+    return nltk.word_tokenize(text) if nltk is not None else text.split()
 
 def word_count(messages):
     """Counts words in a string or a list of dictionaries (messages)."""
@@ -215,7 +383,7 @@ def word_count(messages):
     if isinstance(messages, str):
         # If the input is a single string, tokenize directly
         try:
-            tokens = nltk.word_tokenize(messages)
+            tokens = _word_tokenize(messages)
             total_tokens += len(tokens)  # Update the total token count
         except Exception as e:
             print(f"Error during tokenization of input text: {e}")
@@ -232,7 +400,7 @@ def word_count(messages):
                 content = ''  # Default to empty string if content is not a string
             # Tokenize the content and handle any exceptions
             try:
-                tokens = nltk.word_tokenize(content)
+                tokens = _word_tokenize(content)
                 total_tokens += len(tokens)  # Update the total token count
             except Exception as e:
                 print(f"Error during tokenization of message: {e}. Content: {content}")
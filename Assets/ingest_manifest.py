@@ -0,0 +1,245 @@
+# ingest_manifest.py
+import hashlib
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+MANIFEST_TABLE = "ingest_manifest"
+
+# Statuses of files that do not need any work on the next run
+SKIP_STATUSES = ("done", "duplicate")
+
+
+def file_content_hash(file_path: Path, block_size: int = 1 << 20) -> str:
+    """sha256 of a file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_file_name(file_path: Path, base_dir: Path) -> str:
+    """
+    Source_File value of an input file: its path relative to `base_dir` (the database
+    folder), with '/' separators, so files of the same name in different folders differ.
+    """
+    file_path = Path(file_path).resolve()
+    try:
+        return Path(os.path.relpath(file_path, Path(base_dir).resolve())).as_posix()
+    except ValueError:  # On another drive than the database (Windows)
+        return file_path.as_posix()
+
+
+class IngestManifest:
+    """
+    Per-file record of what has been ingested into a document database.
+
+    One row per input file (absolute path) with its size, mtime, content hash, the
+    document_table IDs it produced (First_ID .. First_ID + Record_Count - 1), a status
+    and, for failed files, the error. `check_file` decides, before any GROBID or
+    parsing work, whether a file is new, changed, unchanged or a duplicate of an
+    already ingested file. Size and mtime are compared first; the file is only hashed
+    when they differ.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, document_table: str = "document_table"):
+        """
+        Args:
+            conn (sqlite3.Connection): Connection to the ingestion database.
+            document_table (str): Table holding the ingested documents.
+        """
+        self.conn = conn
+        self.document_table = document_table
+        existed = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?",
+                               (MANIFEST_TABLE,)).fetchone() is not None
+        with conn:
+            conn.execute(f'''CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE}
+                            (Path TEXT PRIMARY KEY,
+                            Size INTEGER,
+                            Mtime REAL,
+                            Content_Hash TEXT,
+                            First_ID INTEGER,
+                            Record_Count INTEGER,
+                            Status TEXT,
+                            Updated REAL,
+                            Error TEXT)''')
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{MANIFEST_TABLE}_hash ON {MANIFEST_TABLE} (Content_Hash)")
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({MANIFEST_TABLE})")}
+            if "Error" not in columns:  # Manifest written before errors were recorded
+                conn.execute(f"ALTER TABLE {MANIFEST_TABLE} ADD COLUMN Error TEXT")
+        # A database filled before the manifest existed: files already in document_table
+        # (matched by Source_File) are adopted instead of being ingested again
+        self.adopt_legacy_rows = not existed
+        self._legacy_rows: Optional[Dict[str, Tuple[int, int, int]]] = None
+        self._by_path: Dict[str, Dict[str, Any]] = {}
+        self._by_hash: Dict[str, Dict[str, Any]] = {}
+        # Content hash of a file queued in this run -> paths recorded as its duplicates meanwhile
+        self._queued_duplicates: Dict[str, List[str]] = {}
+        rows = conn.execute(f"SELECT Path, Size, Mtime, Content_Hash, First_ID, Record_Count, Status FROM {MANIFEST_TABLE}")
+        for path, size, mtime, content_hash, first_id, record_count, status in rows:
+            entry = {"path": path, "size": size, "mtime": mtime, "content_hash": content_hash,
+                     "first_id": first_id, "record_count": record_count, "status": status}
+            self._by_path[path] = entry
+            if status == "done":
+                self._by_hash[content_hash] = entry
+
+    @staticmethod
+    def path_key(file_path: Path) -> str:
+        return str(Path(file_path).resolve())
+
+    def check_file(self, file_path: Path, file_name: str) -> Dict[str, Any]:
+        """
+        Classifies a file against the manifest.
+
+        Args:
+            file_path (Path): The input file.
+            file_name (str): Its Source_File value (see source_file_name).
+
+        Returns:
+            dict: "action" is one of "new", "changed", "unchanged", "duplicate";
+                  plus path, size, mtime, content_hash and the previous first_id /
+                  record_count (None for new files).
+        """
+        key = self.path_key(file_path)
+        stat = os.stat(file_path)
+        check = {"path": key, "size": stat.st_size, "mtime": stat.st_mtime, "content_hash": None,
+                 "first_id": None, "record_count": None}
+        entry = self._by_path.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            check.update(content_hash=entry["content_hash"], first_id=entry["first_id"],
+                         record_count=entry["record_count"])
+            check["action"] = "unchanged" if entry["status"] in SKIP_STATUSES else "changed"
+            return check
+
+        check["content_hash"] = file_content_hash(file_path)
+        if entry:
+            check.update(first_id=entry["first_id"], record_count=entry["record_count"])
+            if entry["content_hash"] == check["content_hash"] and entry["status"] in SKIP_STATUSES:
+                # Touched but not modified: remember the new mtime so the next run skips without hashing
+                self._write_entry(check, entry["status"])
+                check["action"] = "unchanged"
+            else:
+                check["action"] = "changed"
+                self._queue_hash(check)
+            return check
+
+        same_content = self._by_hash.get(check["content_hash"])
+        if same_content:
+            check.update(first_id=same_content["first_id"], record_count=same_content["record_count"])
+            self._write_entry(check, "duplicate")
+            if same_content["status"] == "queued":
+                self._queued_duplicates[check["content_hash"]].append(check["path"])
+            check["action"] = "duplicate"
+            return check
+
+        if self.adopt_legacy_rows:
+            if self._legacy_rows is None:
+                # One pass over the table instead of one (possibly unindexed) lookup per file
+                self._legacy_rows = {name: (first_id, last_id, count) for name, first_id, last_id, count in self.conn.execute(
+                    f"SELECT Source_File, MIN(ID), MAX(ID), COUNT(*) FROM {self.document_table} GROUP BY Source_File")}
+            # Rows written before Source_File held relative paths only carry the bare file name
+            legacy_name = file_name if file_name in self._legacy_rows else os.path.basename(file_name)
+            if legacy_name in self._legacy_rows:
+                first_id, last_id, count = self._legacy_rows.pop(legacy_name)
+                if last_id - first_id + 1 != count:
+                    # IDs interleaved with other files' rows: not a range this file owns. First_ID stays
+                    # NULL, so re-processing deletes the rows by Source_File and uses fresh IDs.
+                    first_id = None
+                check.update(first_id=first_id, record_count=count)
+                self._write_entry(check, "done")
+                check["action"] = "unchanged"
+                return check
+
+        check["action"] = "new"
+        self._queue_hash(check)
+        return check
+
+    def _queue_hash(self, check: Dict[str, Any]) -> None:
+        # Known as soon as the file is queued, so an identical file later in the same run is a duplicate
+        self._by_hash[check["content_hash"]] = {**check, "first_id": None, "record_count": None, "status": "queued"}
+        self._queued_duplicates[check["content_hash"]] = []
+
+    def allocate_ids(self, check: Dict[str, Any], record_count: int, next_id: int,
+                     source_file: str) -> Tuple[int, List[Tuple[str, tuple]]]:
+        """
+        Chooses the IDs for the records of a (re-)processed file.
+
+        A changed file keeps its previous IDs when it produces no more records than
+        before; otherwise it gets a fresh range starting at `next_id`. Legacy rows that
+        were not one contiguous range are deleted by Source_File instead (its relative
+        path, or the bare file name legacy rows were written with).
+
+        Returns:
+            tuple: (first ID to use, DELETE statements (sql, params) removing the file's old rows)
+        """
+        old_first, old_count = check.get("first_id"), check.get("record_count") or 0
+        if old_count == 0:
+            return next_id, []
+        if old_first is None:
+            # Only rows below next_id: the new rows of this file are never deleted
+            return next_id, [(f"DELETE FROM {self.document_table} WHERE Source_File IN (?, ?) AND ID < ?",
+                              (source_file, os.path.basename(source_file), next_id))]
+        delete_range = f"DELETE FROM {self.document_table} WHERE ID >= ? AND ID < ?"
+        if record_count <= old_count:
+            stale = [(delete_range, (old_first + record_count, old_first + old_count))] if record_count < old_count else []
+            return old_first, stale
+        return next_id, [(delete_range, (old_first, old_first + old_count))]
+
+    def entry_statement(self, check: Dict[str, Any], first_id: Optional[int], record_count: int,
+                        status: str = "done", error: Optional[str] = None) -> Tuple[str, tuple]:
+        """SQL + parameters upserting the manifest row, to run in the same transaction as the document rows."""
+        entry = {"path": check["path"], "size": check["size"], "mtime": check["mtime"],
+                 "content_hash": check["content_hash"], "first_id": first_id,
+                 "record_count": record_count, "status": status}
+        self._by_path[check["path"]] = entry
+        if status == "done":
+            self._by_hash[check["content_hash"]] = entry
+        return (f"INSERT OR REPLACE INTO {MANIFEST_TABLE} "
+                f"(Path, Size, Mtime, Content_Hash, First_ID, Record_Count, Status, Updated, Error) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (check["path"], check["size"], check["mtime"], check["content_hash"],
+                 first_id, record_count, status, time.time(), error))
+
+    def mark_failed(self, check: Dict[str, Any], error: Optional[str] = None) -> None:
+        """Records a failed file (with the IDs its committed rows are under and the error) so the next run retries it."""
+        check = {**check, "content_hash": check["content_hash"] or file_content_hash(Path(check["path"]))}
+        self._write_entry(check, "failed", error)
+        if self._by_hash.get(check["content_hash"], {}).get("status") == "queued":
+            del self._by_hash[check["content_hash"]]
+        # Files skipped as duplicates of this one are ingested on the next run instead
+        duplicates = self._queued_duplicates.pop(check["content_hash"], [])
+        if duplicates:
+            with self.conn:
+                self.conn.executemany(f"DELETE FROM {MANIFEST_TABLE} WHERE Path = ?", [(p,) for p in duplicates])
+            for path in duplicates:
+                self._by_path.pop(path, None)
+
+    def _write_entry(self, check: Dict[str, Any], status: str, error: Optional[str] = None) -> None:
+        sql, params = self.entry_statement(check, check.get("first_id"), check.get("record_count") or 0, status, error)
+        with self.conn:
+            self.conn.execute(sql, params)
+
+
+def _name_list(names: List[str], max_names: int) -> str:
+    more = f" and {len(names) - max_names} more" if len(names) > max_names else ""
+    return ", ".join(names[:max_names]) + more
+
+
+def format_skip_report(skipped: List[Tuple[str, str]], max_names: int = 20) -> str:
+    """
+    Status lines for the files that were not processed: (name, action) pairs with action
+    "unchanged" or "duplicate" (already ingested) or "failed" (retried on the next run).
+    """
+    ingested = [(name, action) for name, action in skipped if action != "failed"]
+    failed = [name for name, action in skipped if action == "failed"]
+    lines = []
+    if ingested:
+        duplicates = sum(1 for _, action in ingested if action == "duplicate")
+        lines.append(f"Skipped {len(ingested)} already ingested file(s) ({len(ingested) - duplicates} unchanged, "
+                     f"{duplicates} duplicate content): {_name_list([name for name, _ in ingested], max_names)}")
+    if failed:
+        lines.append(f"Not ingested, retried on the next run: {len(failed)} file(s): {_name_list(failed, max_names)}")
+    return "\n".join(lines)
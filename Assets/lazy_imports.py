@@ -0,0 +1,82 @@
+# lazy_imports.py
+import importlib
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+_UNRESOLVED = object()
+_resolve_times: Dict[str, float] = {}  # label -> seconds the first use spent importing/building
+_resolve_times_lock = threading.Lock()
+
+
+class LazyObject:
+    """
+    Stand-in for a module, class or object that is only imported (or built) on first use.
+
+    Attribute access and calls go to the real object, so `Chroma(...)`,
+    `Chroma.from_documents(...)` and `prompt_template.format(...)` work unchanged;
+    the import cost moves from startup to the first query that needs it.
+    """
+
+    __slots__ = ("_factory", "_label", "_value", "_lock")
+
+    def __init__(self, factory: Callable[[], Any], label: str):
+        self._factory = factory
+        self._label = label
+        self._value = _UNRESOLVED
+        self._lock = threading.Lock()
+
+    def _resolve(self) -> Any:
+        if self._value is _UNRESOLVED:
+            with self._lock:
+                if self._value is _UNRESOLVED:
+                    start_time = time.perf_counter()
+                    value = self._factory()
+                    with _resolve_times_lock:
+                        _resolve_times[self._label] = time.perf_counter() - start_time
+                    self._value = value
+        return self._value
+
+    @property
+    def is_resolved(self) -> bool:
+        return self._value is not _UNRESOLVED
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__") and name.endswith("__"):
+            # Protocol probes (typing's Optional[...] in annotations, copy, pickle) must not trigger the import
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        state = repr(self._value) if self.is_resolved else "not loaded yet"
+        return f"<lazy {self._label}: {state}>"
+
+
+def lazy_import(module_name: str, attribute: Optional[str] = None) -> LazyObject:
+    """
+    A module (or one of its attributes) imported on first use.
+
+    Example:
+        Chroma = lazy_import("langchain_community.vectorstores", "Chroma")
+    """
+    def load() -> Any:
+        module = importlib.import_module(module_name)
+        return getattr(module, attribute) if attribute else module
+    return LazyObject(load, f"{module_name}.{attribute}" if attribute else module_name)
+
+
+def lazy_object(factory: Callable[[], Any], label: str) -> LazyObject:
+    """An object built by `factory()` on first use (e.g. one that needs a lazily imported class)."""
+    return LazyObject(factory, label)
+
+
+def lazy_import_report() -> str:
+    """Deferred imports that have been resolved so far, slowest first."""
+    with _resolve_times_lock:
+        times = sorted(_resolve_times.items(), key=lambda item: item[1], reverse=True)
+    if not times:
+        return "Lazy imports: none resolved yet."
+    return "Lazy imports resolved on first use: " + ", ".join(f"{label} {seconds:.2f}s" for label, seconds in times)
@@ -0,0 +1,244 @@
+# lexical_index.py
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+
+FTS_TABLE = "chunk_fts"
+FTS_INFO_TABLE = "chunk_fts_info"
+
+
+class LexicalHit:
+    """A chunk found by the lexical index. Exposes `page_content` and `metadata` like a langchain Document."""
+
+    def __init__(self, page_content: str, metadata: Dict[str, Any], score: float):
+        self.page_content = page_content
+        self.metadata = metadata
+        self.score = score
+
+
+def fts5_available() -> bool:
+    """True if the sqlite3 library Python is linked against was built with FTS5."""
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+def build_match_query(query: str, max_terms: int = 32) -> str:
+    """
+    Turns free text into a safe FTS5 MATCH expression.
+
+    Every word-like token (gene names, accession IDs such as NM_000546.6, author names)
+    becomes a quoted phrase, and the phrases are OR-ed, so FTS5 operators or
+    punctuation in the user's query cannot cause syntax errors. BM25 ranks chunks
+    matching more (and rarer) terms first.
+    """
+    tokens = re.findall(r"\w[\w\-\.]*\w|\w", query)
+    unique_tokens = list(dict.fromkeys(t.lower() for t in tokens))[:max_terms]
+    return " OR ".join('"' + t.replace('"', '""') + '"' for t in unique_tokens)
+
+
+class LexicalIndex:
+    """
+    SQLite FTS5 index over the chunks of a vector DB, stored next to document_table.
+
+    Each row holds the chunk text, the document Title and Authors, plus the doc_id and
+    chunk_id of the chunk, so results can be merged with vector search results.
+    The index is (re)built from the Chroma collection, which is the source of truth
+    for the chunking.
+    """
+
+    def __init__(self, sqlite_db_path: str, document_table: str = "document_table"):
+        """
+        Args:
+            sqlite_db_path (str): The SQLite DB holding document_table (the RAG source DB).
+            document_table (str): Table providing the Authors of each document.
+        """
+        self.sqlite_db_path = str(sqlite_db_path)
+        self.document_table = document_table
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        # One short-lived connection per call: searches run from worker threads. Reads
+        # open the user's source DB read-only so they never change the file.
+        if read_only:
+            return sqlite3.connect(Path(self.sqlite_db_path).resolve().as_uri() + "?mode=ro", uri=True, timeout=30)
+        return sqlite3.connect(self.sqlite_db_path, timeout=30)
+
+    def info(self) -> Dict[str, Any]:
+        """Build info ({} if the index was never built)."""
+        if not Path(self.sqlite_db_path).exists():
+            return {}
+        conn = self._connect(read_only=True)
+        try:
+            exists = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?",
+                                  (FTS_INFO_TABLE,)).fetchone()
+            if not exists:
+                return {}
+            try:
+                row = conn.execute(f"SELECT Chunk_Count, Built, Version FROM {FTS_INFO_TABLE} WHERE Key = 1").fetchone()
+            except sqlite3.OperationalError:  # Built before the collection version was recorded
+                row = conn.execute(f"SELECT Chunk_Count, Built, NULL FROM {FTS_INFO_TABLE} WHERE Key = 1").fetchone()
+            return {"chunk_count": row[0], "built": row[1], "version": row[2]} if row else {}
+        finally:
+            conn.close()
+
+    def is_current(self, collection: Any, version: Optional[str] = None) -> bool:
+        """
+        Cheap staleness check: the index exists, holds as many chunks as the collection
+        and, when `version` is given, was built from that collection version (a rebuild
+        with a different chunking can keep the chunk count).
+        """
+        info = self.info()
+        if info.get("chunk_count") != collection.count():
+            return False
+        return version is None or info.get("version") == version
+
+    def ensure_built(self, collection: Any, force: bool = False, version: Optional[str] = None) -> str:
+        """
+        Builds the index unless it is already current. Returns a status message.
+
+        Args:
+            collection: The Chroma collection (e.g. `vectordb._collection`).
+            force (bool): Rebuild even if current.
+            version (str): Collection version (retrieval_cache.collection_version of the vector store).
+        """
+        if not force and self.is_current(collection, version):
+            return f"Lexical index up to date ({self.info().get('chunk_count', 0)} chunks)."
+        return self.build_from_collection(collection, version=version)
+
+    def build_from_collection(self, collection: Any, page_size: int = 2000, version: Optional[str] = None) -> str:
+        """
+        Rebuilds the FTS5 index from all chunks of a Chroma collection, page by page.
+
+        Args:
+            collection: The Chroma collection (e.g. `vectordb._collection`).
+            page_size (int): Chunks read from Chroma per call.
+            version (str): Collection version recorded with the index for `is_current`.
+
+        Returns:
+            str: Status message.
+        """
+        start_time = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")  # Searches read while a rebuild writes
+            author_column = self._authors_column(conn)
+            with conn:
+                conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+                conn.execute(f'''CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+                                 body, title, authors,
+                                 doc_id UNINDEXED, chunk_id UNINDEXED,
+                                 tokenize = 'unicode61 remove_diacritics 2')''')
+                conn.execute(f"DROP TABLE IF EXISTS {FTS_INFO_TABLE}")
+                conn.execute(f'''CREATE TABLE {FTS_INFO_TABLE}
+                                 (Key INTEGER PRIMARY KEY, Chunk_Count INTEGER, Built REAL, Version TEXT)''')
+            total = 0
+            offset = 0
+            while True:
+                page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+                documents = page.get("documents") or []
+                if not documents:
+                    break
+                metadatas = page.get("metadatas") or [{}] * len(documents)
+                authors = self._authors_for(conn, author_column, [(m or {}).get("doc_id") for m in metadatas])
+                rows = []
+                for text, metadata in zip(documents, metadatas):
+                    metadata = metadata or {}
+                    doc_id = metadata.get("doc_id")
+                    rows.append((text or "", metadata.get("Title", ""), authors.get(doc_id, ""),
+                                 doc_id, metadata.get("chunk_id")))
+                with conn:
+                    conn.executemany(f"INSERT INTO {FTS_TABLE} (body, title, authors, doc_id, chunk_id) "
+                                     f"VALUES (?, ?, ?, ?, ?)", rows)
+                total += len(rows)
+                if len(documents) < page_size:
+                    break
+                offset += page_size
+            with conn:
+                conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+                conn.execute(f"INSERT INTO {FTS_INFO_TABLE} (Key, Chunk_Count, Built, Version) VALUES (1, ?, ?, ?)",
+                             (total, time.time(), version))
+        finally:
+            conn.close()
+        return f"Lexical index built over {total} chunks in {time.time() - start_time:.2f}s."
+
+    def _authors_column(self, conn: sqlite3.Connection) -> Optional[str]:
+        try:
+            columns = {row[1].lower(): row[1] for row in conn.execute(f"PRAGMA table_info({self.document_table})")}
+        except sqlite3.Error:
+            return None
+        return columns.get("authors") if "id" in columns else None
+
+    def _authors_for(self, conn: sqlite3.Connection, author_column: Optional[str],
+                     doc_ids: List[Any]) -> Dict[Any, str]:
+        if not author_column:
+            return {}
+        unique_ids = [d for d in dict.fromkeys(doc_ids) if d is not None]
+        authors: Dict[Any, str] = {}
+        for start in range(0, len(unique_ids), 500):
+            part = unique_ids[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            for doc_id, value in conn.execute(
+                    f"SELECT ID, {author_column} FROM {self.document_table} WHERE ID IN ({placeholders})", part):
+                authors[doc_id] = value or ""
+        return authors
+
+    def search(self, query: str, k: int = 10,
+               weights: Tuple[float, float, float] = (1.0, 2.0, 2.0)) -> List[LexicalHit]:
+        """
+        BM25 search over chunk text, Title and Authors.
+
+        Args:
+            query (str): Free-text query.
+            k (int): Maximum number of chunks returned.
+            weights (tuple): BM25 column weights for (body, title, authors).
+
+        Returns:
+            list: LexicalHit objects, best first.
+        """
+        match = build_match_query(query)
+        if not match:
+            return []
+        conn = self._connect(read_only=True)
+        try:
+            rows = conn.execute(
+                f"SELECT body, title, doc_id, chunk_id, bm25({FTS_TABLE}, ?, ?, ?) AS score "
+                f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ? ORDER BY score LIMIT ?",
+                (*weights, match, int(k))).fetchall()
+        finally:
+            conn.close()
+        # bm25() is lower-is-better; flip the sign so higher means more relevant
+        return [LexicalHit(body, {"doc_id": doc_id, "chunk_id": chunk_id, "Title": title}, -score)
+                for body, title, doc_id, chunk_id, score in rows]
+
+
+def reciprocal_rank_fusion(result_lists: Iterable[List[Any]], k: int = 10, rrf_k: int = 60,
+                           key_fn: Optional[callable] = None) -> List[Any]:
+    """
+    Merges ranked result lists with reciprocal-rank fusion: score = sum(1 / (rrf_k + rank)).
+
+    Args:
+        result_lists (iterable): Ranked lists of documents/hits (best first).
+        k (int): Number of merged results returned.
+        rrf_k (int): Rank offset; 60 is the usual choice.
+        key_fn (callable): Identity of a result; defaults to (doc_id, chunk_id) from metadata.
+
+    Returns:
+        list: The first occurrence of each result, ordered by fused score.
+    """
+    key_fn = key_fn or (lambda doc: (str(doc.metadata.get("doc_id")), str(doc.metadata.get("chunk_id"))))
+    scores: Dict[Any, float] = {}
+    first_seen: Dict[Any, Any] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = key_fn(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            first_seen.setdefault(key, doc)
+    ranked = sorted(scores, key=lambda key: scores[key], reverse=True)
+    return [first_seen[key] for key in ranked[:k]]
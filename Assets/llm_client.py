@@ -0,0 +1,241 @@
+# llm_client.py
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, Any, Optional, Iterator, Tuple
+from tracing import get_tracer
+
+DEFAULT_BASE_URL = "http://localhost:1238/v1"  # LM Studio
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+_RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "ConnectError", "ReadError",
+                          "RemoteProtocolError", "ConnectTimeout", "ReadTimeout", "PoolTimeout"}
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """5xx / 429 / timeout responses and dropped or refused connections; not bad requests."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return type(error).__name__ in _RETRYABLE_ERROR_NAMES
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """The server's Retry-After header (seconds form), if the error carries a response."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers and headers.get("retry-after") else None
+    except (TypeError, ValueError):
+        return None
+
+
+class _ReleasingStream:
+    """Wraps a streamed response so the endpoint's concurrency slot is held until the stream ends."""
+
+    def __init__(self, stream: Any, release: callable):
+        self._stream = stream
+        self._release = release
+        self._released = False
+        self._lock = threading.Lock()  # close() may come from another thread than the one iterating
+
+    def _done(self) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._release()
+
+    def __iter__(self) -> Iterator[Any]:
+        try:
+            for chunk in self._stream:
+                yield chunk
+        finally:
+            self._done()
+
+    def close(self) -> None:
+        try:
+            close = getattr(self._stream, "close", None)
+            if close:
+                close()
+        finally:
+            self._done()
+
+    def __enter__(self) -> "_ReleasingStream":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __del__(self):
+        self._done()
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._stream, name)
+
+
+class _Endpoint:
+    """`create(**kwargs)` of one API endpoint behind a concurrency limit, with retries."""
+
+    def __init__(self, owner: "SharedLLMClient", name: str, create_fn: callable, concurrency: int):
+        self.owner = owner
+        self.name = name
+        self.create_fn = create_fn
+        self.concurrency = max(1, int(concurrency))
+        self.semaphore = threading.BoundedSemaphore(self.concurrency)
+
+    def create(self, **kwargs) -> Any:
+        wait_start = time.perf_counter()
+        if not self.semaphore.acquire(timeout=self.owner.queue_timeout):
+            raise TimeoutError(f"No free {self.name} slot after {self.owner.queue_timeout:.0f}s "
+                               f"({self.concurrency} concurrent requests allowed).")
+        self.owner._record(self.name, "queue_wait_s", time.perf_counter() - wait_start)
+        try:
+            result = self.owner._call_with_retries(self.name, self.create_fn, kwargs)
+        except BaseException:
+            self.semaphore.release()
+            raise
+        if kwargs.get("stream"):
+            return _ReleasingStream(result, self.semaphore.release)
+        self.semaphore.release()
+        return result
+
+
+class SharedLLMClient:
+    """
+    One OpenAI-compatible client for the embedding, query refinement and chat paths.
+
+    Owns a single pooled keep-alive HTTP connection pool (httpx) with explicit timeouts
+    and proxy settings (environment proxy variables are ignored, so localhost traffic
+    never goes through a corporate proxy). `embeddings.create` and
+    `chat.completions.create` have the same signatures as the OpenAI SDK, but each
+    endpoint admits only a limited number of concurrent requests (a streamed answer
+    holds its slot until the stream ends), and failed requests are retried with
+    jittered exponential backoff on 5xx/429, timeouts and connection resets.
+    """
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, api_key: str = "lm-studio",
+                 chat_concurrency: int = 2, embedding_concurrency: int = 4,
+                 max_connections: int = 16, max_keepalive_connections: int = 8, keepalive_expiry: float = 60.0,
+                 connect_timeout: float = 5.0, read_timeout: float = 300.0, queue_timeout: float = 600.0,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 10.0,
+                 proxy: Optional[str] = None):
+        """
+        Args:
+            base_url (str): OpenAI-compatible API root (LM Studio by default).
+            api_key (str): API key (LM Studio accepts any).
+            chat_concurrency (int): Concurrent chat completions (answers and query refinement).
+            embedding_concurrency (int): Concurrent embedding requests (match BatchedEmbeddingEngine.max_in_flight).
+            max_connections (int): Upper bound of open HTTP connections.
+            max_keepalive_connections (int): Idle connections kept open for reuse.
+            keepalive_expiry (float): Seconds an idle connection is kept.
+            connect_timeout (float): Seconds to establish a connection.
+            read_timeout (float): Seconds to wait for response data (long prompts on a local model are slow).
+            queue_timeout (float): Seconds a request waits for a free endpoint slot before failing.
+            max_retries (int): Retries of a failed request (0 = none).
+            backoff_base (float): Base of the exponential backoff, in seconds.
+            backoff_max (float): Cap of a single backoff sleep.
+            proxy (str): Explicit proxy URL, or None for direct connections.
+        """
+        import httpx
+        from openai import OpenAI
+
+        self.base_url = base_url
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout
+        self.proxy = proxy
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self._stats_lock = threading.Lock()
+        self._tracer = get_tracer()
+
+        client_options = dict(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections,
+                                keepalive_expiry=keepalive_expiry),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            trust_env=False,
+        )
+        try:
+            self.http_client = httpx.Client(proxy=proxy, **client_options)
+        except TypeError:  # httpx < 0.26 only knows `proxies`
+            self.http_client = httpx.Client(proxies=proxy, **client_options)
+        # Retries are done here (with jitter, and counted); the SDK's own retries are switched off
+        self.raw = OpenAI(base_url=base_url, api_key=api_key, http_client=self.http_client, max_retries=0)
+
+        self.embeddings = _Endpoint(self, "embeddings", self.raw.embeddings.create, embedding_concurrency)
+        self.chat = SimpleNamespace(completions=_Endpoint(self, "chat", self.raw.chat.completions.create, chat_concurrency))
+
+    def __getattr__(self, name: str) -> Any:
+        # Other SDK resources (models, completions, ...) go straight to the underlying client
+        if name == "raw":
+            raise AttributeError(name)
+        return getattr(self.raw, name)
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        # Full jitter: concurrent callers that failed together do not retry in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _call_with_retries(self, endpoint: str, create_fn: callable, kwargs: Dict[str, Any]) -> Any:
+        attempt = 0
+        while True:
+            self._record(endpoint, "requests")
+            try:
+                return create_fn(**kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    self._record(endpoint, "errors")
+                    self._tracer.count("llm_request_errors_total", endpoint=endpoint)
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                self._record(endpoint, "retries")
+                self._tracer.count("llm_request_retries_total", endpoint=endpoint)
+                print(f"{endpoint} request failed ({type(e).__name__}: {e}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _record(self, endpoint: str, key: str, value: float = 1) -> None:
+        with self._stats_lock:
+            endpoint_stats = self.stats.setdefault(endpoint, {})
+            endpoint_stats[key] = endpoint_stats.get(key, 0) + value
+
+    def summary(self) -> str:
+        with self._stats_lock:
+            parts = [f"{name}: {int(s.get('requests', 0))} requests, {int(s.get('retries', 0))} retries, "
+                     f"{int(s.get('errors', 0))} errors, {s.get('queue_wait_s', 0.0):.1f}s queued"
+                     for name, s in sorted(self.stats.items())]
+        return f"LLM client ({self.base_url}): " + ("; ".join(parts) if parts else "no requests yet")
+
+    def close(self) -> None:
+        self.http_client.close()
+
+    def __enter__(self) -> "SharedLLMClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+_shared_clients: Dict[Tuple[str, str], SharedLLMClient] = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_shared_client(base_url: str = DEFAULT_BASE_URL, api_key: str = "lm-studio", **options) -> SharedLLMClient:
+    """
+    The process-wide client for `base_url`, created on first use (later `options` are ignored).
+    Every notebook cell and module asking for the same server shares its connection pool and limits.
+    """
+    key = (base_url.rstrip("/"), api_key)
+    with _shared_clients_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            client = _shared_clients[key] = SharedLLMClient(base_url, api_key, **options)
+        return client
@@ -0,0 +1,187 @@
+# near_duplicates.py
+import hashlib
+import re
+import zlib
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+
+import numpy as np
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_TOKEN = re.compile(r"\w+")
+
+
+def shingle_hashes(text: str, shingle_size: int = 5) -> np.ndarray:
+    """crc32 hashes of the word k-shingles of a text (lower-cased, punctuation ignored)."""
+    tokens = _TOKEN.findall(text.lower())
+    if len(tokens) < shingle_size:
+        grams = [" ".join(tokens)] if tokens else []
+    else:
+        grams = [" ".join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)]
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in set(grams)), dtype=np.uint64)
+
+
+class MinHasher:
+    """MinHash signatures over word shingles: one min-hash per random permutation (a*x + b mod p)."""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 5, seed: int = 1):
+        """
+        Args:
+            num_perm (int): Signature length; the Jaccard estimate error is about 1/sqrt(num_perm).
+            shingle_size (int): Words per shingle.
+            seed (int): Seed of the permutations (signatures are only comparable for equal seeds).
+        """
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingle_hashes(text, self.shingle_size)
+        if hashes.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        # (num_perm, num_shingles); uint64 arithmetic wraps, which is fine for hashing
+        permuted = ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _MERSENNE_PRIME) & _MAX_HASH
+        return permuted.min(axis=1).astype(np.uint32)
+
+
+class NearDuplicateFilter:
+    """
+    Collapses near-duplicate chunks while they stream from the chunker to the vector DB.
+
+    Each chunk gets a MinHash signature; LSH banding (`bands` buckets of
+    num_perm / bands rows) finds earlier chunks that probably share most shingles,
+    and a candidate is accepted as a duplicate when the estimated Jaccard
+    similarity reaches `threshold`. Exact copies are caught by a content hash
+    first. Only the first chunk of each group is passed on; the doc_ids (and
+    content hashes) of the collapsed chunks are collected and written to the kept
+    chunk's metadata ('source_doc_ids', 'source_content_hashes', 'duplicate_count')
+    by `apply_to_collection` after the build. chroma_sync reads them back, so an
+    update knows which documents share a kept chunk.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16,
+                 shingle_size: int = 5, min_words: int = 20):
+        """
+        Args:
+            threshold (float): Estimated Jaccard similarity at which two chunks are duplicates.
+            num_perm (int): MinHash signature length (must be divisible by `bands`).
+            bands (int): LSH bands; more bands find lower similarities (more candidates to check).
+            shingle_size (int): Words per shingle.
+            min_words (int): Shorter chunks (headings, stubs) are only collapsed with exact copies.
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands.")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.min_words = min_words
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self._buckets: List[Dict[bytes, int]] = [{} for _ in range(bands)]
+        self._signatures: List[np.ndarray] = []
+        self._kept_ids: List[str] = []
+        self._kept_doc_ids: List[Any] = []
+        self._exact: Dict[bytes, int] = {}
+        self.extra_sources: Dict[int, List[Any]] = {}  # kept index -> doc_ids of collapsed chunks
+        self.extra_hashes: Dict[int, List[Optional[str]]] = {}  # kept index -> their documents' content hashes
+        self.chunks_in = 0
+        self.chunks_out = 0
+        self.chars_in = 0
+        self.chars_out = 0
+
+    def find_duplicate(self, text: str) -> Optional[int]:
+        """Index of an already kept chunk this text duplicates, or None (the text is then registered)."""
+        exact_key = hashlib.blake2b(" ".join(text.split()).lower().encode("utf-8"), digest_size=16).digest()
+        if exact_key in self._exact:
+            return self._exact[exact_key]
+        if len(text.split()) < self.min_words:
+            self._register(exact_key, None)
+            return None
+        signature = self.hasher.signature(text)
+        band_keys = [signature[b * self.rows:(b + 1) * self.rows].tobytes() for b in range(self.bands)]
+        checked = set()
+        for band, key in enumerate(band_keys):
+            candidate = self._buckets[band].get(key)
+            if candidate is None or candidate in checked:
+                continue
+            checked.add(candidate)
+            if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                return candidate
+        index = self._register(exact_key, signature)
+        for band, key in enumerate(band_keys):
+            self._buckets[band].setdefault(key, index)
+        return None
+
+    def _register(self, exact_key: bytes, signature: Optional[np.ndarray]) -> int:
+        index = len(self._kept_ids)
+        self._exact[exact_key] = index
+        self._signatures.append(signature)
+        self._kept_ids.append("")
+        self._kept_doc_ids.append(None)
+        return index
+
+    def filter(self, chunks: Iterable[Any], id_fn: Optional[callable] = None) -> Iterator[Any]:
+        """
+        Passes on the first chunk of every near-duplicate group, lazily.
+
+        Args:
+            chunks (iterable): Chunks with page_content and 'doc_id' / 'chunk_id' metadata.
+            id_fn (callable): `id_fn(chunk) -> vector DB id`; defaults to '<doc_id>_<chunk_id>'
+                              (the ids chroma_sync.add_in_windows assigns).
+        """
+        id_fn = id_fn or (lambda chunk: f"{chunk.metadata.get('doc_id')}_{chunk.metadata.get('chunk_id')}")
+        for chunk in chunks:
+            self.chunks_in += 1
+            self.chars_in += len(chunk.page_content)
+            kept = self.find_duplicate(chunk.page_content)
+            doc_id = chunk.metadata.get("doc_id")
+            if kept is None:
+                index = len(self._kept_ids) - 1
+                self._kept_ids[index] = id_fn(chunk)
+                self._kept_doc_ids[index] = doc_id
+                self.chunks_out += 1
+                self.chars_out += len(chunk.page_content)
+                yield chunk
+            else:
+                self.extra_sources.setdefault(kept, []).append(doc_id)
+                self.extra_hashes.setdefault(kept, []).append(chunk.metadata.get("content_hash"))
+
+    def apply_to_collection(self, collection: Any, batch_size: int = 500) -> int:
+        """
+        Writes 'source_doc_ids' (comma-separated, kept chunk's own doc_id first), the
+        matching 'source_content_hashes' and 'duplicate_count' into the metadata of every
+        kept chunk that absorbed duplicates.
+
+        Returns:
+            int: Number of chunks updated.
+        """
+        items = [(self._kept_ids[index], index) for index in self.extra_sources if self._kept_ids[index]]
+        for start in range(0, len(items), batch_size):
+            part = items[start:start + batch_size]
+            current = collection.get(ids=[chunk_id for chunk_id, _ in part], include=["metadatas"])
+            metadata_by_id = dict(zip(current["ids"], current["metadatas"]))
+            ids, metadatas = [], []
+            for chunk_id, index in part:
+                if chunk_id not in metadata_by_id:
+                    continue
+                metadata = dict(metadata_by_id[chunk_id] or {})
+                sources = {self._kept_doc_ids[index]: metadata.get("content_hash")}
+                for doc_id, content_hash in zip(self.extra_sources[index], self.extra_hashes[index]):
+                    sources.setdefault(doc_id, content_hash)
+                metadata["source_doc_ids"] = ",".join(str(d) for d in sources)
+                metadata["source_content_hashes"] = ",".join(h or "" for h in sources.values())
+                metadata["duplicate_count"] = len(self.extra_sources[index])
+                ids.append(chunk_id)
+                metadatas.append(metadata)
+            if ids:
+                collection.update(ids=ids, metadatas=metadatas)
+        return len(items)
+
+    def summary(self) -> str:
+        removed = self.chunks_in - self.chunks_out
+        if not self.chunks_in:
+            return "Near-duplicate filter: no chunks seen."
+        return (f"Near-duplicates: {removed} of {self.chunks_in} chunks collapsed into {len(self.extra_sources)} kept chunks "
+                f"(index {100.0 * removed / self.chunks_in:.1f}% smaller, "
+                f"{self.chars_in - self.chars_out} fewer characters to embed).")
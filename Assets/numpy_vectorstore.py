@@ -0,0 +1,520 @@
+# numpy_vectorstore.py
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+NUMPY_STORE_DIRNAME = "numpy_store"   # Created inside the Chroma persist dir it was exported from
+EMBEDDINGS_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.sqlite3"
+INFO_FILE = "store_info.json"
+QUANTIZATIONS = ("float16", "int8")   # Optional compact first-pass indexes next to the float32 matrix
+
+
+class StoredChunk:
+    """A chunk returned by NumpyVectorStore; has `page_content` and `metadata` like a langchain Document."""
+
+    def __init__(self, page_content: str, metadata: Dict[str, Any]):
+        self.page_content = page_content
+        self.metadata = metadata
+
+    def __repr__(self) -> str:
+        return f"StoredChunk(metadata={self.metadata!r}, page_content={self.page_content[:50]!r})"
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalizes each row (zero rows stay zero), so a dot product is the cosine similarity."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first (argpartition, then a sort of only k items)."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.shape[0]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def quantized_file_names(kind: str) -> Tuple[str, Optional[str]]:
+    """(codes file, scales file or None) of a quantized index."""
+    if kind not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization '{kind}'; expected one of {QUANTIZATIONS}.")
+    return f"embeddings_{kind}.npy", (f"embeddings_{kind}_scales.npy" if kind == "int8" else None)
+
+
+def quantize_rows(block: np.ndarray, kind: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Quantizes a block of (normalized) float32 rows.
+
+    float16 halves the size and needs no scale. int8 uses one symmetric scale per
+    vector (max |x| / 127), so code * scale reconstructs the row to within half a step.
+
+    Returns:
+        tuple: (codes, per-row float32 scales or None)
+    """
+    if kind == "float16":
+        return block.astype(np.float16), None
+    if kind == "int8":
+        scales = np.abs(block).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(block / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Unknown quantization '{kind}'; expected one of {QUANTIZATIONS}.")
+
+
+class NumpyCollection:
+    """
+    Read-only stand-in for the parts of a Chroma collection the app uses:
+    `count()` and `get(where=..., ids=..., include=..., limit=..., offset=...)`.
+    """
+
+    def __init__(self, store: "NumpyVectorStore"):
+        self._store = store
+
+    def count(self) -> int:
+        return self._store.count
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Optional[List[str]] = None) -> Dict[str, Any]:
+        include = include if include is not None else ["documents", "metadatas"]
+        clauses, params = [], []
+        if ids is not None:
+            clauses.append(f"Chunk_Key IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
+        for key, condition in (where or {}).items():
+            column = "Doc_ID" if key == "doc_id" else None
+            target = column or f"json_extract(Metadata, '$.{key}')"
+            if isinstance(condition, dict) and "$in" in condition:
+                values = list(condition["$in"])
+                clauses.append(f"{target} IN ({','.join('?' * len(values))})")
+                params.extend(self._where_value(column, v) for v in values)
+            elif isinstance(condition, dict) and "$eq" in condition:
+                clauses.append(f"{target} = ?")
+                params.append(self._where_value(column, condition["$eq"]))
+            elif isinstance(condition, dict) and "$gte" in condition:
+                clauses.append(f"{target} >= ?")
+                params.append(self._where_value(column, condition["$gte"]))
+            elif isinstance(condition, dict):
+                raise ValueError(f"Unsupported where operator for '{key}': {list(condition)}")
+            else:
+                clauses.append(f"{target} = ?")
+                params.append(self._where_value(column, condition))
+        sql = "SELECT Row, Chunk_Key, Content, Metadata FROM chunks"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY Row"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit if limit is not None else -1, offset or 0])
+        rows = self._store._query(sql, params)
+        result: Dict[str, Any] = {"ids": [r[1] for r in rows]}
+        result["documents"] = [r[2] for r in rows] if "documents" in include else None
+        result["metadatas"] = [json.loads(r[3]) for r in rows] if "metadatas" in include else None
+        if "embeddings" in include:
+            result["embeddings"] = [self._store.matrix[r[0]].tolist() for r in rows]
+        return result
+
+    @staticmethod
+    def _where_value(column: Optional[str], value: Any) -> Any:
+        # Doc_ID is stored as text so int and str doc_ids share one index
+        return str(value) if column == "Doc_ID" else value
+
+
+class NumpyVectorStore:
+    """
+    Exact-search vector store backed by a memory-mapped float32 matrix.
+
+    Embeddings are stored L2-normalized in `embeddings.npy` and opened with
+    `mmap_mode="r"`: loading takes milliseconds and the matrix is paged in by the OS
+    instead of being copied. Chunk text and metadata live in a small SQLite side
+    table keyed by matrix row. Search is one matmul plus `argpartition`, ranking by
+    cosine similarity. The store is read-only; build it with `export_chroma_to_numpy`.
+
+    With `quantization` ("float16" or "int8", built by `build_quantized_index`) the
+    compact codes are loaded into RAM and scanned for a shortlist of
+    `k * rescore_factor` rows, which is then re-scored exactly against the
+    float32 matrix on disk; only the shortlisted rows are paged in.
+
+    Exposes the surface DocumentRetriever uses: `similarity_search`,
+    `similarity_search_with_score` and `_collection.get(where=...)` / `.count()`.
+    """
+
+    def __init__(self, store_dir: str, embedding_function: Any = None,
+                 quantization: Optional[str] = None, rescore_factor: int = 4, block_rows: int = 4096):
+        """
+        Args:
+            store_dir (str): Directory written by export_chroma_to_numpy.
+            embedding_function: Object with `embed_query(text)` (e.g. CustomEmbeddingForGradio).
+            quantization (str): None for exact float32 search, or "float16" / "int8".
+            rescore_factor (int): Shortlist size per requested result for the quantized first pass.
+            block_rows (int): Rows of codes converted to float32 at a time during the first pass
+                              (small blocks stay in CPU cache).
+        """
+        self.store_dir = Path(store_dir)
+        self.embedding_function = embedding_function
+        self.info = json.loads((self.store_dir / INFO_FILE).read_text(encoding="utf-8"))
+        self.matrix = np.load(self.store_dir / EMBEDDINGS_FILE, mmap_mode="r")
+        self.count = int(self.matrix.shape[0])
+        self._chunks_path = str(self.store_dir / CHUNKS_FILE)
+        self._collection = NumpyCollection(self)
+        # The Chroma dir this store was exported from (used to find the RAG source SQLite)
+        self._persist_directory = self.info.get("source_persist_directory", str(self.store_dir.parent))
+        self.quantization = quantization
+        self.rescore_factor = max(1, int(rescore_factor))
+        self.block_rows = max(1, int(block_rows))
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        if quantization:
+            if not is_quantized_index_current(str(self.store_dir), quantization):
+                raise ValueError(f"No current {quantization} index in {self.store_dir}; run build_quantized_index first.")
+            codes_file, scales_file = quantized_file_names(quantization)
+            self.codes = np.load(self.store_dir / codes_file)
+            self.scales = np.load(self.store_dir / scales_file) if scales_file else None
+
+    def _query(self, sql: str, params: List[Any]) -> List[tuple]:
+        # Short-lived read-only connection: safe to call from several threads
+        conn = sqlite3.connect(f"file:{self._chunks_path}?mode=ro", uri=True)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def _rows_to_chunks(self, rows: List[int]) -> List[StoredChunk]:
+        if not rows:
+            return []
+        found = {}
+        for start in range(0, len(rows), 500):
+            part = rows[start:start + 500]
+            for row, content, metadata in self._query(
+                    f"SELECT Row, Content, Metadata FROM chunks WHERE Row IN ({','.join('?' * len(part))})", part):
+                found[row] = StoredChunk(content, json.loads(metadata))
+        return [found[r] for r in rows if r in found]
+
+    def search_by_vector(self, vector: List[float], k: int = 4) -> List[Tuple[int, float]]:
+        """(row, cosine similarity) of the k nearest chunks, best first."""
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        if self.codes is None:
+            scores = self.matrix @ query
+            best = top_k_indices(scores, k)
+            return [(int(i), float(scores[i])) for i in best]
+        # Quantized first pass, then exact re-scoring of the shortlist (rows sorted for sequential reads)
+        rows = np.sort(self.first_pass(query, k * self.rescore_factor))
+        exact = self.matrix[rows] @ query
+        best = top_k_indices(exact, k)
+        return [(int(rows[i]), float(exact[i])) for i in best]
+
+    def first_pass(self, query: np.ndarray, n: int) -> np.ndarray:
+        """Rows of the n best approximate scores over the quantized codes (unordered), block by block."""
+        candidate_rows, candidate_scores = [], []
+        for start in range(0, self.count, self.block_rows):
+            scores = self.codes[start:start + self.block_rows].astype(np.float32) @ query
+            if self.scales is not None:
+                scores *= self.scales[start:start + self.block_rows]
+            top = top_k_indices(scores, n)
+            candidate_rows.append(top + start)
+            candidate_scores.append(scores[top])
+        if not candidate_rows:
+            return np.empty(0, dtype=np.int64)
+        rows, scores = np.concatenate(candidate_rows), np.concatenate(candidate_scores)
+        return rows[top_k_indices(scores, n)]
+
+    @property
+    def embeddings(self) -> Any:
+        return self.embedding_function
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[StoredChunk, float]]:
+        if self.embedding_function is None:
+            raise ValueError("NumpyVectorStore needs an embedding_function to search by text.")
+        hits = self.search_by_vector(self.embedding_function.embed_query(query), k)
+        chunks = self._rows_to_chunks([row for row, _ in hits])
+        return list(zip(chunks, [score for _, score in hits]))
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[StoredChunk]:
+        return self._rows_to_chunks([row for row, _ in self.search_by_vector(embedding, k)])
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[StoredChunk]:
+        return [chunk for chunk, _ in self.similarity_search_with_score(query, k)]
+
+
+def numpy_store_dir_for(chroma_persist_dir: str) -> Path:
+    return Path(chroma_persist_dir) / NUMPY_STORE_DIRNAME
+
+
+def is_numpy_store_current(chroma_persist_dir: str) -> bool:
+    """True if the exported store exists and is newer than the Chroma DB it came from."""
+    store_dir = numpy_store_dir_for(chroma_persist_dir)
+    info_path = store_dir / INFO_FILE
+    chroma_file = Path(chroma_persist_dir) / "chroma.sqlite3"
+    if not info_path.exists() or not (store_dir / EMBEDDINGS_FILE).exists():
+        return False
+    try:
+        info = json.loads(info_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    return not chroma_file.exists() or info.get("source_mtime") == chroma_file.stat().st_mtime
+
+
+def export_collection_to_numpy(collection: Any, store_dir: str, page_size: int = 2000,
+                               source_persist_directory: Optional[str] = None,
+                               source_mtime: Optional[float] = None,
+                               progress_callback: Optional[callable] = None) -> str:
+    """
+    Writes all chunks of a Chroma collection into a NumpyVectorStore directory.
+
+    The matrix is filled page by page through `open_memmap`, so the export needs
+    memory for one page only. Files are written under temporary names and moved
+    into place at the end, so a reader never sees a half-written store.
+
+    Args:
+        collection: Chroma collection (chromadb collection or `vectordb._collection`).
+        store_dir (str): Output directory.
+        page_size (int): Chunks read from Chroma per call.
+        source_persist_directory (str): Recorded in store_info.json.
+        source_mtime (float): mtime of the source chroma.sqlite3, used for staleness checks.
+        progress_callback (callable): Optional `callback(fraction, description)`.
+
+    Returns:
+        str: Status message.
+    """
+    start_time = time.time()
+    store_path = Path(store_dir)
+    store_path.mkdir(parents=True, exist_ok=True)
+    total = collection.count()
+    if total == 0:
+        raise ValueError("The Chroma collection is empty; nothing to export.")
+
+    tmp_matrix_path = store_path / (EMBEDDINGS_FILE + ".tmp.npy")
+    tmp_chunks_path = store_path / (CHUNKS_FILE + ".tmp")
+    if tmp_chunks_path.exists():
+        tmp_chunks_path.unlink()
+    conn = sqlite3.connect(str(tmp_chunks_path))
+    matrix = None
+    try:
+        conn.execute('''CREATE TABLE chunks
+                        (Row INTEGER PRIMARY KEY,
+                        Chunk_Key TEXT,
+                        Doc_ID TEXT,
+                        Chunk_ID INTEGER,
+                        Content TEXT,
+                        Metadata TEXT)''')
+        row = 0
+        offset = 0
+        while row < total:
+            page = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+            embeddings = page.get("embeddings")
+            if embeddings is None or len(embeddings) == 0:
+                break
+            vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+            if matrix is None:
+                matrix = np.lib.format.open_memmap(str(tmp_matrix_path), mode="w+", dtype=np.float32,
+                                                   shape=(total, vectors.shape[1]))
+            count = min(len(vectors), total - row)
+            matrix[row:row + count] = vectors[:count]
+            metadatas = page.get("metadatas") or [{}] * count
+            documents = page.get("documents") or [""] * count
+            conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?)", [
+                (row + i, page["ids"][i], str((metadatas[i] or {}).get("doc_id")),
+                 (metadatas[i] or {}).get("chunk_id"), documents[i], json.dumps(metadatas[i] or {}))
+                for i in range(count)])
+            row += count
+            offset += len(vectors)
+            if progress_callback:
+                progress_callback(row / total, f"Exporting vectors {row}/{total}")
+            if len(vectors) < page_size:
+                break
+        conn.execute("CREATE INDEX idx_chunks_doc_id ON chunks (Doc_ID)")
+        conn.commit()
+    finally:
+        conn.close()
+    if matrix is None:
+        raise ValueError("The Chroma collection returned no embeddings.")
+    matrix.flush()
+    dim = int(matrix.shape[1])
+    del matrix
+    if row < total:
+        # The collection shrank while exporting: keep only the rows that were written
+        trimmed = np.load(str(tmp_matrix_path), mmap_mode="r")[:row]
+        np.save(str(store_path / (EMBEDDINGS_FILE + ".trim.npy")), trimmed)
+        del trimmed
+        os.replace(store_path / (EMBEDDINGS_FILE + ".trim.npy"), tmp_matrix_path)
+
+    os.replace(tmp_matrix_path, store_path / EMBEDDINGS_FILE)
+    os.replace(tmp_chunks_path, store_path / CHUNKS_FILE)
+    info = {"count": row, "dim": dim, "exported": time.time(),
+            "source_persist_directory": source_persist_directory, "source_mtime": source_mtime}
+    (store_path / INFO_FILE).write_text(json.dumps(info, indent=2), encoding="utf-8")
+    return f"Exported {row} vectors (dim {dim}) to {store_path} in {time.time() - start_time:.2f}s."
+
+
+def export_chroma_to_numpy(chroma_persist_dir: str, store_dir: Optional[str] = None,
+                           collection_name: Optional[str] = None, page_size: int = 2000,
+                           progress_callback: Optional[callable] = None) -> str:
+    """
+    Exports an existing Chroma persist directory to a NumpyVectorStore
+    (by default into `<chroma_persist_dir>/numpy_store`).
+
+    Args:
+        chroma_persist_dir (str): Directory containing chroma.sqlite3.
+        store_dir (str): Output directory (default: numpy_store inside the Chroma dir).
+        collection_name (str): Chroma collection; defaults to langchain's "langchain" or the only one.
+        page_size (int): Chunks read per call.
+        progress_callback (callable): Optional `callback(fraction, description)`.
+
+    Returns:
+        str: Status message.
+    """
+    import chromadb  # Only needed for the export
+
+    client = chromadb.PersistentClient(path=str(chroma_persist_dir))
+    if collection_name is None:
+        names = [c if isinstance(c, str) else c.name for c in client.list_collections()]
+        collection_name = "langchain" if "langchain" in names else (names[0] if len(names) == 1 else None)
+        if collection_name is None:
+            raise ValueError(f"Cannot choose a collection in {chroma_persist_dir}: {names}")
+    collection = client.get_collection(collection_name)
+    store_path = Path(store_dir or numpy_store_dir_for(chroma_persist_dir))
+    status = export_collection_to_numpy(collection, str(store_path), page_size,
+                                        source_persist_directory=str(chroma_persist_dir),
+                                        progress_callback=progress_callback)
+    # Record the source mtime after reading (opening the client may itself touch the file)
+    chroma_file = Path(chroma_persist_dir) / "chroma.sqlite3"
+    info = json.loads((store_path / INFO_FILE).read_text(encoding="utf-8"))
+    info["source_mtime"] = chroma_file.stat().st_mtime if chroma_file.exists() else None
+    (store_path / INFO_FILE).write_text(json.dumps(info, indent=2), encoding="utf-8")
+    return status
+
+
+def is_quantized_index_current(store_dir: str, kind: str) -> bool:
+    """True if the quantized index exists and was built from the current float32 export."""
+    store_path = Path(store_dir)
+    try:
+        info = json.loads((store_path / INFO_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    built = info.get("quantized", {}).get(kind)
+    codes_file, scales_file = quantized_file_names(kind)
+    return (bool(built) and built.get("exported") == info.get("exported")
+            and (store_path / codes_file).exists() and (scales_file is None or (store_path / scales_file).exists()))
+
+
+def build_quantized_index(store_dir: str, kind: str = "int8", block_rows: int = 65536,
+                          recall_queries: int = 200, recall_k: int = 10, rescore_factor: int = 4,
+                          progress_callback: Optional[callable] = None) -> str:
+    """
+    Builds a float16 or int8 first-pass index from the float32 matrix of a NumpyVectorStore,
+    then measures its recall@k against exact float32 search and records both in store_info.json.
+
+    Args:
+        store_dir (str): NumpyVectorStore directory.
+        kind (str): "float16" or "int8".
+        block_rows (int): Rows quantized per step (memory needed is one block).
+        recall_queries (int): Number of sampled queries for the recall report (0 to skip).
+        recall_k (int): k of the recall report.
+        rescore_factor (int): Shortlist factor used for the report.
+        progress_callback (callable): Optional `callback(fraction, description)`.
+
+    Returns:
+        str: Status message including the recall report.
+    """
+    start_time = time.time()
+    store_path = Path(store_dir)
+    codes_file, scales_file = quantized_file_names(kind)
+    matrix = np.load(store_path / EMBEDDINGS_FILE, mmap_mode="r")
+    total, dim = matrix.shape
+    codes_dtype = np.float16 if kind == "float16" else np.int8
+    tmp_codes_path = store_path / (codes_file + ".tmp.npy")
+    codes = np.lib.format.open_memmap(str(tmp_codes_path), mode="w+", dtype=codes_dtype, shape=(total, dim))
+    scales = np.empty(total, dtype=np.float32) if scales_file else None
+    for start in range(0, total, block_rows):
+        block_codes, block_scales = quantize_rows(np.asarray(matrix[start:start + block_rows], dtype=np.float32), kind)
+        codes[start:start + len(block_codes)] = block_codes
+        if scales is not None:
+            scales[start:start + len(block_codes)] = block_scales
+        if progress_callback:
+            progress_callback(min(1.0, (start + block_rows) / total), f"Quantizing vectors ({kind})")
+    codes.flush()
+    del codes
+    del matrix
+    if scales is not None:
+        np.save(str(store_path / scales_file), scales)
+    os.replace(tmp_codes_path, store_path / codes_file)
+
+    info_path = store_path / INFO_FILE
+    info = json.loads(info_path.read_text(encoding="utf-8"))
+    info.setdefault("quantized", {})[kind] = {"exported": info.get("exported")}
+    info_path.write_text(json.dumps(info, indent=2), encoding="utf-8")
+    message = f"Built {kind} index over {total} vectors in {time.time() - start_time:.2f}s."
+    if recall_queries > 0:
+        report = evaluate_quantized_recall(str(store_path), kind, k=recall_k, num_queries=recall_queries,
+                                           rescore_factor=rescore_factor)
+        info["quantized"][kind]["recall"] = report
+        info_path.write_text(json.dumps(info, indent=2), encoding="utf-8")
+        message += " " + format_recall_report(report)
+    return message
+
+
+def evaluate_quantized_recall(store_dir: str, kind: str, k: int = 10, num_queries: int = 200,
+                              rescore_factor: int = 4, query_vectors: Optional[np.ndarray] = None,
+                              seed: int = 0) -> Dict[str, Any]:
+    """
+    Recall@k of a quantized index against exact float32 search.
+
+    By default the queries are stored chunk vectors sampled at random (a stand-in for
+    real questions, which land in the same embedding space); pass `query_vectors`
+    (e.g. embedded benchmark questions) to measure on real traffic instead.
+
+    Returns:
+        dict: recall of the first pass alone and after re-scoring, average latencies
+              (ms) of exact and quantized search, and the in-RAM size of each index.
+    """
+    exact_store = NumpyVectorStore(store_dir)
+    quantized_store = NumpyVectorStore(store_dir, quantization=kind, rescore_factor=rescore_factor)
+    if query_vectors is None:
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(exact_store.count, size=min(num_queries, exact_store.count), replace=False))
+        query_vectors = np.asarray(exact_store.matrix[sample], dtype=np.float32)
+    else:
+        query_vectors = normalize_rows(np.asarray(query_vectors, dtype=np.float32))
+    k = min(k, exact_store.count)
+    first_pass_hits = rescored_hits = 0
+    exact_seconds = quantized_seconds = 0.0
+    for query in query_vectors:
+        t0 = time.perf_counter()
+        truth = {row for row, _ in exact_store.search_by_vector(query, k)}
+        t1 = time.perf_counter()
+        rescored = {row for row, _ in quantized_store.search_by_vector(query, k)}
+        t2 = time.perf_counter()
+        exact_seconds += t1 - t0
+        quantized_seconds += t2 - t1
+        first_pass_hits += len(truth & set(quantized_store.first_pass(query, k).tolist()))
+        rescored_hits += len(truth & rescored)
+    n = max(1, len(query_vectors) * k)
+    scales_bytes = quantized_store.scales.nbytes if quantized_store.scales is not None else 0
+    return {"kind": kind, "k": k, "queries": len(query_vectors), "rescore_factor": rescore_factor,
+            "recall_first_pass": first_pass_hits / n, "recall_rescored": rescored_hits / n,
+            "exact_ms": 1000 * exact_seconds / max(1, len(query_vectors)),
+            "quantized_ms": 1000 * quantized_seconds / max(1, len(query_vectors)),
+            "index_mb": (quantized_store.codes.nbytes + scales_bytes) / 2 ** 20,
+            "float32_mb": exact_store.matrix.nbytes / 2 ** 20}
+
+
+def format_recall_report(report: Dict[str, Any]) -> str:
+    """One-line summary of evaluate_quantized_recall."""
+    return (f"{report['kind']} recall@{report['k']} vs float32 over {report['queries']} queries: "
+            f"{report['recall_first_pass']:.3f} first pass, {report['recall_rescored']:.3f} after re-scoring "
+            f"(shortlist x{report['rescore_factor']}); {report['index_mb']:.1f} MB in RAM vs "
+            f"{report['float32_mb']:.1f} MB float32; {report['quantized_ms']:.2f} ms vs {report['exact_ms']:.2f} ms per query.")
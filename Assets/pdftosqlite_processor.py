@@ -1,24 +1,27 @@
 # pdftosqlite_processor.py
 import os
 import sqlite3
-import pandas as pd # Keep for potential future use, though not strictly in this refactor
-from grobid_client.grobid_client import GrobidClient
-import grobid_tei_xml
 import re
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple, Optional, Iterator, Iterable
+from sqlite_bulk_writer import DocumentTableWriter
+from ingest_manifest import IngestManifest, format_skip_report, source_file_name
+from tracing import get_tracer
+
+tracer = get_tracer()
 
 # --- Proxy Setup (same as main script, ensure consistency) ---
 # It's good practice to have this configured centrally if possible,
 # but for a module, it might be called when imported.
 os.environ['NO_PROXY'] = 'localhost,127.0.0.1,127.0.0.1:8070' # Added Grobid port
-import urllib3
-import requests
-urllib3.disable_warnings()
-if hasattr(urllib3.util.connection, 'is_connection_dropped'):
-    urllib3.util.connection.is_connection_dropped = lambda conn: False
-if hasattr(requests.Session(), 'trust_env'):
-    requests.Session().trust_env = False
+
+def _configure_grobid_http() -> None:
+    """HTTP settings for the GROBID client, applied when a client is created rather than on import."""
+    import urllib3
+    urllib3.disable_warnings()
+    if hasattr(urllib3.util.connection, 'is_connection_dropped'):
+        urllib3.util.connection.is_connection_dropped = lambda conn: False
 
 class GrobidAuthor: # From your script
     def __init__(self, full_name):
@@ -57,45 +60,195 @@ def extract_bibliographic_details(biblios: List[GrobidBiblio], print_choice=Fals
     ])
     return ref_list
 
+# Field names in structured text exports that differ from the document_table columns
+STRUCTURED_TEXT_KEY_MAP = {
+    "Record Number": "Record_Number",
+    "Author": "Authors", # Grobid uses Authors (plural)
+    # Add other mappings if needed
+}
+
+def _finish_structured_record(lines: List[str]) -> Optional[Dict[str, Any]]:
+    """Turns the "Key: value" lines of one record into a record dict (None if it has no title)."""
+    record = {}
+    for line in lines:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            # Normalize keys for consistency with Grobid output where possible
+            db_key = STRUCTURED_TEXT_KEY_MAP.get(key.strip(), key.strip())
+            record[db_key] = value.strip()
+
+    # Ensure essential keys for the DB schema exist, even if empty
+    for key_to_ensure in ["Title", "Authors", "DOI", "Abstract", "Date", "Journal", "Record_Number", "Citations", "Body", "Refs"]:
+        if key_to_ensure not in record:
+            record[key_to_ensure] = ""
+    if record.get("Abstract"): # If abstract is present, put it in Body too if Body is empty
+        if not record.get("Body"):
+            record["Body"] = record["Abstract"]
+
+    return record if record.get("Title") else None # Only keep records with a title
+
+def iter_structured_text_records(text_file_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the records of a structured text export one at a time.
+
+    Records are separated by blank lines and each field is a "Key: value" line (the
+    format of your example exports). The file is read line by line through Python's
+    buffered reader, so a record split across read buffers is simply completed by the
+    following lines, and memory use does not depend on the file size.
+    """
+    with open(text_file_path, 'r', encoding='utf-8') as file:
+        lines: List[str] = []
+        for line in file:
+            line = line.rstrip("\n")
+            if line == "": # Blank line ends the current record
+                if lines:
+                    record = _finish_structured_record(lines)
+                    if record:
+                        yield record
+                    lines = []
+            else:
+                lines.append(line)
+        if lines: # Last record without a trailing blank line
+            record = _finish_structured_record(lines)
+            if record:
+                yield record
+
 def parse_structured_text_file(text_file_path: str) -> List[Dict[str, Any]]: # From your script, adapted
+    """All records of a structured text export as a list (see iter_structured_text_records)."""
     records = []
     try:
-        with open(text_file_path, 'r', encoding='utf-8') as file:
-            text = file.read()
-            # Assuming records are separated by double newlines and each field is on a new line.
-            # This parsing is specific to the format in your example.
-            raw_records = text.split("\n\n") 
-            for record_text in raw_records:
-                if not record_text.strip():
-                    continue
-                record = {}
-                lines = record_text.split('\n')
-                for line in lines:
-                    if ":" in line:
-                        key, value = line.split(":", 1)
-                        # Normalize keys for consistency with Grobid output where possible
-                        key_map = {
-                            "Record Number": "Record_Number",
-                            "Author": "Authors", # Grobid uses Authors (plural)
-                            # Add other mappings if needed
-                        }
-                        db_key = key_map.get(key.strip(), key.strip())
-                        record[db_key] = value.strip()
-                
-                # Ensure essential keys for the DB schema exist, even if empty
-                for key_to_ensure in ["Title", "Authors", "DOI", "Abstract", "Date", "Journal", "Record_Number", "Citations", "Body", "Refs"]:
-                    if key_to_ensure not in record:
-                        record[key_to_ensure] = ""
-                if record.get("Abstract"): # If abstract is present, put it in Body too if Body is empty
-                    if not record.get("Body"):
-                        record["Body"] = record["Abstract"]
-
-                if record.get("Title"): # Only add if there's a title
-                    records.append(record)
+        for record in iter_structured_text_records(text_file_path):
+            records.append(record)
     except Exception as e:
         print(f"Error parsing structured text file {text_file_path}: {e}")
     return records
 
+def parse_grobid_tei(file_name: str, text_content: str) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Parses a GROBID TEI document into a document_table record.
+    Kept at module level (picklable) so it can run in a process pool.
+
+    Returns:
+        tuple: (record dict with the document_table columns, list of status messages)
+    """
+    import grobid_tei_xml # Imported here (also in process-pool workers) so importing this module stays cheap
+    messages = []
+    doc = grobid_tei_xml.parse_document_xml(text_content)
+
+    title = doc.header.title if hasattr(doc.header, 'title') and doc.header.title else "No Title"
+    authors = '; '.join([a.full_name for a in doc.header.authors]) if hasattr(doc.header, 'authors') and doc.header.authors else "No Authors"
+    doi = str(doc.header.doi) if hasattr(doc.header, 'doi') and doc.header.doi else "No DOI"
+
+    # Citations: count of biblStruct elements in the TEI body's listBibl
+    # This might differ from `len(doc.citations)` which could be for internal citation markers.
+    # For now, using len(doc.citations) as per your script for consistency.
+    citations = str(len(doc.citations)) if hasattr(doc, 'citations') else "0"
+
+    abstract = doc.abstract if hasattr(doc, 'abstract') and doc.abstract else "No Abstract"
+    body = doc.body if hasattr(doc, 'body') and doc.body else "No Body"
+    date_obj = doc.header.date if hasattr(doc.header, 'date') else None
+    date_str = str(date_obj) if date_obj else "No Date" # Improve date parsing if needed
+    journal = doc.header.journal if hasattr(doc.header, 'journal') and doc.header.journal else "No Journal"
+
+    ref_list = ""
+    if hasattr(doc, 'citations') and doc.citations: # Assuming doc.citations is a list of biblio objects
+        # The `grobid_tei_xml.parse_citation_list_xml` was used on the raw TEI `text_content`.
+        # If `doc.citations` already contains structured GrobidBiblio-like objects, adapt.
+        # If not, and you need to parse from raw TEI again:
+        try:
+            grobid_biblios = grobid_tei_xml.parse_citation_list_xml(text_content) # Re-parsing for biblio from full text
+            ref_list = extract_bibliographic_details(grobid_biblios)
+        except Exception as cite_error:
+            messages.append(f"Citation parsing error for {file_name}: {cite_error}")
+            ref_list = "Error parsing references"
+    else:
+        ref_list = "No references found by parser"
+
+    record = {
+        "Title": title, "Authors": authors, "DOI": doi, "Citations": citations,
+        "Abstract": abstract, "Body": body, "Date": date_str, "Refs": ref_list,
+        "Journal": journal, "Source_File": file_name,
+    }
+    return record, messages
+
+def fetch_grobid_tei(grobid_client: Any, file_path: Path) -> str:
+    """Sends one PDF to GROBID and returns the TEI XML. Raises ValueError on failure."""
+    # Note: process_pdf is a mock name for process_fulltext_document or similar
+    _service = "processFulltextDocument"
+    # For TEI Coordinates and sentence segmentation, ensure your Grobid version/config supports it.
+    # The default client might not expose all these as direct args to a generic `process_pdf`
+    # It's usually client.process_fulltext_document(pdf_file, ...)
+    # For simplicity, using the direct call as in your script.
+    resp, status_code, text_content = grobid_client.process_pdf(
+        _service, str(file_path), # process_pdf is an alias in some client versions
+        generateIDs=True, consolidate_header=True, consolidate_citations=True,
+        include_raw_citations=True, include_raw_affiliations=True,
+        tei_coordinates=True, segment_sentences=True # Check if your client version supports these directly
+    )
+    if status_code != 200 or not text_content or text_content.strip() == '':
+        raise ValueError(f"GROBID processing failed for {Path(file_path).name} (status {status_code}) or no text extracted.")
+    return text_content
+
+def iter_grobid_records(
+    grobid_client: Any,
+    pdf_files: List[Dict[str, Any]],
+    grobid_workers: int = 1,
+    parse_processes: int = 0
+) -> Iterator[Tuple[Dict[str, Any], Optional[Dict[str, Any]], List[str], Optional[Exception]]]:
+    """
+    Runs GROBID requests on a bounded thread pool and TEI parsing on an optional
+    process pool, yielding results in the order of `pdf_files`.
+
+    The caller stays the single writer: it receives results one by one, in input
+    order, so document IDs are assigned deterministically regardless of which
+    request finishes first. A failure only affects its own file.
+
+    Args:
+        grobid_client: Initialized GrobidClient.
+        pdf_files (list): File info dicts with "path" and "name".
+        grobid_workers (int): Number of concurrent GROBID requests (1 = sequential).
+        parse_processes (int): Number of TEI parsing processes (0 = parse in the request thread).
+
+    Yields:
+        tuple: (file_info, record or None, messages, error or None)
+    """
+    grobid_workers = max(1, int(grobid_workers))
+    parse_pool = ProcessPoolExecutor(max_workers=parse_processes) if parse_processes and parse_processes > 0 else None
+    trace_parent = tracer.current_span()  # The pool threads have no active span of their own
+
+    def fetch_and_parse(file_info):
+        with tracer.span("grobid.fetch", parent=trace_parent, file=file_info["name"]):
+            text_content = fetch_grobid_tei(grobid_client, file_info["path"])
+        with tracer.span("grobid.parse", parent=trace_parent, file=file_info["name"]):
+            if parse_pool is not None:
+                return parse_pool.submit(parse_grobid_tei, file_info["name"], text_content).result()
+            return parse_grobid_tei(file_info["name"], text_content)
+
+    # Bounded look-ahead: never more than a few files per worker queued or held in memory
+    max_ahead = grobid_workers * 2
+    try:
+        with ThreadPoolExecutor(max_workers=grobid_workers) as pool:
+            pending = []
+            file_iter = iter(pdf_files)
+            for file_info in file_iter:
+                pending.append((file_info, pool.submit(fetch_and_parse, file_info)))
+                if len(pending) >= max_ahead:
+                    break
+            while pending:
+                file_info, future = pending.pop(0)
+                try:
+                    record, messages = future.result()
+                    yield file_info, record, messages, None
+                except Exception as e:
+                    yield file_info, None, [], e
+                next_file = next(file_iter, None)
+                if next_file is not None:
+                    pending.append((next_file, pool.submit(fetch_and_parse, next_file)))
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown(wait=True)
+
+@tracer.traced("ingest")
 def process_documents_to_sqlite(
     input_path_str: str,           # Path to PDF directory or a single TXT file
     output_db_dir_str: str,        # Directory where the SQLite DB will be saved
@@ -103,7 +256,9 @@ def process_documents_to_sqlite(
     processing_mode: str,          # "grobid", "text", "both"
     overwrite_db: bool,
     grobid_config_path: str = "config.json", # Path to grobid config
-    progress_callback: Optional[callable] = None # For Gradio progress
+    progress_callback: Optional[callable] = None, # For Gradio progress
+    grobid_workers: int = 1,       # Concurrent GROBID requests (1 = one PDF at a time)
+    parse_processes: int = 0       # Processes for TEI parsing (0 = parse in the request thread)
 ) -> Tuple[str, Optional[str]]:
     
     input_path = Path(input_path_str)
@@ -119,6 +274,11 @@ def process_documents_to_sqlite(
             status_messages.append(f"Overwriting existing database: {database_name}")
             try:
                 os.remove(database_name)
+                # Leftover WAL files from an interrupted run must not be applied to the new DB
+                for suffix in ("-wal", "-shm"):
+                    leftover = Path(str(database_name) + suffix)
+                    if leftover.exists():
+                        os.remove(leftover)
             except Exception as e:
                 return f"Error removing existing database {database_name}: {e}", None
         else: # Append mode or determine starting ID
@@ -191,6 +351,34 @@ def process_documents_to_sqlite(
         conn.close()
         return "No compatible files found to process with the selected mode.", None
 
+    # Check every file against the ingest manifest before any GROBID/parsing work is dispatched
+    manifest = IngestManifest(conn, table_name)
+    skipped_files = []
+    files_to_ingest = []
+    with tracer.span("ingest.manifest_check", files=len(files_to_process)) as span:
+        for file_info in files_to_process:
+            # Stored as Source_File: relative to the database folder, so same-named files in different folders differ
+            file_info["source_file"] = source_file_name(file_info["path"], output_db_dir)
+            try:
+                check = manifest.check_file(file_info["path"], file_info["source_file"])
+            except OSError as e:
+                status_messages.append(f"Could not read {file_info['name']}: {e}")
+                continue
+            if check["action"] in ("unchanged", "duplicate"):
+                skipped_files.append((file_info["name"], check["action"]))
+                continue
+            file_info["manifest"] = check
+            files_to_ingest.append(file_info)
+        span.set(skipped=len(skipped_files))
+    files_to_process = files_to_ingest
+    skip_report = format_skip_report(skipped_files)
+    if skip_report:
+        status_messages.append(skip_report)
+    if not files_to_process:
+        conn.close()
+        status_messages.append("All files are already ingested; nothing to do.")
+        return "\n".join(status_messages), str(database_name)
+
     # Initialize Grobid client if needed
     grobid_client = None
     if any(f['type'] == 'pdf' for f in files_to_process): # Only init if PDFs are to be processed by Grobid
@@ -199,14 +387,77 @@ def process_documents_to_sqlite(
             no_proxy_env = os.environ.get('NO_PROXY', 'localhost,127.0.0.1,127.0.0.1:8070')
             
             # GrobidClient might not directly use os.environ['NO_PROXY'].
-            # It uses requests internally. The global requests session setting might help.
+            # It uses requests internally; the urllib3 settings are applied in _configure_grobid_http().
             # However, explicit proxy config in config.json or GrobidClient params is more reliable if needed.
             
-            grobid_client = GrobidClient(config_path=grobid_config_path, check_server=True) # check_server pings on init
+            with tracer.span("grobid.init"):
+                from grobid_client.grobid_client import GrobidClient
+                _configure_grobid_http()
+                grobid_client = GrobidClient(config_path=grobid_config_path, check_server=True) # check_server pings on init
             status_messages.append(f"GROBID client initialized (config: {grobid_config_path}).")
         except Exception as e:
             status_messages.append(f"GROBID client initialization failed: {e}. PDF processing will be skipped.")
             grobid_client = None # Ensure it's None if failed
+            # Recorded as failed, so the PDFs show up in the report and are retried on the next run
+            skipped_pdfs = [f for f in files_to_process if f["type"] == "pdf"]
+            for file_info in skipped_pdfs:
+                manifest.mark_failed(file_info["manifest"], f"GROBID client unavailable: {e}")
+            status_messages.append(format_skip_report([(f["name"], "failed") for f in skipped_pdfs]))
+            files_to_process = [f for f in files_to_process if f["type"] != "pdf"]
+
+    pdf_results = None
+    if grobid_client:
+        pdf_files = [f for f in files_to_process if f["type"] == "pdf"]
+        if grobid_workers > 1 or parse_processes > 0:
+            status_messages.append(f"Sending PDFs to GROBID with {grobid_workers} concurrent requests"
+                                   f"{f' and {parse_processes} parsing processes' if parse_processes > 0 else ''}.")
+        pdf_results = iter_grobid_records(grobid_client, pdf_files, grobid_workers, parse_processes)
+
+    # Records are buffered and written in large transactions instead of one commit per record.
+    # REPLACE lets a changed file overwrite its previous rows under the same IDs.
+    writer = DocumentTableWriter(conn, table_name, replace_existing=True)
+
+    def write_file_records(file_info: Dict[str, Any], records: Iterable[Dict[str, Any]],
+                           record_count: Optional[int] = None, on_record: Optional[callable] = None) -> Tuple[int, str]:
+        """
+        Queues a file's records (list or lazy iterator) in the writer. `record_count` is only
+        needed for a changed file, to decide whether its previous ID range can be reused.
+        Returns (records written, note for the status message).
+
+        If the file fails part way, its records that are still queued are dropped. Records
+        an intermediate batch already committed stay, and the file's manifest check is
+        pointed at them, so `mark_failed` records where they are and the retry replaces them.
+        """
+        nonlocal id_key
+        check = file_info["manifest"]
+        first_id, stale_statements = manifest.allocate_ids(check, record_count or 0, id_key, file_info["source_file"])
+        reusing_ids = first_id != id_key
+        checkpoint = writer.checkpoint()
+        # The old rows go in the same transaction as the first batch of new ones
+        for sql, params in stale_statements:
+            writer.add_statement(sql, params)
+        written = 0
+        try:
+            for record in records:
+                if reusing_ids and written >= record_count:
+                    raise ValueError(f"{file_info['name']} changed while it was being ingested; it will be retried on the next run.")
+                # Fields missing from the record are stored as NULL by the writer
+                writer.add({**record, "ID": first_id + written, "Source_File": file_info["source_file"]})
+                written += 1
+                if not reusing_ids:
+                    id_key = first_id + written
+                if on_record:
+                    on_record(written)
+        except Exception:
+            committed = writer.discard_since(checkpoint)
+            if not reusing_ids:
+                if committed:
+                    check.update(first_id=first_id, record_count=committed)
+                else:
+                    id_key = first_id  # Nothing of this file was written
+            raise
+        writer.add_statement(*manifest.entry_statement(check, first_id, written))
+        return written, (" (re-processed in place)" if check["action"] == "changed" else "")
 
     total_files = len(files_to_process)
     for i, file_info in enumerate(files_to_process):
@@ -220,92 +471,58 @@ def process_documents_to_sqlite(
         status_messages.append(f"Processing {file_name}...")
 
         if file_type == "pdf" and grobid_client:
+            # Results arrive in file order; the PDFs ahead of this one are already in flight
+            with tracer.span("ingest.wait_grobid", file=file_name):
+                _, record, parse_messages, error = next(pdf_results)
+            status_messages.extend(parse_messages)
+            if error is not None:
+                status_messages.append(f"Error processing PDF {file_name} with GROBID: {error}")
+                manifest.mark_failed(file_info["manifest"], str(error))
+                continue
             try:
-                # Note: process_pdf is a mock name for process_fulltext_document or similar
-                _service = "processFulltextDocument" 
-                # For TEI Coordinates and sentence segmentation, ensure your Grobid version/config supports it.
-                # The default client might not expose all these as direct args to a generic `process_pdf`
-                # It's usually client.process_fulltext_document(pdf_file, ...)
-                # For simplicity, using the direct call as in your script.
-                resp, status_code, text_content = grobid_client.process_pdf(
-                    _service, str(file_path), # process_pdf is an alias in some client versions
-                    generateIDs=True, consolidate_header=True, consolidate_citations=True,
-                    include_raw_citations=True, include_raw_affiliations=True,
-                    tei_coordinates=True, segment_sentences=True # Check if your client version supports these directly
-                )
-
-                if status_code != 200 or not text_content or text_content.strip() == '':
-                    raise ValueError(f"GROBID processing failed for {file_name} (status {status_code}) or no text extracted.")
-
-                doc = grobid_tei_xml.parse_document_xml(text_content)
-                
-                title = doc.header.title if hasattr(doc.header, 'title') and doc.header.title else "No Title"
-                authors = '; '.join([a.full_name for a in doc.header.authors]) if hasattr(doc.header, 'authors') and doc.header.authors else "No Authors"
-                doi = str(doc.header.doi) if hasattr(doc.header, 'doi') and doc.header.doi else "No DOI"
-                
-                # Citations: count of biblStruct elements in the TEI body's listBibl
-                # This might differ from `len(doc.citations)` which could be for internal citation markers.
-                # For now, using len(doc.citations) as per your script for consistency.
-                citations = str(len(doc.citations)) if hasattr(doc, 'citations') else "0"
-                
-                abstract = doc.abstract if hasattr(doc, 'abstract') and doc.abstract else "No Abstract"
-                body = doc.body if hasattr(doc, 'body') and doc.body else "No Body"
-                date_obj = doc.header.date if hasattr(doc.header, 'date') else None
-                date_str = str(date_obj) if date_obj else "No Date" # Improve date parsing if needed
-                journal = doc.header.journal if hasattr(doc.header, 'journal') and doc.header.journal else "No Journal"
-
-                ref_list = ""
-                if hasattr(doc, 'citations') and doc.citations: # Assuming doc.citations is a list of biblio objects
-                    # The `grobid_tei_xml.parse_citation_list_xml` was used on the raw TEI `text_content`.
-                    # If `doc.citations` already contains structured GrobidBiblio-like objects, adapt.
-                    # If not, and you need to parse from raw TEI again:
-                    try:
-                        grobid_biblios = grobid_tei_xml.parse_citation_list_xml(text_content) # Re-parsing for biblio from full text
-                        ref_list = extract_bibliographic_details(grobid_biblios)
-                    except Exception as cite_error:
-                        status_messages.append(f"Citation parsing error for {file_name}: {cite_error}")
-                        ref_list = "Error parsing references"
-                else:
-                    ref_list = "No references found by parser"
-
-                cursor.execute(f'''
-                    INSERT INTO {table_name} (ID, Title, Authors, DOI, Citations, Abstract, Body, Date, Refs, Journal, Source_File)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (id_key, title, authors, doi, citations, abstract, body, date_str, ref_list, journal, file_name))
-                conn.commit()
-                id_key += 1
-                status_messages.append(f"Successfully processed and stored PDF: {file_name}")
+                with tracer.span("ingest.queue_records", file=file_name):
+                    _, note = write_file_records(file_info, [record], record_count=1)
+                tracer.count("ingest_files_total", type="pdf")
+                status_messages.append(f"Successfully processed and stored PDF: {file_name}{note}")
 
             except Exception as e:
-                status_messages.append(f"Error processing PDF {file_name} with GROBID: {e}")
+                status_messages.append(f"Error writing records to SQLite (batch ending with {file_name}): {e}")
+                manifest.mark_failed(file_info["manifest"], str(e))
                 continue
 
         elif file_type == "txt":
             try:
-                records = parse_structured_text_file(str(file_path))
-                if not records:
+                record_count = None
+                if file_info["manifest"].get("first_id") is not None:
+                    # Changed file: count its records first so they can reuse the previous ID range
+                    record_count = sum(1 for _ in iter_structured_text_records(str(file_path)))
+
+                def report_records(written: int, i=i, file_name=file_name):
+                    if progress_callback and written % 5000 == 0:
+                        progress_callback(i / total_files, f"Processing {file_name} ({i+1}/{total_files}): {written} records")
+
+                # Records go to the writer as they are parsed; large exports are never held in memory
+                with tracer.span("ingest.txt_file", file=file_name) as span:
+                    written, note = write_file_records(file_info, iter_structured_text_records(str(file_path)),
+                                                       record_count, on_record=report_records)
+                    span.set(records=written)
+                tracer.count("ingest_files_total", type="txt")
+                if not written:
                     status_messages.append(f"No records found or parsed from TXT: {file_name}")
                     continue
-                
-                for record in records:
-                    # Ensure all fields expected by the DB are present, defaulting to None or empty string
-                    cursor.execute(f'''
-                        INSERT INTO {table_name} (ID, Title, Authors, DOI, Citations, Abstract, Body, Date, Record_Number, Refs, Journal, Source_File)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        id_key,
-                        record.get('Title'), record.get('Authors'), record.get('DOI'),
-                        record.get('Citations'), record.get('Abstract'), record.get('Body'),
-                        record.get('Date'), record.get('Record_Number'), record.get('Refs'),
-                        record.get('Journal'), file_name
-                    ))
-                    conn.commit()
-                    id_key += 1
-                status_messages.append(f"Successfully processed and stored TXT: {file_name} ({len(records)} records)")
+                status_messages.append(f"Successfully processed and stored TXT: {file_name} ({written} records){note}")
             except Exception as e:
                 status_messages.append(f"Error processing TXT {file_name}: {e}")
+                manifest.mark_failed(file_info["manifest"], str(e))
                 continue
     
+    with tracer.span("ingest.finish_writes"):
+        write_error = writer.finish()
+    tracer.count("ingest_records_total", writer.rows_written)
+    if write_error:
+        status_messages.append(write_error)
+    status_messages.append(f"Wrote {writer.rows_written} records to '{table_name}'.")
+
     if progress_callback:
         progress_callback(1.0, "Processing complete.")
 
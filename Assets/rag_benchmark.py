@@ -0,0 +1,348 @@
+# rag_benchmark.py
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator
+
+from sqlite_bulk_writer import DocumentTableWriter, DOCUMENT_TABLE_COLUMNS
+from stub_openai_server import StubOpenAIServer
+
+BENCHMARK_RESULTS_DIR = "benchmark_results"
+
+# Small scientific-sounding vocabulary so the synthetic corpus has topical overlap between documents
+_TOPIC_WORDS = [
+    "ligase", "ubiquitin", "kinase", "phosphorylation", "apoptosis", "p53", "BRCA1", "mutation", "tumor",
+    "suppressor", "receptor", "signaling", "pathway", "transcription", "promoter", "enhancer", "chromatin",
+    "methylation", "protein", "folding", "chaperone", "proteasome", "degradation", "substrate", "binding",
+    "domain", "structure", "crystal", "cryo-EM", "assay", "knockout", "mouse", "cell", "line", "expression",
+    "RNA", "sequencing", "variant", "allele", "cohort", "patients", "survival", "inhibitor", "drug", "dose",
+]
+_FILLER_WORDS = ["the", "of", "and", "in", "was", "were", "to", "a", "with", "for", "by", "that", "we", "this"]
+
+
+class BenchChunk:
+    """Minimal chunk (page_content + metadata), so the benchmark does not need the app's text splitter."""
+
+    def __init__(self, page_content: str, metadata: Dict[str, Any]):
+        self.page_content = page_content
+        self.metadata = metadata
+
+
+class StubEmbeddings:
+    """Embeddings adapter (embed_documents / embed_query) over BatchedEmbeddingEngine, for langchain Chroma."""
+
+    def __init__(self, client: Any, model: str = "nomic-embed-text", batch_size: int = 64, max_in_flight: int = 4):
+        from embedding_engine import BatchedEmbeddingEngine
+        self.engine = BatchedEmbeddingEngine(client, model=model, batch_size=batch_size, max_in_flight=max_in_flight)
+        self.client = client
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.engine.embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.client.embeddings.create(input=[text], model=self.model).data[0].embedding
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50 / p95 / p99 / mean / max of durations in seconds, reported in milliseconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] * 1000
+
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+            "mean_ms": 1000 * sum(ordered) / len(ordered), "max_ms": ordered[-1] * 1000, "n": len(ordered)}
+
+
+def synthetic_record(rng: random.Random, record_id: int, body_words: int) -> Dict[str, Any]:
+    """One document_table row with a topical title, abstract and body."""
+    topic = rng.sample(_TOPIC_WORDS, 4)
+
+    def sentence(length: int) -> str:
+        words = [rng.choice(topic) if rng.random() < 0.3 else rng.choice(_TOPIC_WORDS + _FILLER_WORDS)
+                 for _ in range(length)]
+        return " ".join(words).capitalize() + "."
+
+    body = []
+    written = 0
+    while written < body_words:
+        length = rng.randint(8, 25)
+        body.append(sentence(length))
+        written += length
+    return {
+        "ID": record_id, "Title": " ".join(topic).title(), "Authors": f"Author {rng.randint(1, 500)}, Author {rng.randint(1, 500)}",
+        "DOI": f"10.5555/bench.{record_id}", "Citations": str(rng.randint(0, 300)),
+        "Abstract": " ".join(sentence(rng.randint(10, 20)) for _ in range(4)), "Body": " ".join(body),
+        "Date": str(rng.randint(1995, 2025)), "Record_Number": str(record_id), "Refs": "",
+        "Journal": "Journal of Benchmarks", "Source_File": f"synthetic_{record_id // 100}.txt",
+    }
+
+
+def build_synthetic_document_table(db_path: str, num_docs: int = 2000, body_words: int = 1500,
+                                   seed: int = 7, table_name: str = "document_table") -> Dict[str, Any]:
+    """
+    Writes a synthetic document_table through DocumentTableWriter (the ingestion write path).
+
+    Returns:
+        dict: rows, seconds and rows_per_s of the write (record generation excluded).
+    """
+    rng = random.Random(seed)
+    records = [synthetic_record(rng, i, body_words) for i in range(1, num_docs + 1)]
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        columns = ", ".join(f"{c} INTEGER PRIMARY KEY" if c == "ID" else f"{c} TEXT" for c in DOCUMENT_TABLE_COLUMNS)
+        conn.execute(f"CREATE TABLE {table_name} ({columns})")
+        start_time = time.perf_counter()
+        writer = DocumentTableWriter(conn, table_name)
+        writer.add_many(records)
+        error = writer.finish()
+        seconds = time.perf_counter() - start_time
+    finally:
+        conn.close()
+    if error:
+        raise RuntimeError(error)
+    return {"rows": num_docs, "seconds": seconds, "rows_per_s": num_docs / seconds if seconds else 0.0}
+
+
+def iter_bench_chunks(db_path: str, chunk_size: int = 2000, chunk_overlap: int = 200,
+                      table_name: str = "document_table") -> Iterator[BenchChunk]:
+    """Fixed-size character chunks (with overlap) of Abstract + Body, with doc_id / chunk_id metadata."""
+    conn = sqlite3.connect(db_path)
+    chunk_id = 0
+    try:
+        for doc_id, title, abstract, body in conn.execute(f"SELECT ID, Title, Abstract, Body FROM {table_name} ORDER BY ID"):
+            text = f"{abstract or ''}\n\n{body or ''}".strip()
+            step = max(1, chunk_size - chunk_overlap)
+            for start in range(0, max(1, len(text) - chunk_overlap), step):
+                yield BenchChunk(text[start:start + chunk_size], {"doc_id": doc_id, "chunk_id": chunk_id, "Title": title})
+                chunk_id += 1
+    finally:
+        conn.close()
+
+
+def make_queries(chunks: List[BenchChunk], num_queries: int = 200, seed: int = 11) -> List[str]:
+    """Queries made of word runs sampled from random chunks (so each has relevant documents)."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(num_queries):
+        words = rng.choice(chunks).page_content.split()
+        start = rng.randrange(max(1, len(words) - 12))
+        queries.append(" ".join(words[start:start + rng.randint(4, 12)]))
+    return queries
+
+
+def measure_chat_ttft(chat_fn: callable, queries: List[str], vectordb: Any,
+                      streaming_status: str = "Streaming LLM response...") -> Dict[str, Any]:
+    """
+    Time-to-first-token and total time of the app's chat handler.
+
+    Args:
+        chat_fn (callable): `chat_fn(query, vectordb) -> iterator` of handle_chat_interaction_gradio outputs.
+        queries (list): Questions to ask, one turn each.
+        vectordb: The benchmark's vector store, passed on to `chat_fn`.
+        streaming_status (str): Status text (last output) of the first yield that carries an answer token.
+    """
+    ttft, totals, retrieval = [], [], []
+    for query in queries:
+        start_time = time.perf_counter()
+        first_token = retrieved = None
+        for outputs in chat_fn(query, vectordb):
+            status = outputs[-1] if isinstance(outputs, (list, tuple)) and outputs else ""
+            now = time.perf_counter()
+            if retrieved is None and status == "Waiting for LLM...":
+                retrieved = now - start_time
+            if first_token is None and status == streaming_status:
+                first_token = now - start_time
+        totals.append(time.perf_counter() - start_time)
+        if first_token is not None:
+            ttft.append(first_token)
+        if retrieved is not None:
+            retrieval.append(retrieved)
+    return {"ttft": percentiles(ttft), "total": percentiles(totals), "until_prompt": percentiles(retrieval)}
+
+
+def git_commit(repo_dir: str) -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo_dir, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmark(num_docs: int = 2000, body_words: int = 1500, num_queries: int = 200, k: int = 10,
+                  work_dir: Optional[str] = None, out_dir: str = BENCHMARK_RESULTS_DIR,
+                  server: Optional[StubOpenAIServer] = None, chat_fn: Optional[callable] = None,
+                  chat_queries: int = 20, batch_size: int = 64, max_in_flight: int = 4,
+                  window_size: int = 1000, label: str = "", **server_options) -> Dict[str, Any]:
+    """
+    Runs the offline RAG benchmark and writes the results as JSON.
+
+    Stages: synthetic document_table ingest (rows/s), chunking, embedding through the
+    stub server (chunks/s), ChromaDB build and reload (s), vector retrieval latency
+    (p50/p95/p99) and, with `chat_fn`, the chat handler's time-to-first-token.
+    Stages whose dependencies (openai, langchain Chroma) are missing are reported
+    as skipped instead of failing the run.
+
+    Args:
+        num_docs (int): Synthetic documents.
+        body_words (int): Words per document body.
+        num_queries (int): Retrieval queries.
+        k (int): Chunks per query.
+        work_dir (str): Where the SQLite and Chroma files go (a temp dir by default).
+        out_dir (str): Directory for the results JSON.
+        server (StubOpenAIServer): A running stub server; one is started (and stopped) otherwise.
+        chat_fn (callable): Optional `chat_fn(query, vectordb) -> iterator` (see measure_chat_ttft). The
+                            handler talks to the app's LLM endpoint, so start the stub on its port
+                            (`port=1238`) when measuring the chat handler.
+        chat_queries (int): Chat turns measured.
+        batch_size, max_in_flight (int): BatchedEmbeddingEngine settings.
+        window_size (int): Chunks per Chroma add window.
+        label (str): Free text stored with the results (e.g. the change being measured).
+        **server_options: StubOpenAIServer arguments when the server is started here.
+
+    Returns:
+        dict: The results (also written to `<out_dir>/<timestamp>_<label>.json`).
+    """
+    work_path = Path(work_dir or tempfile.mkdtemp(prefix="rag_bench_"))
+    work_path.mkdir(parents=True, exist_ok=True)
+    own_server = server is None
+    if own_server:
+        server = StubOpenAIServer(**server_options).start()
+    results: Dict[str, Any] = {
+        "label": label, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "git_commit": git_commit(str(Path(__file__).parent)),
+        "python": sys.version.split()[0], "platform": platform.platform(),
+        "config": {"num_docs": num_docs, "body_words": body_words, "num_queries": num_queries, "k": k,
+                   "batch_size": batch_size, "max_in_flight": max_in_flight, "window_size": window_size,
+                   "server": {"embed_latency": server.embed_latency, "embed_latency_per_input": server.embed_latency_per_input,
+                              "first_token_latency": server.first_token_latency, "tokens_per_second": server.tokens_per_second}},
+        "stages": {}, "skipped": {},
+    }
+    stages = results["stages"]
+    try:
+        db_path = str(work_path / "bench.db")
+        print(f"Benchmark: writing {num_docs} synthetic documents to {db_path}...")
+        stages["ingest"] = build_synthetic_document_table(db_path, num_docs, body_words)
+
+        start_time = time.perf_counter()
+        chunks = list(iter_bench_chunks(db_path))
+        stages["chunking"] = {"chunks": len(chunks), "seconds": time.perf_counter() - start_time}
+        queries = make_queries(chunks, num_queries)
+
+        try:
+            from openai import OpenAI
+        except ImportError as e:
+            results["skipped"]["embedding"] = results["skipped"]["vector_store"] = f"openai not installed ({e})"
+            return results
+        client = OpenAI(base_url=server.base_url, api_key="stub")
+        embeddings = StubEmbeddings(client, batch_size=batch_size, max_in_flight=max_in_flight)
+
+        print(f"Benchmark: embedding {len(chunks)} chunks...")
+        start_time = time.perf_counter()
+        embeddings.embed_documents([c.page_content for c in chunks])
+        seconds = time.perf_counter() - start_time
+        stages["embedding"] = {"chunks": len(chunks), "seconds": seconds,
+                               "chunks_per_s": len(chunks) / seconds if seconds else 0.0}
+
+        try:
+            from langchain_community.vectorstores import Chroma
+            from chroma_sync import add_in_windows
+        except ImportError as e:
+            results["skipped"]["vector_store"] = f"langchain Chroma not installed ({e})"
+            return results
+        persist_dir = str(work_path / "chroma_bench_db")
+        print(f"Benchmark: building ChromaDB in {persist_dir}...")
+        start_time = time.perf_counter()
+        vectordb = Chroma(persist_directory=persist_dir, embedding_function=embeddings)
+        add_in_windows(vectordb, chunks, window_size)
+        stages["chroma_build"] = {"chunks": len(chunks), "seconds": time.perf_counter() - start_time}
+        del vectordb
+
+        start_time = time.perf_counter()
+        vectordb = Chroma(persist_directory=persist_dir, embedding_function=embeddings)
+        count = vectordb._collection.count()
+        stages["chroma_load"] = {"chunks": count, "seconds": time.perf_counter() - start_time}
+
+        print(f"Benchmark: {len(queries)} retrieval queries (k={k})...")
+        durations = []
+        for query in queries:
+            start_time = time.perf_counter()
+            vectordb.similarity_search(query, k=k)
+            durations.append(time.perf_counter() - start_time)
+        stages["retrieval"] = percentiles(durations)
+
+        if chat_fn is not None:
+            print(f"Benchmark: {chat_queries} chat turns...")
+            stages["chat"] = measure_chat_ttft(chat_fn, queries[:chat_queries], vectordb)
+        results["server_stats"] = dict(server.stats)
+        return results
+    finally:
+        if own_server:
+            server.stop()
+        out_path = Path(out_dir)
+        out_path.mkdir(parents=True, exist_ok=True)
+        suffix = f"_{label}" if label else ""
+        result_file = out_path / f"{time.strftime('%Y%m%d_%H%M%S')}{suffix}.json"
+        result_file.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        results["result_file"] = str(result_file)
+        print(f"Benchmark results written to {result_file}")
+
+
+def _flatten(data: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def compare_results(baseline_file: str, candidate_file: str) -> str:
+    """Side-by-side table of every numeric stage metric of two result files, with the relative change."""
+    baseline = _flatten(json.loads(Path(baseline_file).read_text(encoding="utf-8")).get("stages", {}))
+    candidate = _flatten(json.loads(Path(candidate_file).read_text(encoding="utf-8")).get("stages", {}))
+    lines = [f"{'metric':<32} {'baseline':>12} {'candidate':>12} {'change':>9}"]
+    for name in sorted(set(baseline) | set(candidate)):
+        old, new = baseline.get(name), candidate.get(name)
+        change = f"{100.0 * (new - old) / old:+.1f}%" if old and new is not None else ""
+        old_text = f"{old:.6g}" if old is not None else "-"
+        new_text = f"{new:.6g}" if new is not None else "-"
+        lines.append(f"{name:<32} {old_text:>12} {new_text:>12} {change:>9}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Offline RAG pipeline benchmark against a stub OpenAI server.")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--body-words", type=int, default=1500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--out-dir", default=BENCHMARK_RESULTS_DIR)
+    parser.add_argument("--label", default="")
+    parser.add_argument("--embed-latency", type=float, default=0.01)
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"), help="Compare two result files and exit.")
+    args = parser.parse_args()
+    if args.compare:
+        print(compare_results(*args.compare))
+    else:
+        summary = run_benchmark(num_docs=args.docs, body_words=args.body_words, num_queries=args.queries, k=args.k,
+                                out_dir=args.out_dir, label=args.label, embed_latency=args.embed_latency,
+                                first_token_latency=args.first_token_latency, tokens_per_second=args.tokens_per_second)
+        print(json.dumps(summary["stages"], indent=2))
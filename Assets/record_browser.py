@@ -0,0 +1,301 @@
+# record_browser.py
+import re
+import sqlite3
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+SEARCH_TABLE = "record_search_fts"
+SEARCH_INFO_TABLE = "record_search_info"
+SEARCH_TRIGGERS = {f"{SEARCH_TABLE}_ai": "AFTER INSERT", f"{SEARCH_TABLE}_ad": "AFTER DELETE",
+                   f"{SEARCH_TABLE}_au": "AFTER UPDATE"}
+SEARCH_COLUMNS = ["Title", "Authors", "DOI"]
+SUMMARY_COLUMNS = ["Title", "Authors", "Date", "Record_Number", "Journal", "DOI", "Citations", "Abstract"]
+LARGE_COLUMNS = ["Body", "Refs"]  # Loaded only when the user asks for them
+DISPLAY_TITLE_CHARS = 70
+
+
+class RecordPage:
+    """One page of (ID, Title) rows plus the keys needed to fetch the neighbouring pages."""
+
+    def __init__(self, rows: List[Tuple[Any, str]], has_previous: bool, has_next: bool, query: str = "",
+                 indexed: bool = True):
+        self.rows = rows
+        self.has_previous = has_previous
+        self.has_next = has_next
+        self.query = query
+        self.indexed = indexed  # False: the search fell back to an unindexed LIKE scan
+
+    @property
+    def first_id(self) -> Optional[Any]:
+        return self.rows[0][0] if self.rows else None
+
+    @property
+    def last_id(self) -> Optional[Any]:
+        return self.rows[-1][0] if self.rows else None
+
+    def choices(self) -> List[Tuple[str, Any]]:
+        """(label, ID) pairs for a dropdown."""
+        options = []
+        for record_id, title in self.rows:
+            title_str = str(title) if title else "No Title"
+            if len(title_str) > DISPLAY_TITLE_CHARS:
+                title_str = title_str[:DISPLAY_TITLE_CHARS] + "..."
+            options.append((f"ID {record_id}: {title_str}", record_id))
+        return options
+
+
+def build_prefix_query(text: str, max_terms: int = 8) -> str:
+    """
+    FTS5 query for search-as-you-type: every whitespace-separated term must match, the
+    last one as a prefix (a DOI such as 10.1038/nat becomes a phrase with a prefix).
+    """
+    terms = [t.replace('"', '') for t in text.split() if t.replace('"', '')][:max_terms]
+    if not terms:
+        return ""
+    return " ".join(f'"{t}"' for t in terms[:-1]) + (" " if len(terms) > 1 else "") + f'"{terms[-1]}"*'
+
+
+class RecordBrowser:
+    """
+    Keyset-paginated, searchable view of a document_table.
+
+    Pages are fetched with `WHERE ID > ? ORDER BY ID LIMIT n` (the INTEGER PRIMARY KEY),
+    so any page costs the same no matter how deep into the table it is, and only ID and
+    Title of the visible page leave SQLite. Searches over Title, Authors and DOI go through
+    an external-content FTS5 index (no second copy of the text) and are paged the same
+    way by rowid. Triggers on the table keep the index in sync with inserts, updates and
+    deletes (including re-processed files). Body and Refs are read only by `large_fields()`.
+    """
+
+    def __init__(self, sqlite_db_path: str, table_name: Optional[str] = None, page_size: int = 50):
+        """
+        Args:
+            sqlite_db_path (str): SQLite database to browse.
+            table_name (str): Table to browse (document_table, else the first table).
+            page_size (int): Records per page.
+        """
+        self.sqlite_db_path = str(sqlite_db_path)
+        self.page_size = max(1, int(page_size))
+        conn = self._connect()
+        try:
+            if table_name is None:
+                row = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='document_table'").fetchone()
+                if not row:
+                    row = conn.execute("SELECT name FROM sqlite_master WHERE type='table' "
+                                       "AND name NOT LIKE 'sqlite_%' AND name NOT LIKE 'record_search%' "
+                                       "ORDER BY rowid LIMIT 1").fetchone()
+                if not row:
+                    raise ValueError("No tables found in the database.")
+                table_name = row[0]
+            self.table_name = table_name
+            self.columns = [row[1] for row in conn.execute(f"PRAGMA table_info({self.table_name})")]
+        finally:
+            conn.close()
+        if "ID" not in self.columns:
+            raise ValueError(f"Table '{self.table_name}' has no ID column to page by.")
+        self.title_column = "Title" if "Title" in self.columns else None
+        self.search_columns = [c for c in SEARCH_COLUMNS if c in self.columns]
+        self._search_indexed: Optional[bool] = None
+
+    def _connect(self, read_only: bool = True) -> sqlite3.Connection:
+        # Short-lived connections: Gradio runs callbacks on worker threads
+        if read_only:
+            return sqlite3.connect(f"file:{self.sqlite_db_path}?mode=ro", uri=True, timeout=30)
+        return sqlite3.connect(self.sqlite_db_path, timeout=30)
+
+    def count(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {self.table_name}").fetchone()[0]
+        finally:
+            conn.close()
+
+    # --- Search index ---
+    def _table_state(self, conn: sqlite3.Connection) -> Tuple[int, Any]:
+        return tuple(conn.execute(f"SELECT COUNT(*), MAX(ID) FROM {self.table_name}").fetchone())
+
+    def _trigger_sql(self) -> List[str]:
+        columns = ", ".join(self.search_columns)
+        new_values = ", ".join(f"new.{c}" for c in self.search_columns)
+        old_values = ", ".join(f"old.{c}" for c in self.search_columns)
+        insert_new = f"INSERT INTO {SEARCH_TABLE} (rowid, {columns}) VALUES (new.ID, {new_values});"
+        delete_old = (f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, {columns}) "
+                      f"VALUES ('delete', old.ID, {old_values});")
+        bodies = {"AFTER INSERT": insert_new, "AFTER DELETE": delete_old, "AFTER UPDATE": delete_old + " " + insert_new}
+        return [f"CREATE TRIGGER {name} {event} ON {self.table_name} BEGIN {bodies[event]} END"
+                for name, event in SEARCH_TRIGGERS.items()]
+
+    def search_index_current(self) -> bool:
+        """
+        Cheap staleness check: the index was built and its sync triggers exist. An index built
+        without them (before they were added) is rebuilt once.
+        """
+        conn = self._connect()
+        try:
+            exists = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?",
+                                  (SEARCH_INFO_TABLE,)).fetchone()
+            if not exists:
+                return False
+            triggers = conn.execute(f"SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND tbl_name=? "
+                                    f"AND name IN ({', '.join('?' * len(SEARCH_TRIGGERS))})",
+                                    (self.table_name, *SEARCH_TRIGGERS)).fetchone()[0]
+            if triggers != len(SEARCH_TRIGGERS):
+                return False
+            row = conn.execute(f"SELECT Built FROM {SEARCH_INFO_TABLE} WHERE Table_Name = ?",
+                               (self.table_name,)).fetchone()
+            return row is not None
+        finally:
+            conn.close()
+
+    def ensure_search_index(self, force: bool = False) -> str:
+        """
+        Builds (or rebuilds, when it is missing or out of date) the FTS5 index over Title,
+        Authors and DOI, with the triggers that keep it current. Without write access or
+        FTS5 the browser still works, searching with a LIKE scan.
+
+        Returns:
+            str: Status message.
+        """
+        if not self.search_columns:
+            self._search_indexed = False
+            return "No Title/Authors/DOI columns to search."
+        if not force and self.search_index_current():
+            self._search_indexed = True
+            return "Record search index up to date."
+        start_time = time.time()
+        try:
+            conn = self._connect(read_only=False)
+        except sqlite3.Error as e:
+            self._search_indexed = False
+            return f"Record search index not available ({e}); searching without an index."
+        try:
+            with conn:
+                for name in SEARCH_TRIGGERS:
+                    conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                conn.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+                conn.execute(f"""CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(
+                                 {', '.join(self.search_columns)},
+                                 content='{self.table_name}', content_rowid='ID',
+                                 tokenize = 'unicode61 remove_diacritics 2')""")
+                conn.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')")
+                for sql in self._trigger_sql():
+                    conn.execute(sql)
+                conn.execute(f"""CREATE TABLE IF NOT EXISTS {SEARCH_INFO_TABLE}
+                                 (Table_Name TEXT PRIMARY KEY, Row_Count INTEGER, Max_ID INTEGER, Built REAL)""")
+                row_count, max_id = self._table_state(conn)
+                conn.execute(f"INSERT OR REPLACE INTO {SEARCH_INFO_TABLE} VALUES (?, ?, ?, ?)",
+                             (self.table_name, row_count, max_id, time.time()))
+        except sqlite3.Error as e:
+            self._search_indexed = False
+            return f"Record search index not available ({e}); searching without an index."
+        finally:
+            conn.close()
+        self._search_indexed = True
+        return f"Record search index built over {row_count} records in {time.time() - start_time:.2f}s."
+
+    @property
+    def search_indexed(self) -> bool:
+        if self._search_indexed is None:
+            self._search_indexed = self.search_index_current()
+        return self._search_indexed
+
+    # --- Pages ---
+    def page(self, query: str = "", after_id: Optional[Any] = None, before_id: Optional[Any] = None) -> RecordPage:
+        """
+        One page of (ID, Title) rows in ID order, optionally filtered by a search query.
+
+        Args:
+            query (str): Search text over Title, Authors and DOI ('' = all records).
+            after_id: Return the page following this ID (next page).
+            before_id: Return the page preceding this ID (previous page).
+        """
+        query = (query or "").strip()
+        title_sql = f"t.{self.title_column}" if self.title_column else "NULL"
+        conditions, params = [], []
+        backwards = before_id is not None
+        if backwards:
+            conditions.append("t.ID < ?")
+            params.append(before_id)
+        elif after_id is not None:
+            conditions.append("t.ID > ?")
+            params.append(after_id)
+
+        indexed = True
+        source = f"{self.table_name} AS t"
+        order_column = "t.ID"
+        if query:
+            match_query = build_prefix_query(query)
+            if self.search_indexed and not match_query:
+                pass  # Only quotes typed so far: no filter
+            elif self.search_indexed:
+                source = f"{SEARCH_TABLE} AS s JOIN {self.table_name} AS t ON t.ID = s.rowid"
+                conditions.insert(0, f"{SEARCH_TABLE} MATCH ?")
+                params.insert(0, match_query)
+                # Let FTS5 apply the rowid range and order itself
+                conditions = [c.replace("t.ID", "s.rowid") for c in conditions]
+                order_column = "s.rowid"
+            elif self.search_columns:
+                indexed = False
+                pattern = f"%{query}%"
+                conditions.insert(0, "(" + " OR ".join(f"t.{c} LIKE ?" for c in self.search_columns) + ")")
+                params[0:0] = [pattern] * len(self.search_columns)
+
+        where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order_sql = "DESC" if backwards else "ASC"
+        sql = f"SELECT t.ID, {title_sql} FROM {source} {where_sql} ORDER BY {order_column} {order_sql} LIMIT ?"
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params + [self.page_size + 1]).fetchall()
+        except sqlite3.OperationalError as e:
+            if query and re.search(r"fts5|syntax", str(e), re.IGNORECASE):
+                return RecordPage([], False, False, query, indexed)  # Text FTS5 cannot parse (yet, while typing)
+            raise
+        finally:
+            conn.close()
+        has_more = len(rows) > self.page_size
+        rows = [tuple(r) for r in rows[:self.page_size]]
+        if backwards:
+            rows.reverse()
+            return RecordPage(rows, has_previous=has_more, has_next=True, query=query, indexed=indexed)
+        return RecordPage(rows, has_previous=after_id is not None, has_next=has_more, query=query, indexed=indexed)
+
+    # --- Records ---
+    def _fetch(self, record_id: Any, columns: List[str]) -> Optional[Dict[str, Any]]:
+        present = [c for c in columns if c in self.columns]
+        if not present:
+            return {}
+        conn = self._connect()
+        try:
+            row = conn.execute(f"SELECT {', '.join(present)} FROM {self.table_name} WHERE ID = ?", (record_id,)).fetchone()
+        finally:
+            conn.close()
+        return dict(zip(present, row)) if row else None
+
+    def summary(self, record_id: Any) -> Optional[Dict[str, Any]]:
+        """The small columns of a record (no Body/Refs), or None if the ID does not exist."""
+        return self._fetch(record_id, SUMMARY_COLUMNS)
+
+    def large_fields(self, record_id: Any) -> Optional[Dict[str, Any]]:
+        """Body and Refs of a record, read on demand."""
+        return self._fetch(record_id, LARGE_COLUMNS)
+
+    def large_field_sizes(self, record_id: Any) -> Dict[str, int]:
+        """Lengths of Body and Refs (SQLite reads the length without returning the text)."""
+        present = [c for c in LARGE_COLUMNS if c in self.columns]
+        if not present:
+            return {}
+        conn = self._connect()
+        try:
+            row = conn.execute(f"SELECT {', '.join(f'LENGTH({c})' for c in present)} FROM {self.table_name} WHERE ID = ?",
+                               (record_id,)).fetchone()
+        finally:
+            conn.close()
+        return {c: (size or 0) for c, size in zip(present, row)} if row else {}
+
+
+def format_page_info(page: RecordPage, page_number: int, total: Optional[int] = None) -> str:
+    if not page.rows:
+        return f"No records match '{page.query}'." if page.query else "No records."
+    scope = f"matching '{page.query}'" if page.query else (f"of {total}" if total is not None else "")
+    note = " (unindexed search)" if page.query and not page.indexed else ""
+    return f"Page {page_number}: IDs {page.first_id}–{page.last_id} {scope}{note}".rstrip()
@@ -0,0 +1,170 @@
+# retrieval_cache.py
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Hashable
+
+
+def normalize_query(query: str) -> str:
+    """Case-folded, NFC-normalized query with collapsed whitespace and no trailing punctuation."""
+    text = " ".join(unicodedata.normalize("NFC", query).casefold().split())
+    return text.rstrip(" ?!.")
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory LRU cache whose entries also expire after `ttl_seconds`.
+
+    Counts hits and misses so the app can report hit rates.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0):
+        """
+        Args:
+            max_entries (int): Entries kept before the least recently used one is evicted.
+            ttl_seconds (float): Age after which an entry is treated as missing (<= 0: never expires).
+        """
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds > 0 and time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard_where(self, predicate: callable) -> int:
+        """Removes the entries whose key matches `predicate(key)`. Returns the number removed."""
+        with self._lock:
+            doomed = [key for key in self._entries if predicate(key)]
+            for key in doomed:
+                del self._entries[key]
+            return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0, "entries": len(self)}
+
+
+def collection_version(vectordb: Any) -> str:
+    """
+    Identity of the collection behind a vector store, for cache keys.
+
+    Built from the persist directory, the chunk count and the mtime of chroma.sqlite3
+    (or of the NumPy export), so a rebuilt or updated DB gets a new version. Computed
+    once per vector store object and remembered on it.
+    """
+    version = getattr(vectordb, "_retrieval_cache_version", None)
+    if version:
+        return version
+    persist_dir = str(getattr(vectordb, "_persist_directory", None) or "")
+    try:
+        count = vectordb._collection.count()
+    except Exception:
+        count = -1
+    marker = Path(persist_dir) / "chroma.sqlite3"
+    numpy_info = getattr(vectordb, "info", None)
+    if isinstance(numpy_info, dict):
+        stamp = f"numpy:{numpy_info.get('exported')}:{getattr(vectordb, 'quantization', None)}"
+    else:
+        stamp = str(marker.stat().st_mtime) if persist_dir and marker.exists() else "0"
+    version = f"{persist_dir}|{count}|{stamp}"
+    try:
+        vectordb._retrieval_cache_version = version
+    except AttributeError:
+        pass
+    return version
+
+
+class RetrievalCache:
+    """
+    Three cache levels for the chat retrieval path, shared by all sessions:
+
+    - refined: LLM query refinement (`generate_useful_query`), keyed on (normalized query, model).
+    - embeddings: query vectors, keyed on (embedding model, refined query text). Sits in
+      front of the on-disk EmbeddingCache, which still serves entries evicted here.
+    - results: top-k chunk lists, keyed on (normalized query, method, k, collection version).
+
+    Results are the only level that depends on the collection; `invalidate(persist_dir)`
+    drops them when that ChromaDB is rebuilt or updated (new versions would miss anyway,
+    this frees the memory).
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 3600.0):
+        """
+        Args:
+            max_entries (int): Entries per level.
+            ttl_seconds (float): Entry lifetime per level.
+        """
+        self.refined = TTLCache(max_entries, ttl_seconds)
+        self.embeddings = TTLCache(max_entries, ttl_seconds)
+        self.results = TTLCache(max_entries, ttl_seconds)
+
+    @staticmethod
+    def results_key(query: str, method: str, k: int, version: str) -> tuple:
+        return (normalize_query(query), method, int(k), version)
+
+    def get_refined(self, query: str, model: str) -> Optional[str]:
+        return self.refined.get((normalize_query(query), model))
+
+    def put_refined(self, query: str, model: str, refined_query: str) -> None:
+        self.refined.put((normalize_query(query), model), refined_query)
+
+    def get_embedding(self, model: str, text: str) -> Optional[List[float]]:
+        return self.embeddings.get((model, " ".join(text.split())))
+
+    def put_embedding(self, model: str, text: str, vector: List[float]) -> None:
+        self.embeddings.put((model, " ".join(text.split())), vector)
+
+    def get_results(self, query: str, method: str, k: int, version: str) -> Optional[Dict[str, Any]]:
+        return self.results.get(self.results_key(query, method, k, version))
+
+    def put_results(self, query: str, method: str, k: int, version: str, docs: List[Any], refined_query: str) -> None:
+        self.results.put(self.results_key(query, method, k, version),
+                         {"docs": list(docs), "refined_query": refined_query})
+
+    def invalidate(self, persist_dir: Optional[str] = None) -> int:
+        """Drops cached results of one persist directory (all results if None). Returns the number dropped."""
+        if persist_dir is None:
+            dropped = len(self.results)
+            self.results.clear()
+            return dropped
+        prefix = f"{persist_dir}|"
+        return self.results.discard_where(lambda key: str(key[3]).startswith(prefix))
+
+    def summary(self) -> str:
+        """Hit rates of the three levels for the retrieval timing line."""
+        parts = []
+        for name, cache in (("refine", self.refined), ("embed", self.embeddings), ("results", self.results)):
+            stats = cache.stats()
+            lookups = stats["hits"] + stats["misses"]
+            parts.append(f"{name} {stats['hits']}/{lookups}" if lookups else f"{name} -")
+        return "Cache hits: " + ", ".join(parts)
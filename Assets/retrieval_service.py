@@ -0,0 +1,579 @@
+# retrieval_service.py
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+from document_retriever import DocumentRetriever
+from retrieval_cache import collection_version
+from tracing import get_tracer
+
+DEFAULT_SERVICE_PORT = 8765
+TRACE_STAGES = ["refine_query", "refine_sub_queries", "vector_search", "lexical_search", "build_context"]
+
+tracer = get_tracer()
+
+
+class UnknownCollectionError(KeyError):
+    pass
+
+
+class ServiceEmbeddings:
+    """Embeddings for the service's stores: batched documents (BatchedEmbeddingEngine), cached single queries."""
+
+    def __init__(self, client: Any, model: str = "nomic-embed-text", cache: Any = None,
+                 batch_size: int = 64, max_in_flight: int = 4):
+        self.client = client
+        self.model = model
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        from embedding_engine import BatchedEmbeddingEngine
+        engine = BatchedEmbeddingEngine(self.client, model=self.model, batch_size=self.batch_size,
+                                        max_in_flight=self.max_in_flight, cache=self.cache)
+        return engine.embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        text = text.replace("\n", " ")
+        if self.cache is not None:
+            cached = self.cache.get(self.model, text)
+            if cached is not None:
+                return cached
+        vector = self.client.embeddings.create(input=[text], model=self.model).data[0].embedding
+        if self.cache is not None:
+            self.cache.put(self.model, text, vector)
+        return vector
+
+
+def _same_path(a: str, b: str) -> bool:
+    try:
+        return Path(a).resolve() == Path(b).resolve()
+    except (OSError, ValueError):
+        return a == b
+
+
+def forget_cached_chroma_system(persist_dir: str) -> None:
+    """
+    Drops Chroma's cached client for `persist_dir` only, so the next open reads a rebuilt
+    DB afresh. The cached system is not stopped: stores already open on it keep working
+    (SharedSystemClient.clear_system_cache() would stop every collection in the process).
+    """
+    try:
+        from chromadb.api.client import SharedSystemClient
+    except ImportError:
+        return
+    systems = getattr(SharedSystemClient, "_identifer_to_system", None)
+    if not isinstance(systems, dict):
+        return
+    for identifier in list(systems):
+        if isinstance(identifier, str) and _same_path(identifier, persist_dir):
+            systems.pop(identifier, None)
+
+
+def chroma_system_of(store: Any) -> Any:
+    """The chromadb System behind a LangChain Chroma store (None for other stores)."""
+    return getattr(getattr(store, "_client", None), "_system", None)
+
+
+def load_vector_store(persist_dir: str, embeddings: Any, numpy_backend: bool = False,
+                      quantization: Optional[str] = None) -> Any:
+    """Opens a ChromaDB, or its NumPy export (created or refreshed first when stale)."""
+    if numpy_backend:
+        from numpy_vectorstore import (NumpyVectorStore, export_chroma_to_numpy, is_numpy_store_current,
+                                       numpy_store_dir_for, build_quantized_index, is_quantized_index_current)
+        if not is_numpy_store_current(persist_dir):
+            print(export_chroma_to_numpy(persist_dir))
+        store_dir = str(numpy_store_dir_for(persist_dir))
+        if quantization and not is_quantized_index_current(store_dir, quantization):
+            print(build_quantized_index(store_dir, quantization))
+        return NumpyVectorStore(store_dir, embedding_function=embeddings, quantization=quantization)
+    from langchain_community.vectorstores import Chroma
+    forget_cached_chroma_system(persist_dir)  # Chroma caches one client per path; a rebuilt DB needs a new one
+    return Chroma(persist_directory=persist_dir, embedding_function=embeddings)
+
+
+class LoadedCollection:
+    """
+    One loaded collection: the vector store, its optional lexical index and a version number.
+
+    Requests hold it between `acquire` and `release`; once it has been replaced or unloaded
+    (`retire`), its Chroma system is stopped when the last of those requests finishes.
+    """
+
+    def __init__(self, name: str, persist_dir: str, store: Any, lexical_index: Any, options: Dict[str, Any],
+                 version: int, load_seconds: float):
+        self.name = name
+        self.persist_dir = persist_dir
+        self.store = store
+        self.lexical_index = lexical_index
+        self.options = options
+        self.version = version
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        self.chunks = store._collection.count() if hasattr(store, "_collection") else -1
+        self._in_flight = 0
+        self._retired = False
+        self._closed = False
+        self._state_lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._state_lock:
+            self._in_flight += 1
+
+    def release(self) -> None:
+        with self._state_lock:
+            self._in_flight -= 1
+            close = self._retired and self._in_flight == 0
+        if close:
+            self.close()
+
+    def retire(self, keep_system: bool = False) -> None:
+        """
+        Marks the collection as replaced; it closes now or when its last request finishes.
+
+        Args:
+            keep_system (bool): Another loaded collection still shares its Chroma system; only forget it.
+        """
+        with self._state_lock:
+            self._retired = True
+            if keep_system:
+                self._closed = True
+            close = self._in_flight == 0
+        if close:
+            self.close()
+
+    def close(self) -> None:
+        with self._state_lock:
+            if self._closed:
+                return
+            self._closed = True
+        system = chroma_system_of(self.store)
+        if system is not None:
+            try:
+                system.stop()
+            except Exception as e:
+                print(f"Warning: Could not stop the Chroma client of '{self.name}' v{self.version}: {e}")
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name, "persist_dir": self.persist_dir, "version": self.version, "chunks": self.chunks,
+                "loaded_at": self.loaded_at, "load_seconds": round(self.load_seconds, 3),
+                "lexical_index": self.lexical_index is not None, **self.options}
+
+
+class CollectionRegistry:
+    """
+    Collections loaded once per process and shared by every request.
+
+    `reload` builds the replacement (vector store and lexical index) completely before
+    swapping it in under the lock. Requests that already hold the old collection (`use`)
+    finish on it; new requests get the new one, so a rebuilt index goes live without
+    downtime. The old collection's Chroma client is stopped after its last request.
+    """
+
+    def __init__(self, embeddings: Any, retrieval_cache: Any = None):
+        self.embeddings = embeddings
+        self.retrieval_cache = retrieval_cache
+        self._collections: Dict[str, LoadedCollection] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, name: str) -> LoadedCollection:
+        with self._lock:
+            collection = self._collections.get(name)
+        if collection is None:
+            raise UnknownCollectionError(f"Collection '{name}' is not loaded.")
+        return collection
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[LoadedCollection]:
+        """The current collection `name`, kept open until the block ends even if it is swapped out meanwhile."""
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is not None:
+                collection.acquire()
+        if collection is None:
+            raise UnknownCollectionError(f"Collection '{name}' is not loaded.")
+        try:
+            yield collection
+        finally:
+            collection.release()
+
+    def _retire(self, collection: LoadedCollection) -> None:
+        """Closes a replaced collection once drained, unless a loaded one shares its Chroma system."""
+        system = chroma_system_of(collection.store)
+        with self._lock:
+            shared = system is not None and any(chroma_system_of(c.store) is system for c in self._collections.values())
+        collection.retire(keep_system=shared)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [c.describe() for c in self._collections.values()]
+
+    def load(self, persist_dir: str, name: Optional[str] = None, numpy_backend: bool = False,
+             quantization: Optional[str] = None, sqlite_path: Optional[str] = None,
+             reload: bool = False) -> Tuple[LoadedCollection, bool]:
+        """
+        Loads a collection (once), or rebuilds and swaps it in with `reload`.
+
+        Returns:
+            tuple: (collection, whether it was (re)loaded by this call)
+        """
+        name = name or str(Path(persist_dir).resolve())
+        with self._lock:
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        with load_lock:  # Concurrent opens of one collection load it once
+            with self._lock:
+                current = self._collections.get(name)
+            options = {"numpy_backend": bool(numpy_backend), "quantization": quantization, "sqlite_path": sqlite_path}
+            if current is not None and not reload and current.options == options:
+                return current, False
+            if not (Path(persist_dir) / "chroma.sqlite3").exists():
+                raise FileNotFoundError(f"ChromaDB not found at {persist_dir} (or missing chroma.sqlite3).")
+            with tracer.span("service.load_collection", collection=name, reload=reload):
+                start_time = time.perf_counter()
+                store = load_vector_store(persist_dir, self.embeddings, numpy_backend, quantization)
+                lexical_index = None
+                if sqlite_path:
+                    from lexical_index import LexicalIndex, fts5_available
+                    if fts5_available():
+                        lexical_index = LexicalIndex(sqlite_path)
+                        print(lexical_index.ensure_built(store._collection, force=reload,
+                                                         version=collection_version(store)))
+                loaded = LoadedCollection(name, persist_dir, store, lexical_index, options,
+                                          (current.version + 1) if current else 1, time.perf_counter() - start_time)
+            with self._lock:
+                self._collections[name] = loaded
+            if current is not None:
+                self._retire(current)
+                if self.retrieval_cache is not None:
+                    self.retrieval_cache.invalidate(current.persist_dir)
+            print(f"Retrieval service: {'reloaded' if current else 'loaded'} '{name}' v{loaded.version} "
+                  f"({loaded.chunks} chunks, {loaded.load_seconds:.2f}s)")
+            return loaded, True
+
+    def unload(self, name: str) -> bool:
+        with self._lock:
+            collection = self._collections.pop(name, None)
+        if collection is None:
+            return False
+        self._retire(collection)
+        return True
+
+
+def _docs_to_json(docs: List[Any]) -> List[Dict[str, Any]]:
+    return [{"page_content": d.page_content, "metadata": dict(d.metadata or {})} for d in docs]
+
+
+class RetrievalService:
+    """
+    Local HTTP/JSON retrieval service: the DocumentRetriever operations over collections
+    loaded once (CollectionRegistry), for any number of Gradio sessions, notebooks and batch jobs.
+
+    Endpoints (POST bodies and responses are JSON):
+        GET  /health, /collections, /metrics (Prometheus text)
+        POST /collections/load    {persist_dir, name?, numpy_backend?, quantization?, sqlite_path?, reload?}
+        POST /collections/reload  {name}      rebuild and hot-swap
+        POST /retrieve            {collection, query, k?, method?, is_first_run?, context_token_budget?}
+        POST /doc                 {collection, doc_id, k?}
+        POST /search              {collection, query, k?}  vector search
+        POST /hybrid              {collection, query, k?}  BM25 + vector, RRF-merged
+    Requests are handled by a fixed pool of worker threads.
+    """
+
+    def __init__(self, registry: CollectionRegistry, openai_client: Any = None, token_counter: Any = None,
+                 host: str = "127.0.0.1", port: int = DEFAULT_SERVICE_PORT, workers: int = 8,
+                 retriever_options: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            registry (CollectionRegistry): Loaded collections.
+            openai_client: Client for the LLM query refinement (a shared llm_client is best).
+            token_counter: TokenCounter for context token budgets.
+            host (str): Interface to bind (keep it on localhost; there is no authentication).
+            port (int): Port (0 picks a free one).
+            workers (int): Requests handled concurrently.
+            retriever_options (dict): Extra DocumentRetriever arguments (merge_adjacent, refine_model, ...).
+        """
+        self.registry = registry
+        self.openai_client = openai_client
+        self.token_counter = token_counter
+        self.host = host
+        self.port = port
+        self.workers = max(1, int(workers))
+        self.retriever_options = retriever_options or {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def retriever_for(self, collection: LoadedCollection, context_token_budget: int = 0) -> DocumentRetriever:
+        return DocumentRetriever(collection.store, openai_client=self.openai_client, lexical_index=collection.lexical_index,
+                                 retrieval_cache=self.registry.retrieval_cache, context_token_budget=context_token_budget,
+                                 token_counter=self.token_counter, **self.retriever_options)
+
+    # --- Operations ---
+    def op_retrieve(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self.registry.use(body["collection"]) as collection:
+            retriever = self.retriever_for(collection, int(body.get("context_token_budget") or 0))
+            with tracer.span("service.retrieve", collection=collection.name) as span:
+                text, used_query, method = retriever.retrieve_documents(
+                    body["query"], is_first_run=bool(body.get("is_first_run", False)),
+                    k=int(body.get("k", 10)), method=body.get("method", "combined"))
+        stages = tracer.trace_durations(span.trace_id, TRACE_STAGES)
+        return {"context": text, "used_query": used_query, "method": method, "retrieved": retriever.last_retrieved,
+                "merge_info": retriever.last_merge_info, "pack_info": retriever.last_pack_info,
+                "collection_version": collection.version,
+                "stage_summary": tracer.trace_summary(span.trace_id, TRACE_STAGES),
+                "timings": {"retrieve_s": round(span.duration, 4),
+                            "stages": {name: round(sum(d), 4) for name, d in stages.items()}}}
+
+    def op_doc(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self.registry.use(body["collection"]) as collection:
+            text = self.retriever_for(collection).search_vectordb_by_id_chat("ID", body["doc_id"], int(body.get("k", 3)))
+        return {"context": text, "collection_version": collection.version}
+
+    def op_search(self, body: Dict[str, Any], hybrid: bool = False) -> Dict[str, Any]:
+        with self.registry.use(body["collection"]) as collection:
+            retriever = self.retriever_for(collection)
+            k = int(body.get("k", 10))
+            docs = retriever.hybrid_search(body["query"], k=k) if hybrid else retriever.vector_search(body["query"], k=k)
+        return {"docs": _docs_to_json(docs), "collection_version": collection.version}
+
+    def op_load(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        collection, loaded = self.registry.load(
+            body["persist_dir"], name=body.get("name"), numpy_backend=bool(body.get("numpy_backend")),
+            quantization=body.get("quantization"), sqlite_path=body.get("sqlite_path"), reload=bool(body.get("reload")))
+        return {"collection": collection.describe(), "loaded": loaded}
+
+    def op_reload(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        current = self.registry.get(body["name"])
+        return self.op_load({"persist_dir": current.persist_dir, "name": current.name, "reload": True, **current.options})
+
+    # --- HTTP ---
+    def start(self) -> "RetrievalService":
+        service = self
+        routes = {
+            "/retrieve": self.op_retrieve, "/doc": self.op_doc, "/search": self.op_search,
+            "/hybrid": lambda body: self.op_search(body, hybrid=True),
+            "/collections/load": self.op_load, "/collections/reload": self.op_reload,
+        }
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0].rstrip("/")
+                if path == "/health":
+                    self._send({"status": "ok", "collections": len(service.registry.list())})
+                elif path == "/collections":
+                    self._send({"collections": service.registry.list()})
+                elif path == "/metrics":
+                    data = tracer.prometheus_text().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                else:
+                    self._send({"error": f"Unknown path {self.path}"}, 404)
+
+            def do_POST(self):
+                operation = routes.get(self.path.split("?", 1)[0].rstrip("/"))
+                if operation is None:
+                    self._send({"error": f"Unknown path {self.path}"}, 404)
+                    return
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                    self._send(operation(body))
+                except UnknownCollectionError as e:
+                    self._send({"error": e.args[0]}, 404)
+                except KeyError as e:
+                    self._send({"error": f"Missing field {e}"}, 400)
+                except (ValueError, TypeError, FileNotFoundError) as e:
+                    self._send({"error": f"{type(e).__name__}: {e}"}, 400)
+                except Exception as e:
+                    print(f"Retrieval service error on {self.path}: {e}")
+                    self._send({"error": f"{type(e).__name__}: {e}"}, 500)
+
+            def _send(self, payload: Dict[str, Any], status: int = 200):
+                data = json.dumps(payload, default=str).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        class PooledServer(ThreadingHTTPServer):
+            """Hands each connection to a fixed worker pool instead of a new thread per request."""
+            pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="retrieval")
+
+            def process_request(self, request, client_address):
+                self.pool.submit(self.process_request_thread, request, client_address)
+
+        self._server = PooledServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"Retrieval service listening on http://{self.host}:{self.port} ({self.workers} workers)")
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server.pool.shutdown(wait=False)
+            self._server = None
+
+
+class RetrievalServiceError(RuntimeError):
+    pass
+
+
+class RetrievalServiceClient:
+    """Thin JSON client of a RetrievalService."""
+
+    def __init__(self, base_url: str = f"http://127.0.0.1:{DEFAULT_SERVICE_PORT}", timeout: float = 300.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _call(self, path: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", str(e))
+            except ValueError:
+                message = str(e)
+            raise RetrievalServiceError(f"Retrieval service {path}: {message}") from None
+        except urllib.error.URLError as e:
+            raise RetrievalServiceError(f"Retrieval service at {self.base_url} not reachable: {e.reason}") from None
+
+    def health(self) -> Dict[str, Any]:
+        return self._call("/health")
+
+    def collections(self) -> List[Dict[str, Any]]:
+        return self._call("/collections")["collections"]
+
+    def open_collection(self, persist_dir: str, name: Optional[str] = None, numpy_backend: bool = False,
+                        quantization: Optional[str] = None, sqlite_path: Optional[str] = None,
+                        reload: bool = False) -> "RemoteCollection":
+        """Loads (once) or reloads a collection in the service and returns a handle to it."""
+        result = self._call("/collections/load", {"persist_dir": persist_dir, "name": name, "numpy_backend": numpy_backend,
+                                                  "quantization": quantization, "sqlite_path": sqlite_path, "reload": reload})
+        return RemoteCollection(self, result["collection"], loaded=result["loaded"])
+
+    def reload_collection(self, name: str) -> "RemoteCollection":
+        result = self._call("/collections/reload", {"name": name})
+        return RemoteCollection(self, result["collection"], loaded=True)
+
+
+class RemoteDocument:
+    def __init__(self, page_content: str, metadata: Dict[str, Any]):
+        self.page_content = page_content
+        self.metadata = metadata
+
+
+class RemoteCollection:
+    """
+    Handle of a collection held by the retrieval service. Takes the place of the
+    vector store in the app's state: `retriever()` gives a DocumentRetriever stand-in.
+    """
+
+    def __init__(self, client: RetrievalServiceClient, info: Dict[str, Any], loaded: bool = False):
+        self.client = client
+        self.name = info["name"]
+        self.info = info
+        self.loaded = loaded  # Whether the service (re)loaded it for this handle
+        self._persist_directory = info["persist_dir"]
+
+    def count(self) -> int:
+        return int(self.info.get("chunks", -1))
+
+    def retriever(self, context_token_budget: int = 0) -> "RemoteDocumentRetriever":
+        return RemoteDocumentRetriever(self, context_token_budget)
+
+    def describe(self) -> str:
+        source = "NumPy" if self.info.get("numpy_backend") else "ChromaDB"
+        return (f"Served by retrieval service {self.client.base_url}: '{self.name}' v{self.info.get('version')} "
+                f"({source}, {self.count()} chunks{', lexical index' if self.info.get('lexical_index') else ''}).")
+
+
+class RemoteDocumentRetriever:
+    """Same calls and result attributes as DocumentRetriever, answered by the service."""
+
+    def __init__(self, collection: RemoteCollection, context_token_budget: int = 0):
+        self.collection = collection
+        self.context_token_budget = context_token_budget
+        self.last_retrieved: List[List[Any]] = []
+        self.last_merge_info: Optional[Dict[str, int]] = None
+        self.last_pack_info: Optional[Dict[str, int]] = None
+        self.last_stage_summary = ""
+        self.last_timings: Dict[str, Any] = {}
+
+    def retrieve_documents(self, query: str, is_first_run: bool, k: int = 10, method: str = 'combined') -> Tuple[str, str, str]:
+        result = self.collection.client._call("/retrieve", {
+            "collection": self.collection.name, "query": query, "is_first_run": is_first_run, "k": k,
+            "method": method, "context_token_budget": self.context_token_budget})
+        self.last_retrieved = result.get("retrieved") or []
+        self.last_merge_info = result.get("merge_info")
+        self.last_pack_info = result.get("pack_info")
+        self.last_stage_summary = result.get("stage_summary", "")
+        self.last_timings = result.get("timings", {})
+        return result["context"], result["used_query"], result["method"]
+
+    def search_vectordb_by_id_chat(self, search_field: str, search_value: Any, k: int = 3) -> str:
+        return self.collection.client._call("/doc", {"collection": self.collection.name, "doc_id": search_value, "k": k})["context"]
+
+    def vector_search(self, query: str, k: int = 10) -> List[RemoteDocument]:
+        result = self.collection.client._call("/search", {"collection": self.collection.name, "query": query, "k": k})
+        return [RemoteDocument(d["page_content"], d["metadata"]) for d in result["docs"]]
+
+    def hybrid_search(self, query: str, k: int = 10) -> List[RemoteDocument]:
+        result = self.collection.client._call("/hybrid", {"collection": self.collection.name, "query": query, "k": k})
+        return [RemoteDocument(d["page_content"], d["metadata"]) for d in result["docs"]]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local retrieval service: collections loaded once, shared by all clients.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--llm-base-url", default="http://localhost:1238/v1")
+    parser.add_argument("--embedding-model", default="nomic-embed-text")
+    parser.add_argument("--embedding-cache", default="embedding_cache/embeddings.sqlite3")
+    parser.add_argument("--collection", action="append", default=[], metavar="PERSIST_DIR[=SQLITE_PATH]",
+                        help="ChromaDB to load at startup (repeatable); '=db.sqlite' adds its lexical index.")
+    parser.add_argument("--numpy", action="store_true", help="Serve collections through the NumPy backend.")
+    parser.add_argument("--quantization", choices=["float16", "int8"], default=None)
+    args = parser.parse_args()
+
+    from llm_client import get_shared_client
+    from retrieval_cache import RetrievalCache
+    from token_budget import TokenCounter
+    llm = get_shared_client(args.llm_base_url)
+    try:
+        from embedding_cache import EmbeddingCache
+        Path(args.embedding_cache).parent.mkdir(parents=True, exist_ok=True)
+        embedding_cache = EmbeddingCache(args.embedding_cache)
+    except Exception as e:
+        print(f"Embedding cache not available ({e}); query embeddings are not cached on disk.")
+        embedding_cache = None
+    registry = CollectionRegistry(ServiceEmbeddings(llm, args.embedding_model, cache=embedding_cache), RetrievalCache())
+    for spec in args.collection:
+        persist_dir, _, sqlite_path = spec.partition("=")
+        registry.load(persist_dir, numpy_backend=args.numpy, quantization=args.quantization, sqlite_path=sqlite_path or None)
+    service = RetrievalService(registry, openai_client=llm, token_counter=TokenCounter.from_tiktoken(),
+                               host=args.host, port=args.port, workers=args.workers).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        service.stop()
@@ -0,0 +1,134 @@
+# sqlite_bulk_writer.py
+import sqlite3
+from typing import List, Dict, Any, Optional, Tuple
+
+DOCUMENT_TABLE_COLUMNS = [
+    "ID", "Title", "Authors", "DOI", "Citations", "Abstract", "Body",
+    "Date", "Record_Number", "Refs", "Journal", "Source_File",
+]
+
+
+class DocumentTableWriter:
+    """
+    Buffered writer for the document_table used during ingestion.
+
+    Records are collected in memory and written with `executemany`, one transaction
+    per batch, instead of one INSERT + commit per record. While the writer is open
+    the connection runs in WAL mode with synchronous=NORMAL and a larger page cache.
+    `finish()` writes the remaining records and creates the indexes the app looks
+    documents up by (DOI, Source_File; ID is the INTEGER PRIMARY KEY and needs none).
+    Related statements (e.g. the ingest manifest rows) can be queued with
+    `add_statement` so they commit atomically with the records they describe, and
+    `checkpoint` / `discard_since` drop what a failed file queued but did not write yet.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, table_name: str = "document_table",
+                 batch_size: int = 2000, cache_size_kb: int = 65536, replace_existing: bool = False):
+        """
+        Args:
+            conn (sqlite3.Connection): Open connection to the ingestion database.
+            table_name (str): Target table (must already exist).
+            batch_size (int): Records per transaction.
+            cache_size_kb (int): SQLite page cache size used during the load, in KiB.
+            replace_existing (bool): Use INSERT OR REPLACE, so a record can overwrite the row
+                                     with the same ID (re-processing a changed file in place).
+        """
+        self.conn = conn
+        self.table_name = table_name
+        self.batch_size = max(1, int(batch_size))
+        self.rows_written = 0
+        self._flushes = 0  # Successful flushes, to tell whether a checkpoint's queue was written
+        self._buffer: List[tuple] = []
+        self._statements: List[tuple] = []
+        verb = "INSERT OR REPLACE" if replace_existing else "INSERT"
+        self._insert_sql = (f"{verb} INTO {table_name} ({', '.join(DOCUMENT_TABLE_COLUMNS)}) "
+                            f"VALUES ({', '.join('?' * len(DOCUMENT_TABLE_COLUMNS))})")
+        self.configure_for_ingest(cache_size_kb)
+
+    def configure_for_ingest(self, cache_size_kb: int = 65536) -> None:
+        """Pragmas for a fast bulk load. WAL keeps the DB readable by the viewer while ingesting."""
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"PRAGMA cache_size=-{int(cache_size_kb)}")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        # INSERT OR REPLACE fires the delete triggers (record_browser's search index) only with this on
+        self.conn.execute("PRAGMA recursive_triggers=ON")
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Queues one record (dict keyed by column name; missing columns are stored as NULL)."""
+        self._buffer.append(tuple(record.get(column) for column in DOCUMENT_TABLE_COLUMNS))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def add_statement(self, sql: str, params: tuple = ()) -> None:
+        """Queues a statement to run in the same transaction as the next batch of records."""
+        self._statements.append((sql, params))
+
+    def add_many(self, records: List[Dict[str, Any]]) -> None:
+        for record in records:
+            self.add(record)
+
+    def checkpoint(self) -> Tuple[int, int, int, int]:
+        """The current end of the queue, for `discard_since`."""
+        return (self._flushes, self.rows_written, len(self._buffer), len(self._statements))
+
+    def discard_since(self, checkpoint: Tuple[int, int, int, int]) -> int:
+        """
+        Drops the records and statements queued after `checkpoint` that are not written yet.
+
+        Returns:
+            int: Records queued after the checkpoint that a flush in between already committed.
+        """
+        flushes, rows_written, buffered, statements = checkpoint
+        if self._flushes == flushes:
+            del self._buffer[buffered:]
+            del self._statements[statements:]
+            return 0
+        # The first flush since the checkpoint also wrote what was queued before it
+        self._buffer, self._statements = [], []
+        return max(0, self.rows_written - rows_written - buffered)
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer) + len(self._statements)
+
+    def flush(self) -> int:
+        """
+        Writes the buffered records in a single transaction.
+
+        Returns:
+            int: Number of records written. On error the batch is rolled back,
+                 dropped from the buffer, and the exception is raised.
+        """
+        if not self._buffer and not self._statements:
+            return 0
+        batch, self._buffer = self._buffer, []
+        statements, self._statements = self._statements, []
+        with self.conn:  # BEGIN ... COMMIT, or ROLLBACK on error
+            self.conn.executemany(self._insert_sql, batch)
+            for sql, params in statements:
+                self.conn.execute(sql, params)
+        self.rows_written += len(batch)
+        self._flushes += 1
+        return len(batch)
+
+    def create_indexes(self) -> None:
+        """Creates the lookup indexes after the load (cheaper than maintaining them per insert)."""
+        with self.conn:
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table_name}_doi ON {self.table_name} (DOI)")
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table_name}_source_file ON {self.table_name} (Source_File)")
+        self.conn.execute("PRAGMA optimize")
+
+    def finish(self) -> Optional[str]:
+        """
+        Flushes the remaining records and creates the indexes.
+
+        Returns:
+            str or None: An error message if the final write or the indexing failed.
+        """
+        try:
+            self.flush()
+            self.create_indexes()
+        except sqlite3.Error as e:
+            return f"Error finishing SQLite bulk write: {e}"
+        return None
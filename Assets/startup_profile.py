@@ -0,0 +1,151 @@
+# startup_profile.py
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from app_launcher import READY_MARKER
+from rag_benchmark import BENCHMARK_RESULTS_DIR, git_commit
+
+COLD_START_TARGET_SECONDS = 8.0  # Fresh interpreter to "ready for first query" (UI, LLM client and caches built)
+ASSETS_DIR = Path(__file__).resolve().parent
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+def parse_importtime(stderr_text: str) -> List[Dict[str, Any]]:
+    """
+    Entries of a `python -X importtime` log: module, depth (0 = imported directly by
+    the profiled code), self_s and cumulative_s (including the modules it imported).
+    """
+    entries = []
+    for line in stderr_text.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append({"module": module, "depth": (len(indent) - 1) // 2,
+                            "self_s": int(self_us) / 1e6, "cumulative_s": int(cumulative_us) / 1e6})
+    return entries
+
+
+def slowest_imports(entries: List[Dict[str, Any]], n: int = 15, max_depth: int = 0) -> List[Dict[str, Any]]:
+    """The `n` slowest imports (by cumulative time) at most `max_depth` levels below the profiled code."""
+    return sorted((e for e in entries if e["depth"] <= max_depth), key=lambda e: e["cumulative_s"], reverse=True)[:n]
+
+
+def measure_cold_start(notebook_path: Optional[str] = None, target_seconds: float = COLD_START_TARGET_SECONDS,
+                       runs: int = 1, top_n: int = 15) -> Dict[str, Any]:
+    """
+    Starts `python -X importtime -m Assets --ready-check` in fresh interpreters and times
+    them from process start to "ready for first query". The first run is the cold start
+    that is checked against the target; later runs have warm OS file caches (like a
+    quick restart) and are reported separately.
+
+    Returns:
+        dict: cold_start_s (wall time of the first run), ready_s (app build time inside it),
+              warm_runs_s and warm_median_s (the later runs), runs_s, target_s,
+              within_target, heavy_modules_loaded and slowest_imports (of the first run).
+    """
+    command = [sys.executable, "-X", "importtime", "-m", ASSETS_DIR.name, "--ready-check"]
+    if notebook_path:
+        command += ["--notebook", str(Path(notebook_path).resolve())]
+    first: Optional[Dict[str, Any]] = None
+    runs_s = []
+    for _ in range(max(1, runs)):
+        start_time = time.perf_counter()
+        completed = subprocess.run(command, cwd=str(ASSETS_DIR.parent), capture_output=True, text=True,
+                                   env={**os.environ, "PYTHONUNBUFFERED": "1"})
+        wall_s = time.perf_counter() - start_time
+        ready_lines = [line for line in completed.stdout.splitlines() if line.startswith(READY_MARKER)]
+        if completed.returncode != 0 or not ready_lines:
+            tail = "\n".join((completed.stderr or completed.stdout).splitlines()[-15:])
+            raise RuntimeError(f"App did not reach ready (exit code {completed.returncode}):\n{tail}")
+        runs_s.append(wall_s)
+        if first is None:
+            first = {"cold_start_s": wall_s, **json.loads(ready_lines[-1][len(READY_MARKER):]),
+                     "slowest_imports": slowest_imports(parse_importtime(completed.stderr), top_n)}
+    warm_runs_s = runs_s[1:]
+    first.update(runs_s=[round(s, 3) for s in runs_s], warm_runs_s=[round(s, 3) for s in warm_runs_s],
+                 warm_median_s=statistics.median(warm_runs_s) if warm_runs_s else None,
+                 target_s=target_seconds, within_target=first["cold_start_s"] <= target_seconds)
+    return first
+
+
+def profile_module_imports(module_names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Cold import time of each Assets module in its own fresh interpreter, slowest first,
+    with the slowest import it pulls in (a module should stay cheap to import).
+    """
+    if module_names is None:
+        module_names = sorted(p.stem for p in ASSETS_DIR.glob("*.py")
+                              if not p.stem.startswith("_") and p.stem not in ("untested_func_inputoutput",))
+    results = []
+    for name in module_names:
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {name}"],
+                                   cwd=str(ASSETS_DIR), capture_output=True, text=True)
+        entries = parse_importtime(completed.stderr)
+        own = next((e for e in reversed(entries) if e["module"] == name and e["depth"] == 0), None)
+        heaviest = slowest_imports([e for e in entries if e["depth"] == 1], 1, max_depth=1)
+        results.append({"module": name, "ok": completed.returncode == 0,
+                        "import_s": own["cumulative_s"] if own else None,
+                        "heaviest_dependency": heaviest[0]["module"] if heaviest else None,
+                        "error": completed.stderr.strip().splitlines()[-1] if completed.returncode != 0 else None})
+    return sorted(results, key=lambda r: r["import_s"] or 0.0, reverse=True)
+
+
+def format_startup_report(result: Dict[str, Any]) -> str:
+    verdict = "within" if result["within_target"] else "OVER"
+    warm = (f"; warm restarts: median {result['warm_median_s']:.2f}s of "
+            f"{', '.join(f'{s:.2f}s' for s in result['warm_runs_s'])}" if result.get("warm_runs_s") else "")
+    lines = [f"Cold start to ready: {result['cold_start_s']:.2f}s ({verdict} the {result['target_s']:.1f}s target; "
+             f"app build {result['ready_s']:.2f}s{warm})",
+             f"Heavy modules loaded at startup: {', '.join(result['heavy_modules_loaded']) or 'none'}",
+             "Slowest imports (cumulative):"]
+    lines += [f"  {e['cumulative_s']:8.3f}s  {e['module']}" for e in result["slowest_imports"]]
+    return "\n".join(lines)
+
+
+def format_module_report(results: List[Dict[str, Any]]) -> str:
+    lines = [f"{'module':<28} {'import':>9}  heaviest dependency"]
+    for r in results:
+        import_text = f"{r['import_s']:.3f}s" if r["import_s"] is not None else "failed"
+        lines.append(f"{r['module']:<28} {import_text:>9}  {r['error'] or r['heaviest_dependency'] or ''}")
+    return "\n".join(lines)
+
+
+def write_startup_result(result: Dict[str, Any], out_dir: str = BENCHMARK_RESULTS_DIR, label: str = "cold_start") -> Path:
+    """Saves the measurement like rag_benchmark results, so `rag_benchmark.py --compare` works on it."""
+    out_path = Path(out_dir)
+    out_path.mkdir(parents=True, exist_ok=True)
+    result_file = out_path / f"{time.strftime('%Y%m%d_%H%M%S')}_{label}.json"
+    payload = {"label": label, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "git_commit": git_commit(str(ASSETS_DIR)),
+               "python": sys.version.split()[0], "platform": platform.platform(),
+               "stages": {"cold_start": {"seconds": result["cold_start_s"], "ready_s": result["ready_s"]},
+                          **({"warm_start": {"seconds": result["warm_median_s"]}} if result.get("warm_median_s") else {})},
+               "startup": result}
+    result_file.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    return result_file
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure the app's cold start and report where import time goes.")
+    parser.add_argument("--notebook", default=None)
+    parser.add_argument("--target", type=float, default=COLD_START_TARGET_SECONDS, help="Cold start budget in seconds.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--modules", action="store_true", help="Also profile each Assets module's own import time.")
+    parser.add_argument("--out-dir", default=BENCHMARK_RESULTS_DIR)
+    args = parser.parse_args()
+
+    if args.modules:
+        print(format_module_report(profile_module_imports()))
+    startup = measure_cold_start(args.notebook, args.target, args.runs, args.top)
+    print(format_startup_report(startup))
+    print(f"Results written to {write_startup_result(startup, args.out_dir)}")
+    sys.exit(0 if startup["within_target"] else 1)
@@ -0,0 +1,208 @@
+# stub_openai_server.py
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional
+
+_TOKEN = re.compile(r"\w+")
+
+
+def hashed_embedding(text: str, dim: int = 768) -> List[float]:
+    """
+    Deterministic bag-of-words embedding: every word adds +/-1 to a few hashed
+    dimensions. Texts sharing words get similar vectors, so retrieval over stub
+    embeddings behaves like a (crude) real index instead of returning random hits.
+    """
+    vector = [0.0] * dim
+    for token in _TOKEN.findall(text.lower()):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        for i in range(0, 8, 2):
+            index = int.from_bytes(digest[i:i + 2], "little") % dim
+            vector[index] += 1.0 if digest[i] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class StubOpenAIServer:
+    """
+    Local stand-in for LM Studio's OpenAI-compatible API, for offline benchmarks.
+
+    Serves POST /v1/embeddings (hashed bag-of-words vectors), POST /v1/chat/completions
+    (a fixed answer, streamed as SSE or returned whole) and GET /v1/models, with
+    controllable latencies and token rate. Runs on a background thread:
+
+        with StubOpenAIServer(port=0, tokens_per_second=50) as server:
+            client = OpenAI(base_url=server.base_url, api_key="stub")
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, embedding_dim: int = 768,
+                 embed_latency: float = 0.01, embed_latency_per_input: float = 0.001,
+                 first_token_latency: float = 0.2, tokens_per_second: float = 40.0,
+                 answer_tokens: int = 120):
+        """
+        Args:
+            host (str): Interface to bind.
+            port (int): Port (0 picks a free one; 1238 impersonates the app's LM Studio endpoint).
+            embedding_dim (int): Length of the returned vectors.
+            embed_latency (float): Seconds added to every embeddings request.
+            embed_latency_per_input (float): Seconds added per input text.
+            first_token_latency (float): Seconds before the first chat token (prompt processing).
+            tokens_per_second (float): Generation rate of chat tokens (<= 0: no delay).
+            answer_tokens (int): Number of tokens in every chat answer.
+        """
+        self.host = host
+        self.port = port
+        self.embedding_dim = embedding_dim
+        self.embed_latency = embed_latency
+        self.embed_latency_per_input = embed_latency_per_input
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.stats = {"embedding_requests": 0, "embedded_texts": 0, "chat_requests": 0}
+        self._stats_lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self) -> "StubOpenAIServer":
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):  # Keep benchmark output clean
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/models"):
+                    self._send_json({"object": "list", "data": [{"id": "stub-model", "object": "model"}]})
+                else:
+                    self._send_json({"error": f"Unknown path {self.path}"}, status=404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send_json({"error": "Invalid JSON"}, status=400)
+                    return
+                if self.path.rstrip("/").endswith("/embeddings"):
+                    self._send_json(stub._embeddings(body))
+                elif self.path.rstrip("/").endswith("/chat/completions"):
+                    if body.get("stream"):
+                        self._stream_chat(body)
+                    else:
+                        self._send_json(stub._chat(body))
+                else:
+                    self._send_json({"error": f"Unknown path {self.path}"}, status=404)
+
+            def _send_json(self, payload: Dict[str, Any], status: int = 200):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream_chat(self, body: Dict[str, Any]):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                for event in stub._chat_stream(body):
+                    try:
+                        self.wfile.write(f"data: {event}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                    except (BrokenPipeError, ConnectionResetError):
+                        return
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "StubOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _embeddings(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        self._count("embedding_requests")
+        self._count("embedded_texts", len(inputs))
+        time.sleep(self.embed_latency + self.embed_latency_per_input * len(inputs))
+        data = [{"object": "embedding", "index": i, "embedding": hashed_embedding(text, self.embedding_dim)}
+                for i, text in enumerate(inputs)]
+        tokens = sum(len(text.split()) for text in inputs)
+        return {"object": "list", "data": data, "model": body.get("model", "stub-embedding"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    def _answer_tokens(self) -> List[str]:
+        return [("Stub" if i == 0 else " token") for i in range(self.answer_tokens)]
+
+    def _chat(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        self._count("chat_requests")
+        tokens = self._answer_tokens()
+        time.sleep(self.first_token_latency + (len(tokens) / self.tokens_per_second if self.tokens_per_second > 0 else 0))
+        return {"id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "stub-model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)}}
+
+    def _chat_stream(self, body: Dict[str, Any]):
+        self._count("chat_requests")
+        model = body.get("model", "stub-model")
+        time.sleep(self.first_token_latency)
+        for i, token in enumerate(self._answer_tokens()):
+            if i and self.tokens_per_second > 0:
+                time.sleep(1.0 / self.tokens_per_second)
+            delta = {"role": "assistant", "content": token} if i == 0 else {"content": token}
+            yield json.dumps({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                              "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        yield json.dumps({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                          "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        yield "[DONE]"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible server for offline RAG benchmarks.")
+    parser.add_argument("--port", type=int, default=1238)
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--embed-latency", type=float, default=0.01)
+    args = parser.parse_args()
+    server = StubOpenAIServer(port=args.port, first_token_latency=args.first_token_latency,
+                              tokens_per_second=args.tokens_per_second, embed_latency=args.embed_latency).start()
+    print(f"Stub OpenAI server listening on {server.base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,125 @@
+# token_budget.py
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+# Word runs, numbers and single punctuation marks: roughly how BPE tokenizers split scientific text
+_PIECE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+CHARS_PER_TOKEN_LONG_WORD = 6     # Long words (gene names, chemical terms) span several BPE tokens
+MESSAGE_OVERHEAD_TOKENS = 4       # Role and separator tokens the chat template adds per message
+MAX_CACHED_TEXT_CHARS = 16000     # Longer texts (whole prompts, packed contexts) rarely recur; not cached
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast tokenizer-free token estimate (no nltk, no model files)."""
+    return sum(1 + (len(piece) - 1) // CHARS_PER_TOKEN_LONG_WORD for piece in _PIECE.findall(text))
+
+
+class TokenCounter:
+    """
+    Token counter with an in-memory LRU cache of per-text counts.
+
+    Uses `estimate_tokens` unless an exact tokenizer is plugged in: any callable
+    returning a token list or a count, e.g. a tiktoken encoding's `encode` or a
+    Hugging Face tokenizer's `encode`. Retrieved chunks recur across chat turns,
+    so most counts are cache hits.
+
+    One counter is shared by the chat sessions, batch jobs and background threads, so
+    the cache is lock-protected. It is keyed on a digest of the text, and texts over
+    `max_cached_chars` are counted without being cached.
+    """
+
+    def __init__(self, tokenizer: Optional[callable] = None, cache_size: int = 8192, name: str = "estimate",
+                 max_cached_chars: int = MAX_CACHED_TEXT_CHARS):
+        """
+        Args:
+            tokenizer (callable): Optional `tokenizer(text) -> list of tokens or int`.
+            cache_size (int): Number of cached text counts.
+            name (str): Label shown in status messages.
+            max_cached_chars (int): Longest text whose count is cached.
+        """
+        self.tokenizer = tokenizer
+        self.cache_size = max(0, int(cache_size))
+        self.max_cached_chars = max(0, int(max_cached_chars))
+        self.name = name if tokenizer is not None else "estimate"
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_tiktoken(cls, encoding_name: str = "cl100k_base", cache_size: int = 8192) -> "TokenCounter":
+        """Exact counts with tiktoken if it is installed; the fast estimate otherwise."""
+        try:
+            import tiktoken
+            encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            print(f"tiktoken encoding '{encoding_name}' not available ({e}); using the token estimate.")
+            return cls(cache_size=cache_size)
+        return cls(lambda text: encoding.encode(text, disallowed_special=()), cache_size, name=f"tiktoken:{encoding_name}")
+
+    def _count_uncached(self, text: str) -> int:
+        if self.tokenizer is None:
+            return estimate_tokens(text)
+        result = self.tokenizer(text)
+        return result if isinstance(result, int) else len(result)
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if not self.cache_size or len(text) > self.max_cached_chars:
+            return self._count_uncached(text)
+        key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+        tokens = self._count_uncached(text)  # Outside the lock: a tokenizer call can be slow
+        with self._lock:
+            self._cache[key] = tokens
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def count_messages(self, messages: Union[str, List[Dict[str, Any]]]) -> int:
+        """Tokens of a string or of chat messages (content plus a fixed per-message overhead)."""
+        if isinstance(messages, str):
+            return self.count(messages)
+        total = 0
+        for message in messages or []:
+            content = message.get("content", "") if isinstance(message, dict) else str(message)
+            total += self.count(content if isinstance(content, str) else str(content)) + MESSAGE_OVERHEAD_TOKENS
+        return total
+
+
+def pack_context(docs: List[Any], budget_tokens: int, counter: TokenCounter,
+                 format_fn: callable, min_docs: int = 1) -> Tuple[str, List[Any], int, int]:
+    """
+    Fills a context block with the best-ranked chunks that fit a token budget.
+
+    Chunks are taken in rank order; a chunk that would overflow the budget is
+    skipped and smaller, lower-ranked chunks may still fill the remaining space.
+    The first `min_docs` chunks are always included so a tight budget never
+    yields an empty context.
+
+    Args:
+        docs (list): Retrieved documents, best first.
+        budget_tokens (int): Token budget for the whole block (<= 0: no limit).
+        counter (TokenCounter): Counter used for each formatted chunk.
+        format_fn (callable): `format_fn(doc) -> str`, the text the chunk contributes.
+        min_docs (int): Chunks included regardless of the budget.
+
+    Returns:
+        tuple: (packed text, included docs, tokens used, number of chunks dropped)
+    """
+    parts, included, used = [], [], 0
+    for rank, doc in enumerate(docs):
+        text = format_fn(doc)
+        tokens = counter.count(text)
+        if budget_tokens > 0 and rank >= min_docs and used + tokens > budget_tokens:
+            continue
+        parts.append(text)
+        included.append(doc)
+        used += tokens
+    return "".join(parts), included, used, len(docs) - len(included)
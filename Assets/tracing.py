@@ -0,0 +1,331 @@
+# tracing.py
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+# Histogram buckets in seconds: from a cached lookup (ms) up to a long GROBID request
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+METRIC_PREFIX = "rag_"
+
+
+class Span:
+    """One timed operation. Attributes set with `set()` end up in the trace file."""
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"] = None, **attrs):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attrs: Dict[str, Any] = dict(attrs)
+        self.status = "ok"
+        self.start_wall = time.time()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def set(self, **attrs) -> "Span":
+        self.attrs.update(attrs)
+        return self
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start if self.duration is None else self.duration
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self.start
+        if error is not None:
+            self.status = "error"
+            self.attrs["error"] = f"{type(error).__name__}: {error}"
+        self.tracer._finish(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id, "name": self.name,
+                "start": round(self.start_wall, 6), "duration_ms": round((self.duration or 0.0) * 1000, 3),
+                "status": self.status, "attrs": self.attrs}
+
+
+class TokenStreamTimer:
+    """
+    Times a streamed LLM response: time to first token, gaps between tokens and tokens/s.
+    Call `token()` for every streamed piece and `finish()` once the stream is exhausted.
+    """
+
+    def __init__(self, tracer: "Tracer", span: Span, request_start: Optional[float] = None):
+        self.tracer = tracer
+        self.span = span
+        self.request_start = request_start if request_start is not None else time.perf_counter()
+        self.first_token: Optional[float] = None
+        self.last_token: Optional[float] = None
+        self.tokens = 0
+        self.max_gap = 0.0
+
+    def token(self, count: int = 1) -> None:
+        now = time.perf_counter()
+        if self.first_token is None:
+            self.first_token = now
+            self.tracer.observe("llm_ttft_seconds", now - self.request_start)
+        else:
+            gap = now - self.last_token
+            self.max_gap = max(self.max_gap, gap)
+            self.tracer.observe("llm_inter_token_seconds", gap)
+        self.last_token = now
+        self.tokens += count
+
+    def finish(self, error: Optional[BaseException] = None) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"tokens": self.tokens}
+        if self.first_token is not None:
+            stats["ttft_s"] = round(self.first_token - self.request_start, 4)
+            generation = self.last_token - self.first_token
+            stats["max_gap_s"] = round(self.max_gap, 4)
+            if self.tokens > 1 and generation > 0:
+                stats["tokens_per_s"] = round((self.tokens - 1) / generation, 2)
+                stats["mean_gap_s"] = round(generation / (self.tokens - 1), 4)
+        self.tracer.count("llm_stream_tokens_total", self.tokens)
+        self.span.set(**stats)
+        self.span.end(error)
+        return stats
+
+
+class Tracer:
+    """
+    Spans, counters and duration histograms for the chat and ingestion pipelines.
+
+    `span()` is a context manager that nests under the span active in the current
+    thread. Generators that Gradio resumes on different worker threads should hold
+    their span explicitly (`start_span` / `Span.end`) and make it the parent of the
+    work done in one step with `activate()`. Finished spans are appended to a JSONL
+    trace file (if configured) and kept in a short in-memory history; every span
+    duration is also recorded in the `rag_stage_duration_seconds` histogram, which
+    `prometheus_text()` renders in the Prometheus text exposition format.
+    """
+
+    def __init__(self, trace_file: Optional[str] = None, enabled: bool = True, history_size: int = 2000):
+        """
+        Args:
+            trace_file (str): JSONL file finished spans are appended to (None: keep them in memory only).
+            enabled (bool): When False, spans are still handed out but nothing is recorded.
+            history_size (int): Finished spans kept in memory for `trace_summary`.
+        """
+        self.enabled = enabled
+        self.trace_file: Optional[str] = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._history: "deque[Span]" = deque(maxlen=history_size)
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple], List[float]] = {}  # bucket counts..., sum, count
+        if trace_file:
+            self.configure(trace_file=trace_file)
+
+    def configure(self, trace_file: Optional[str] = None, enabled: Optional[bool] = None) -> None:
+        """Switches the trace file (appending; parent directories are created) and/or enables tracing."""
+        with self._lock:
+            if enabled is not None:
+                self.enabled = enabled
+            if trace_file != self.trace_file:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self.trace_file = trace_file
+                if trace_file:
+                    os.makedirs(os.path.dirname(os.path.abspath(trace_file)), exist_ok=True)
+                    self._file = open(trace_file, "a", encoding="utf-8")
+
+    def close(self) -> None:
+        self.configure(trace_file=None)
+
+    # --- Spans ---
+    def current_span(self) -> Optional[Span]:
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else None
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attrs) -> Span:
+        """A span that is not bound to the current thread; end it with `span.end()`."""
+        return Span(self, name, parent if parent is not None else self.current_span(), **attrs)
+
+    @contextmanager
+    def activate(self, span: Optional[Span]) -> Iterator[Optional[Span]]:
+        """Makes `span` the parent of spans opened in this thread inside the block."""
+        if span is None:
+            yield None
+            return
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            stack.pop()
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attrs) -> Iterator[Span]:
+        """Times the block as a child of `parent` or of this thread's active span; errors are recorded and re-raised."""
+        span = self.start_span(name, parent, **attrs)
+        with self.activate(span):
+            try:
+                yield span
+            except BaseException as e:
+                span.end(e)
+                raise
+        span.end()
+
+    def traced(self, name: Optional[str] = None):
+        """Decorator: runs every call of the function inside a span (named after the function by default)."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name or fn.__name__):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def stream_timer(self, name: str = "llm.stream", parent: Optional[Span] = None,
+                     request_start: Optional[float] = None, **attrs) -> TokenStreamTimer:
+        """Span + timer for a streamed response; pass `request_start` (perf_counter) to include the request setup."""
+        span = self.start_span(name, parent, **attrs)
+        if request_start is not None:
+            span.start = request_start
+        return TokenStreamTimer(self, span, request_start)
+
+    def _finish(self, span: Span) -> None:
+        if not self.enabled:
+            return
+        self.observe("stage_duration_seconds", span.duration, stage=span.name)
+        if span.status == "error":
+            self.count("stage_errors_total", stage=span.name)
+        line = json.dumps(span.to_dict(), default=str) if self._file is not None else None
+        with self._lock:
+            self._history.append(span)
+            if line is not None and self._file is not None:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    def trace_summary(self, trace_id: str, names: Optional[List[str]] = None) -> str:
+        """
+        'refine_query 0.81s | vector_search x4 (max 0.12s) | ...' for the finished spans of one
+        trace, in order of first start. Repeated stages (concurrent searches) are shown once.
+        """
+        stages = self.trace_durations(trace_id, names)
+        return " | ".join(f"{name} {durations[0]:.2f}s" if len(durations) == 1 else
+                          f"{name} x{len(durations)} (max {max(durations):.2f}s)"
+                          for name, durations in stages.items())
+
+    def trace_durations(self, trace_id: str, names: Optional[List[str]] = None) -> Dict[str, List[float]]:
+        """Durations (seconds) of the finished spans of one trace, by span name in order of first start."""
+        with self._lock:
+            spans = [s for s in self._history if s.trace_id == trace_id and (names is None or s.name in names)]
+        stages: Dict[str, List[float]] = {}
+        for span in sorted(spans, key=lambda s: s.start):
+            stages.setdefault(span.name, []).append(span.duration)
+        return stages
+
+    def recent_spans(self, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [s.to_dict() for s in list(self._history)[-limit:]]
+
+    # --- Metrics ---
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            values = self._histograms.get(key)
+            if values is None:
+                values = self._histograms[key] = [0.0] * (len(DURATION_BUCKETS) + 2)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    values[i] += 1
+            values[-2] += seconds
+            values[-1] += 1
+
+    def prometheus_text(self) -> str:
+        """All counters and histograms in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((k, list(v)) for k, v in self._histograms.items())
+        lines: List[str] = []
+        typed = set()
+        for (name, labels), value in counters:
+            metric = METRIC_PREFIX + name
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), values in histograms:
+            metric = METRIC_PREFIX + name
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            for bound, bucket_count in zip(DURATION_BUCKETS, values):
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {_format_value(bucket_count)}")
+            lines.append(f"{metric}_bucket{_format_labels(labels + (('le', '+Inf'),))} {_format_value(values[-1])}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {values[-2]:.6f}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {_format_value(values[-1])}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+_default_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """The process-wide tracer shared by the notebook and the Assets modules."""
+    return _default_tracer
+
+
+def start_metrics_server(port: int = 9464, host: str = "127.0.0.1", tracer: Optional[Tracer] = None) -> ThreadingHTTPServer:
+    """
+    Serves `GET /metrics` (Prometheus text format) and `GET /spans` (recent spans as JSON)
+    on a daemon thread. Returns the server; call `shutdown()` on it to stop.
+    """
+    tracer = tracer or _default_tracer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):  # Scrapes every few seconds would flood the notebook output
+            pass
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if path in ("", "/metrics"):
+                body, content_type = tracer.prometheus_text(), "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/spans":
+                body, content_type = json.dumps(tracer.recent_spans(), default=str), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics endpoint: http://{host}:{server.server_address[1]}/metrics")
+    return server